@@ -0,0 +1,126 @@
+"""
+Микробенчмарк форматирования: прежний форматтер (17 проходов str.replace,
+.get().strip() на каждое поле) против текущего (str.translate и кэш
+фрагментов на записи Term)
+
+Запуск из корня проекта:
+    python benchmarks/formatter_bench.py
+    python benchmarks/formatter_bench.py --pages 20000 --per-page 10
+
+Считается пропускная способность отрисовки страниц результатов
+(страниц в секунду) на реальной базе терминов.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from terms_memory import SOURCE_CSV  # noqa: E402
+
+
+def legacy_format_term(term_data: Dict[str, str], show_lang: bool = True, show_category: bool = True) -> str:
+    """Прежний format_term (до кэширования фрагментов)"""
+    term = term_data.get('term', '').strip()
+    description = term_data.get('description', '').strip()
+    category = term_data.get('category', '').strip()
+    subcategory = term_data.get('subcategory', '').strip()
+    lang = term_data.get('lang', '').strip()
+    
+    if not term:
+        return ""
+    
+    meta_parts = []
+    if show_category and category:
+        meta_parts.append(category)
+    if show_category and subcategory:
+        meta_parts.append(subcategory)
+    if show_lang and lang:
+        meta_parts.append(lang)
+    
+    result = f"**{legacy_escape_markdown(term)}**"
+    if meta_parts:
+        result += f" _({' / '.join(meta_parts)})_"
+    if description:
+        result += f"\n{description}"
+    return result
+
+
+def legacy_escape_markdown(text: str) -> str:
+    """Прежнее экранирование: отдельный str.replace на каждый символ"""
+    special_chars = ['*', '_', '[', ']', '(', ')', '~', '`', '>', '#', '+', '=', '|', '{', '}', '.', '!']
+    result = text
+    for char in special_chars:
+        result = result.replace(char, f'\\{char}')
+    return result
+
+
+def legacy_format_results_page(terms: List, page: int, per_page: int, show_category: bool) -> str:
+    """Прежний format_results_page"""
+    start_idx = (page - 1) * per_page
+    result_parts = []
+    for i, term_data in enumerate(terms[start_idx:start_idx + per_page], start=start_idx + 1):
+        result_parts.append(f"{i}. {legacy_format_term(term_data, show_lang=False, show_category=show_category)}")
+    return "\n\n".join(result_parts)
+
+
+def measure(render: Callable[[List, int], str], groups: List[List], pages: int, per_page: int) -> float:
+    """Страниц в секунду для render(группа, страница) на случайных страницах групп"""
+    rng = random.Random(42)
+    plan = []
+    for _ in range(pages):
+        group = rng.choice(groups)
+        plan.append((group, rng.randint(1, (len(group) + per_page - 1) // per_page)))
+    
+    started = time.perf_counter()
+    for group, page in plan:
+        render(group, page)
+    return pages / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=20000, help='Отрисовок страниц на режим')
+    parser.add_argument('--per-page', type=int, default=10, help='Терминов на странице')
+    parser.add_argument('--show-category', action='store_true', help='Категория у каждого термина (как в /search)')
+    args = parser.parse_args()
+    
+    from services.terms_service import TermsService
+    from utils.formatter import format_results_page
+    
+    service = TermsService(str(SOURCE_CSV))
+    groups = [group for group in service._terms_cache.values() if group]
+    per_page = args.per_page
+    show_category = args.show_category
+    
+    # Одинаковый вывод у прежнего и нового форматтера
+    for group in groups:
+        for page in range(1, (len(group) + per_page - 1) // per_page + 1):
+            expected = legacy_format_results_page(group, page, per_page, show_category)
+            actual = format_results_page(group, page=page, per_page=per_page, show_category=show_category)
+            assert actual == expected, f"Разный вывод: страница {page} группы {group[0].category}"
+    for term in service.terms:
+        term.markdown = term.markdown_with_category = None
+    
+    def legacy(group, page):
+        return legacy_format_results_page(group, page, per_page, show_category)
+    
+    def current(group, page):
+        return format_results_page(group, page=page, per_page=per_page, show_category=show_category)
+    
+    legacy_rate = measure(legacy, groups, args.pages, per_page)
+    cold_rate = measure(current, groups, args.pages, per_page)
+    warm_rate = measure(current, groups, args.pages, per_page)
+    
+    print(f"Терминов: {len(service.terms):,}, групп: {len(groups):,}, страниц на режим: {args.pages:,}")
+    print(f"Прежний форматтер:            {legacy_rate:10,.0f} стр/с")
+    print(f"Новый, первый проход (кэш):   {cold_rate:10,.0f} стр/с  (x{cold_rate / legacy_rate:.1f})")
+    print(f"Новый, готовые фрагменты:     {warm_rate:10,.0f} стр/с  (x{warm_rate / legacy_rate:.1f})")
+
+
+if __name__ == '__main__':
+    main()
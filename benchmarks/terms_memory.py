@@ -0,0 +1,194 @@
+"""
+Отчёт о памяти: загрузка терминов списком словарей (как раньше) и записями Term
+
+Запуск из корня проекта:
+    python benchmarks/terms_memory.py --rows 500000
+
+Каждый режим выполняется в отдельном процессе, чтобы пиковый RSS не смешивался:
+legacy - прежние словари без индексов, compact - TermsService с разбором CSV
+и построением всех индексов, snapshot - TermsService из бинарного снимка.
+Отдельно выводится стоимость каждого поискового индекса.
+"""
+import argparse
+import csv
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Sequence
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SOURCE_CSV = ROOT / 'data' / 'extracted_terms_full.csv'
+
+
+def generate_csv(path: Path, rows: int) -> None:
+    """Генерирует синтетический CSV нужного размера из реальных строк базы"""
+    with open(SOURCE_CSV, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        source = [row for row in reader if len(row) == len(header)]
+    
+    rng = random.Random(42)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(rows):
+            term, description, category, subcategory, lang = rng.choice(source)
+            writer.writerow([f"{term} {i}", description, category, subcategory, lang])
+
+
+def load_legacy(path: Path) -> list:
+    """Прежняя схема: словарь на каждую строку + кэш групп со ссылками на словари"""
+    terms = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            cleaned_row = {}
+            for key, value in row.items():
+                if key is not None:
+                    clean_key = key.strip() if key else ''
+                    if clean_key:
+                        cleaned_row[clean_key] = value.strip() if value else ''
+            if cleaned_row.get('term'):
+                terms.append(cleaned_row)
+    
+    cache = {}
+    for term in terms:
+        if term.get('category') and term.get('subcategory'):
+            key = f"{term['category']}:{term['subcategory']}:{term['lang']}"
+            cache.setdefault(key, []).append(term)
+    return [terms, cache]
+
+
+def load_compact(path: Path):
+    """Текущая схема: TermsService с записями Term (снимок удаляется - разбор CSV)"""
+    from services.terms_service import TermsService
+    from services.terms_snapshot import snapshot_path_for
+    snapshot_path_for(path).unlink(missing_ok=True)
+    return TermsService(str(path))
+
+
+def load_snapshot(path: Path):
+    """TermsService из снимка, сохранённого режимом compact"""
+    from services.terms_service import TermsService
+    return TermsService(str(path))
+
+
+LOADERS = {'legacy': load_legacy, 'compact': load_compact, 'snapshot': load_snapshot}
+
+
+def index_costs(path: Path) -> None:
+    """
+    Память и время построения каждого индекса (в дочернем процессе)
+    
+    Индексы строятся по очереди из одного списка терминов, как в
+    TermsDataset; у TrigramIndex в память входят нормализованные тексты,
+    общие для остальных индексов.
+    """
+    from services.search_index import FuzzyIndex, PrefixIndex, StemIndex, TrigramIndex
+    from services.terms_service import LANGUAGES, TermsDataset, TermsService
+    
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        terms = TermsService._parse_rows(csv.reader(file))
+    dataset = TermsDataset(terms)
+    
+    def build_prefix():
+        return {
+            lang: PrefixIndex(trigram.names, (term.id for term in terms if term.lang == lang))
+            for lang in LANGUAGES
+        }
+    
+    steps = [
+        ('groups', dataset._build_cache),
+        ('trigram', lambda: TrigramIndex(terms)),
+        ('stem', lambda: StemIndex(terms, trigram.names, trigram.descriptions)),
+        ('fuzzy', lambda: FuzzyIndex(trigram.names)),
+        ('prefix', build_prefix),
+    ]
+    built = []
+    for name, build in steps:
+        tracemalloc.start()
+        started = time.perf_counter()
+        built.append(build())
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if name == 'trigram':
+            trigram = built[-1]
+        print(f"{name}\t{current / 2**20:.1f}\t{peak / 2**20:.1f}\t{elapsed:.2f}")
+
+
+def measure(mode: str, path: Path, trace: bool) -> None:
+    """
+    Замер в дочернем процессе: выводит одну строку с результатами
+    
+    tracemalloc сильно замедляет загрузку, поэтому память и время
+    снимаются в разных запусках. Модули сервиса и настройки импортируются
+    до замера: в память входят только данные базы.
+    """
+    loader = LOADERS[mode]
+    if mode != 'legacy':
+        import services.terms_service  # noqa: F401
+        from config import settings  # noqa: F401
+    if trace:
+        tracemalloc.start()
+        holder = loader(path)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{current / 2**20:.1f}\t{peak / 2**20:.1f}")
+    else:
+        started = time.perf_counter()
+        holder = loader(path)
+        elapsed = time.perf_counter() - started
+        rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"{rss_kb / 1024:.1f}\t{elapsed:.2f}")
+    del holder
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500_000, help='Количество синтетических строк')
+    parser.add_argument('--mode', choices=[*LOADERS, 'indexes'], help=argparse.SUPPRESS)
+    parser.add_argument('--csv', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--trace', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.mode == 'indexes':
+        index_costs(args.csv)
+        return
+    if args.mode:
+        measure(args.mode, args.csv, args.trace)
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'terms.csv'
+        generate_csv(path, args.rows)
+        print(f"Строк: {args.rows:,}, CSV: {path.stat().st_size / 2**20:.1f} MB")
+        print("режим\tпамять, MB\tпик, MB\tmaxrss, MB\tзагрузка, с")
+        for mode in LOADERS:
+            results = []
+            for extra in (['--trace'], []):
+                results.append(run(mode, path, tmp, extra)[-1])
+            print(f"{mode}\t" + "\t".join(results))
+        
+        print("\nиндекс\tпамять, MB\tпик, MB\tпостроение, с (под tracemalloc)")
+        for line in run('indexes', path, tmp):
+            print(line)
+
+
+def run(mode: str, path: Path, cwd: str, extra: Sequence[str] = ()) -> List[str]:
+    """Запуск режима в дочернем процессе; возвращает строки вывода"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--mode', mode, '--csv', str(path), *extra],
+        cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout
+    return output.strip().splitlines()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Замер времени старта TermsService: разбор CSV против загрузки бинарного снимка
+
+Запуск из корня проекта:
+    python benchmarks/terms_startup.py              # реальная база
+    python benchmarks/terms_startup.py --rows 500000  # синтетическая база
+
+Каждая загрузка выполняется в отдельном процессе (TermsService - Singleton).
+"""
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from terms_memory import SOURCE_CSV, generate_csv  # noqa: E402
+
+
+def measure(path: Path) -> None:
+    """Замер в дочернем процессе: время конструктора TermsService"""
+    from services.terms_service import TermsService
+    started = time.perf_counter()
+    service = TermsService(str(path))
+    elapsed = time.perf_counter() - started
+    print(f"{elapsed:.3f}\t{len(service.terms)}")
+
+
+def run_child(path: Path, cwd: str) -> float:
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure', str(path)],
+        cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1].split('\t')[0])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=0, help='Синтетических строк (0 - реальная база)')
+    parser.add_argument('--repeat', type=int, default=3, help='Повторов для каждого режима')
+    parser.add_argument('--measure', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.measure:
+        measure(args.measure)
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'terms.csv'
+        if args.rows:
+            generate_csv(path, args.rows)
+        else:
+            shutil.copy(SOURCE_CSV, path)
+        snapshot = path.parent / 'cache' / f'{path.stem}.snapshot'
+        
+        csv_times = []
+        for _ in range(args.repeat):
+            snapshot.unlink(missing_ok=True)
+            csv_times.append(run_child(path, tmp))
+        snapshot_times = [run_child(path, tmp) for _ in range(args.repeat)]
+        
+        print(f"CSV: {path.stat().st_size / 2**20:.1f} MB, снимок: {snapshot.stat().st_size / 2**20:.1f} MB")
+        print(f"Разбор CSV (+ запись снимка): {min(csv_times):.3f} с")
+        print(f"Загрузка снимка:              {min(snapshot_times):.3f} с")
+
+
+if __name__ == '__main__':
+    main()
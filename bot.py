@@ -1,12 +1,13 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 
 from config import settings
 from handlers import routers
 from services import TermsService, AnalyticsService
-from middlewares import RateLimitMiddleware, ErrorHandlerMiddleware
-from utils.category_mapper import get_mapper
+from services.fsm_storage import PersistentStorage, create_fsm_storage
+from middlewares import RateLimitMiddleware, ErrorHandlerMiddleware, FSMBufferMiddleware, UnchangedEditMiddleware
 
 
 async def main():
@@ -21,30 +22,31 @@ async def main():
     logger = logging.getLogger(__name__)
     logger.info("Запуск бота...")
     
-    # Инициализация маппера категорий для обоих языков
-    logger.info("Инициализация маппера категорий...")
+    # База терминов (ID категорий для callback_data выводятся из названий при загрузке)
     terms_service = TermsService()
-    mapper = get_mapper()
-    
-    # Регистрируем категории и подкатегории для обоих языков
-    for lang in ['kk', 'ru']:
-        categories = terms_service.get_categories(lang)
-        for cat in categories:
-            mapper.register_category(cat)
-            subcats = terms_service.get_subcategories(cat, lang)
-            for subcat in subcats:
-                mapper.register_subcategory(subcat)
-    
-    logger.info(f"Маппер инициализирован для обоих языков")
+    logger.info(f"База терминов загружена: {len(terms_service.terms):,} терминов")
     
     # Инициализация аналитики и запуск фонового воркера
     analytics = AnalyticsService()
     await analytics.start()
     logger.info("Сервис аналитики запущен")
     
+    # Состояние пользователей переживает перезапуск (FSM_STORAGE, по умолчанию SQLite);
+    # неактивные сессии вытесняются фоновой задачей, язык пользователя сохраняется
+    storage = create_fsm_storage()
+    if isinstance(storage, PersistentStorage):
+        await storage.start_sweeper(settings.FSM_SWEEP_INTERVAL)
+    logger.info(f"Хранилище FSM: {settings.FSM_STORAGE}")
+    
     # Инициализация бота и диспетчера
     bot = Bot(token=settings.BOT_TOKEN)
-    dp = Dispatcher()
+    # Повторные нажатия с тем же содержимым не отправляют editMessageText
+    edit_dedup = UnchangedEditMiddleware(settings.EDIT_FINGERPRINTS_SIZE)
+    bot.session.middleware(edit_dedup)
+    # Обновления одного пользователя обрабатываются по очереди: буферизованное
+    # состояние (FSMBufferMiddleware) не перезаписывает изменения параллельного обновления
+    # edit_dedup передаётся обработчикам (счётчики на экране здоровья админки)
+    dp = Dispatcher(storage=storage, events_isolation=SimpleEventIsolation(), edit_dedup=edit_dedup)
     
     # Подключение middleware (порядок важен!)
     rate_limit_middleware = RateLimitMiddleware(
@@ -61,9 +63,15 @@ async def main():
     
     error_handler_middleware = ErrorHandlerMiddleware()
     
+    # Состояние FSM читается один раз за обновление и пишется одной операцией в конце
+    dp.update.outer_middleware(FSMBufferMiddleware())
+    
     # Регистрируем middleware (сначала error handler, потом rate limit)
     dp.message.middleware(error_handler_middleware)
     dp.callback_query.middleware(error_handler_middleware)
+    dp.inline_query.middleware(error_handler_middleware)
+    # Inline-запросы приходят на каждое нажатие клавиши и кэшируются Telegram
+    # (INLINE_CACHE_TIME), поэтому rate limit к ним не применяется
     dp.message.middleware(rate_limit_middleware)
     dp.callback_query.middleware(rate_limit_middleware)
     
@@ -85,13 +93,15 @@ async def main():
         # allowed_updates ограничивает типы обновлений для экономии трафика
         await dp.start_polling(
             bot,
-            allowed_updates=["message", "callback_query"],  # Только нужные типы обновлений
+            allowed_updates=["message", "callback_query", "inline_query"],  # Только нужные типы обновлений
             drop_pending_updates=True,
             # close_bot_session=False - оставляем управление сессией вручную
         )
     finally:
         # Останавливаем аналитику перед завершением
         await analytics.stop()
+        # Сбрасываем несохранённые изменения состояния
+        await storage.close()
         await bot.session.close()
         logger.info("Бот остановлен")
 
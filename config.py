@@ -3,6 +3,7 @@
 Загружает настройки из .env файла с использованием pydantic-settings
 """
 import re
+from functools import cached_property
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -26,11 +27,35 @@ class Settings(BaseSettings):
     ANALYTICS_BATCH_SIZE: int = 10  # Размер батча для записи аналитики
     ANALYTICS_BATCH_TIMEOUT: float = 1.0  # Таймаут батча в секундах
     ANALYTICS_QUEUE_MAXSIZE: int = 1000  # Максимальный размер очереди аналитики
+    ANALYTICS_STORAGE: str = "csv"  # csv | sqlite
+    ANALYTICS_STORAGE_PATH: str = "data/analytics.sqlite3"  # Файл базы для sqlite
+    ANALYTICS_RETENTION_DAYS: int = 365  # Сколько дней хранить журнал аналитики (0 - без ограничения)
+    ANALYTICS_CACHE_TTL: int = 300  # Сколько секунд хранить результат экрана статистики (пока журнал не изменился)
+    ANALYTICS_PROCESS_POOL_MIN_SIZE: int = 50 * 1024 * 1024  # С какого размера журнала (байт) читать его в отдельном процессе
     
     # Результаты
     RESULTS_PER_PAGE: int = 10  # Количество результатов на странице
     MAX_SEARCH_RESULTS: int = 50  # Максимальное количество результатов поиска
     
+    # Кэш результатов поиска
+    SEARCH_CACHE_SIZE: int = 1000  # Максимальное количество запросов в кэше
+    SEARCH_CACHE_TTL: int = 600  # Время жизни записи в секундах
+    PAGE_CACHE_SIZE: int = 2000  # Максимальное количество готовых страниц подкатегорий
+    EDIT_FINGERPRINTS_SIZE: int = 10000  # Сколько последних сообщений помнить для пропуска повторных правок
+    
+    # Inline-режим (@bot запрос)
+    INLINE_RESULTS_LIMIT: int = 20  # Подсказок на запрос (Telegram допускает до 50)
+    INLINE_CACHE_TIME: int = 300  # Сколько секунд Telegram кэширует ответ на запрос
+    
+    # Хранилище FSM (состояние пользователей)
+    FSM_STORAGE: str = "sqlite"  # sqlite | redis | memory
+    FSM_STORAGE_PATH: str = "data/fsm.sqlite3"  # Файл базы для sqlite
+    FSM_REDIS_URL: str = "redis://localhost:6379/0"  # Адрес для redis (или совместимого сервера)
+    FSM_FLUSH_INTERVAL: float = 0.5  # Период отложенной записи в секундах
+    FSM_SESSION_TTL: int = 604800  # Неактивная сессия вытесняется через 7 дней (язык сохраняется)
+    FSM_MAX_SESSIONS: int = 10000  # Максимум сессий в памяти (самые давние выгружаются из памяти, остаются в базе)
+    FSM_SWEEP_INTERVAL: int = 60  # Период проверки сессий в секундах
+    
     # Rate limit memory
     RATE_LIMIT_MAX_USERS: int = 10000  # Максимальное количество пользователей в памяти
     
@@ -55,9 +80,9 @@ class Settings(BaseSettings):
             )
         return v
     
-    @property
+    @cached_property
     def admin_ids_list(self) -> list[int]:
-        """Получить список ID админов"""
+        """ID админов (разбираются из ADMIN_IDS один раз)"""
         if not self.ADMIN_IDS:
             return []
         return [int(id.strip()) for id in self.ADMIN_IDS.split(",") if id.strip().isdigit()]
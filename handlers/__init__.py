@@ -5,15 +5,19 @@ from .start import router as start_router
 from .language import router as language_router
 from .categories import router as categories_router
 from .terms import router as terms_router
+from .search import router as search_router
 from .admin import router as admin_router
+from .inline import router as inline_router
 
 # Список всех роутеров (порядок важен!)
 routers = [
     start_router,       # /start, /menu, home, back
     language_router,    # Выбор языка
     categories_router,  # Выбор категорий и подкатегорий
+    search_router,      # /search - поиск по всей базе
     terms_router,       # Просмотр результатов, пагинация, поиск
     admin_router,       # Админ-панель
+    inline_router,      # Inline-режим: автодополнение терминов
 ]
 
 __all__ = ['routers']
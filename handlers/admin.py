@@ -1,9 +1,11 @@
 """
 Обработчики админ-панели
 """
+import asyncio
 import shutil
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery, FSInputFile
@@ -11,7 +13,11 @@ from aiogram.fsm.context import FSMContext
 
 from utils.admin_auth import is_admin, require_admin
 from services.analytics import AnalyticsService
+from services.analytics_query import TopK, is_failed_search, is_search, lower_query
+from services.fsm_storage import PersistentStorage
+from middlewares import UnchangedEditMiddleware
 from services.terms_service import TermsService
+from keyboards.categories import clear_keyboard_cache
 from keyboards.admin import (
     get_admin_main_keyboard,
     get_admin_stats_keyboard,
@@ -20,11 +26,16 @@ from keyboards.admin import (
     get_admin_backup_keyboard
 )
 from utils.texts import get_text
+from utils.logger import get_logger
 
+logger = get_logger('handlers.admin')
 router = Router()
 analytics = AnalyticsService()
 terms_service = TermsService()
 
+# Сколько последних дней показывать в активности на экране статистики
+ACTIVITY_DAYS = 7
+
 
 @router.message(Command("admin"))
 @require_admin
@@ -100,7 +111,9 @@ async def handle_admin_stats(callback: CallbackQuery, state: FSMContext):
         return
     
     days = validated_days
-    stats = analytics.get_stats(days=days)
+    stats = await analytics.get_stats_async(days=days)
+    # Активность по дням - только последняя неделя (читаются лишь её файлы дней)
+    activity = await analytics.get_user_activity_async(days=min(days, ACTIVITY_DAYS))
     
     # Формируем текст
     text = f"📊 **Статистика за {days} дней**\n\n"
@@ -131,7 +144,14 @@ async def handle_admin_stats(callback: CallbackQuery, state: FSMContext):
     text += f"  • Всего запросов: {search_stats['total']}\n"
     text += f"  • Успешных: {search_stats['successful']}\n"
     text += f"  • Без результатов: {search_stats['failed']}\n"
-    text += f"  • Успешность: {search_stats['success_rate']:.1f}%\n"
+    text += f"  • Успешность: {search_stats['success_rate']:.1f}%\n\n"
+    
+    text += f"📅 **Активность по дням:**\n"
+    if activity:
+        for day, count in sorted(activity.items(), reverse=True):
+            text += f"  • {day}: {count}\n"
+    else:
+        text += "  Нет данных\n"
     
     await callback.message.edit_text(
         text=text,
@@ -148,14 +168,19 @@ async def handle_admin_top(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang = data.get('language', 'kk')
     
-    stats = analytics.get_stats(days=7)
-    failed_queries = analytics.get_failed_queries(days=7, limit=10)
+    # Обе метрики считаются за один проход по журналу
+    result = await analytics.query_async(7, [
+        TopK('top_queries', lower_query, 10, where=is_search),
+        TopK('failed_queries', lower_query, 10, where=is_failed_search),
+    ])
+    top_queries = result.get('top_queries', [])
+    failed_queries = result.get('failed_queries', [])
     
     text = "🔍 **Топ запросов**\n\n"
     
     text += "✅ **Популярные запросы (топ-10):**\n"
-    if stats['top_queries']:
-        for i, (query, count) in enumerate(list(stats['top_queries'].items())[:10], 1):
+    if top_queries:
+        for i, (query, count) in enumerate(top_queries, 1):
             text += f"  {i}. {query}: {count} раз\n"
     else:
         text += "  Нет данных\n"
@@ -163,8 +188,8 @@ async def handle_admin_top(callback: CallbackQuery, state: FSMContext):
     
     text += "❌ **Запросы без результатов (что добавить?):**\n"
     if failed_queries:
-        for i, item in enumerate(failed_queries[:10], 1):
-            text += f"  {i}. {item['query']}: {item['count']} раз\n"
+        for i, (query, count) in enumerate(failed_queries, 1):
+            text += f"  {i}. {query}: {count} раз\n"
     else:
         text += "  Все запросы успешны! ✅\n"
     
@@ -178,7 +203,11 @@ async def handle_admin_top(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == "admin:health")
 @require_admin
-async def handle_admin_health(callback: CallbackQuery, state: FSMContext):
+async def handle_admin_health(
+    callback: CallbackQuery,
+    state: FSMContext,
+    edit_dedup: Optional[UnchangedEditMiddleware] = None
+):
     """Здоровье бота"""
     data = await state.get_data()
     lang = data.get('language', 'kk')
@@ -191,7 +220,7 @@ async def handle_admin_health(callback: CallbackQuery, state: FSMContext):
     
     # Проверяем размер файлов
     csv_size = terms_service.csv_path.stat().st_size / 1024  # KB
-    analytics_size = analytics.analytics_file.stat().st_size / 1024 if analytics.analytics_file.exists() else 0
+    analytics_size = analytics.log_size() / 1024
     
     text = "💚 **Здоровье бота**\n\n"
     text += "✅ Все системы работают\n\n"
@@ -209,7 +238,33 @@ async def handle_admin_health(callback: CallbackQuery, state: FSMContext):
     text += "⏱️ **Производительность:**\n"
     text += f"  • Кэш категорий: ✅\n"
     text += f"  • Кэш терминов: ✅\n"
-    text += f"  • Оптимизация: O(1) доступ\n"
+    text += f"  • Оптимизация: O(1) доступ\n\n"
+    
+    cache_stats = terms_service.search_cache.stats()
+    text += "🔎 **Кэш поиска:**\n"
+    text += f"  • Записей: {cache_stats['size']:,} / {cache_stats['max_size']:,}\n"
+    text += f"  • Попаданий: {cache_stats['hits']:,} ({cache_stats['hit_rate']:.1f}%)\n"
+    text += f"  • Промахов: {cache_stats['misses']:,}\n"
+    text += f"  • Вытеснено: {cache_stats['evictions']:,}, истекло: {cache_stats['expirations']:,}\n"
+    text += f"  • Готовых страниц выдано: {cache_stats['page_hits']:,}\n\n"
+    
+    page_stats = terms_service.page_cache.stats()
+    text += "📄 **Кэш страниц подкатегорий:**\n"
+    text += f"  • Страниц: {page_stats['size']:,} / {page_stats['max_size']:,}\n"
+    text += f"  • Попаданий: {page_stats['hits']:,} ({page_stats['hit_rate']:.1f}%)\n"
+    text += f"  • Вытеснено: {page_stats['evictions']:,}\n"
+    
+    if isinstance(state.storage, PersistentStorage):
+        fsm_stats = state.storage.stats()
+        text += "\n👤 **Сессии FSM:**\n"
+        text += f"  • В памяти: {fsm_stats['sessions']:,}, ожидают записи: {fsm_stats['dirty']:,}\n"
+        text += f"  • Вытеснено неактивных: {fsm_stats['evicted_idle']:,}, выгружено сверх лимита: {fsm_stats['evicted_overflow']:,}\n"
+    
+    if edit_dedup is not None:
+        edit_stats = edit_dedup.stats()
+        text += "\n✏️ **Правки сообщений:**\n"
+        text += f"  • Отправлено: {edit_stats['edits']:,}, пропущено без изменений: {edit_stats['skipped']:,}\n"
+        text += f"  • Отслеживается сообщений: {edit_stats['tracked']:,}\n"
     
     await callback.message.edit_text(
         text=text,
@@ -219,6 +274,46 @@ async def handle_admin_health(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
+@router.callback_query(F.data == "admin:reload")
+@require_admin
+async def handle_admin_reload(callback: CallbackQuery, state: FSMContext):
+    """
+    Перезагрузка базы терминов из CSV
+    
+    Новая база собирается в потоке (разбор большого CSV занимает секунды),
+    а подменяется в цикле событий; при ошибке работает прежняя база.
+    """
+    data = await state.get_data()
+    lang = data.get('language', 'kk')
+    # Отвечаем сразу: сборка базы может быть дольше времени жизни callback
+    await callback.answer("🔄 Загрузка базы...")
+    
+    text = "🔄 **Перезагрузка базы**\n\n"
+    try:
+        dataset = await asyncio.to_thread(terms_service.build_dataset)
+    except Exception as e:
+        logger.error(f"Ошибка при перезагрузке базы терминов: {e}", exc_info=True)
+        text += "❌ Не удалось загрузить CSV, работает прежняя база\n"
+        text += f"  • Ошибка: `{type(e).__name__}`\n"
+        text += f"  • Терминов в памяти: {len(terms_service.terms):,}\n"
+    else:
+        changed = terms_service.apply_dataset(dataset)
+        clear_keyboard_cache()
+        
+        if changed:
+            text += "✅ База терминов обновлена\n"
+        else:
+            text += "ℹ️ CSV не изменился, база загружена повторно\n"
+        text += f"  • Терминов в памяти: {len(terms_service.terms):,}\n"
+        text += "  • Кэш поиска, кэш страниц и клавиатуры категорий сброшены\n"
+    
+    await callback.message.edit_text(
+        text=text,
+        reply_markup=get_admin_back_keyboard(lang),
+        parse_mode="Markdown"
+    )
+
+
 @router.callback_query(F.data == "admin:errors")
 @require_admin
 async def handle_admin_errors(callback: CallbackQuery, state: FSMContext):
@@ -269,7 +364,7 @@ async def handle_admin_export(callback: CallbackQuery, state: FSMContext):
             caption="📊 Экспорт аналитики"
         )
         await callback.answer("✅ Файл экспортирован")
-        
+    
     elif export_type == "terms":
         # Экспорт терминов
         export_path = Path('data') / f'terms_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
@@ -327,7 +422,7 @@ async def handle_admin_backup(callback: CallbackQuery, state: FSMContext):
             parse_mode="Markdown"
         )
         await callback.answer("✅ Бэкап создан")
-        
+    
     elif action == "list":
         # Список бэкапов
         backups = sorted(analytics.backups_dir.glob('backup_*.csv'), key=lambda p: p.stat().st_mtime, reverse=True)
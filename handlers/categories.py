@@ -6,13 +6,13 @@ from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 from models import UserState
-from keyboards import get_subcategories_keyboard, get_results_keyboard
+from keyboards import ResultsPage, get_subcategories_keyboard
 from services import TermsService
 from services.analytics import AnalyticsService
-from utils.texts import get_text, translate_category, translate_subcategory
-from utils.formatter import format_results_page
+from utils.texts import get_text, translate_category
 from utils.category_mapper import get_mapper
-from config import settings
+from utils.validators import validate_category_id, validate_subcategory_id
+from handlers.results import browse_page
 
 router = Router()
 terms_service = TermsService()
@@ -29,10 +29,9 @@ async def handle_category_selection(callback: CallbackQuery, state: FSMContext):
         state: FSM состояние пользователя
     """
     # Извлекаем ID категории из callback_data и преобразуем в название
-    cat_id_str = callback.data.split(":", 1)[1]  # "cat:1" -> "1"
-    cat_id = int(cat_id_str)
+    cat_id = validate_category_id(callback.data.split(":", 1)[1])  # "cat:1804289383" -> 1804289383
     mapper = get_mapper()
-    category = mapper.get_category_name(cat_id)
+    category = mapper.get_category_name(cat_id) if cat_id is not None else None
     
     if not category:
         await callback.answer("❌ Ошибка: категория не найдена", show_alert=True)
@@ -93,10 +92,9 @@ async def handle_subcategory_selection(callback: CallbackQuery, state: FSMContex
         state: FSM состояние пользователя
     """
     # Извлекаем ID подкатегории из callback_data и преобразуем в название
-    subcat_id_str = callback.data.split(":", 1)[1]  # "sub:1" -> "1"
-    subcat_id = int(subcat_id_str)
+    subcat_id = validate_subcategory_id(callback.data.split(":", 1)[1])  # "sub:846930886" -> 846930886
     mapper = get_mapper()
-    subcategory = mapper.get_subcategory_name(subcat_id)
+    subcategory = mapper.get_subcategory_name(subcat_id) if subcat_id is not None else None
     
     if not subcategory:
         await callback.answer("❌ Ошибка: подкатегория не найдена", show_alert=True)
@@ -136,36 +134,16 @@ async def handle_subcategory_selection(callback: CallbackQuery, state: FSMContex
         )
         return
     
-    # Сохраняем результаты в состоянии
-    await state.update_data(current_results=terms)
+    # Сохраняем в состоянии описание выборки (не сами термины)
+    result_set = terms_service.make_result_set(lang, category, subcategory)
+    await state.update_data(results=result_set.to_state())
     
     # Переходим к просмотру результатов
     await state.set_state(UserState.viewing_results)
     
-    # Формируем сообщение с результатами
-    per_page = settings.RESULTS_PER_PAGE
-    total_count = len(terms)
-    
-    # Формируем заголовок с категорией и подкатегорией (с переводом)
-    category_display = translate_category(category, lang) if lang == 'ru' else category
-    subcategory_display = translate_subcategory(subcategory, lang) if lang == 'ru' else subcategory
-    header = get_text('results_found', lang, count=total_count)
-    header += f"\n📂 {category_display} / {subcategory_display}\n\n"
-    
-    results_text = format_results_page(terms, page=1, per_page=per_page, show_lang=False, show_category=False)
-    
-    message_text = header + results_text
-    
-    # Определяем, есть ли следующая страница
-    has_next = total_count > per_page
-    
-    # Формируем клавиатуру
-    keyboard = get_results_keyboard(
-        lang=lang,
-        has_prev=False,
-        has_next=has_next,
-        show_search=True
-    )
+    # Первая страница с клавиатурой - из кэша готовых страниц
+    # (пагинация без FSM: подкатегория передаётся в callback_data)
+    message_text, keyboard = browse_page(category, subcategory, lang, ResultsPage.for_results(result_set, page=1))
     
     # Обновляем сообщение
     try:
@@ -0,0 +1,83 @@
+"""
+Обработчики inline-режима (@bot запрос) - автодополнение названий терминов
+"""
+from typing import Dict
+
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from aiogram.fsm.context import FSMContext
+
+from models import Term
+from services import TermsService
+from utils.formatter import format_term
+from config import settings
+
+router = Router()
+terms_service = TermsService()
+
+# Максимальная длина краткого описания в списке подсказок
+ARTICLE_DESCRIPTION_LENGTH = 100
+
+# Готовые результаты по ID термина (строятся при первом показе, сбрасываются при смене базы)
+_articles: Dict[int, InlineQueryResultArticle] = {}
+_articles_dataset = None
+
+
+@router.inline_query()
+async def handle_inline_query(inline_query: InlineQuery, state: FSMContext):
+    """
+    Обработчик inline-запроса: подсказки терминов по началу названия
+    Приходит на каждое нажатие клавиши, поэтому только поиск по индексу
+    префиксов и готовые результаты, без аналитики
+    
+    Args:
+        inline_query: Inline-запрос
+        state: FSM состояние пользователя (язык из личного чата с ботом)
+    """
+    data = await state.get_data()
+    lang = data.get('language', 'kk')
+    
+    terms = terms_service.autocomplete(inline_query.query[:settings.MAX_QUERY_LENGTH], lang=lang)
+    
+    await inline_query.answer(
+        results=[_get_article(term) for term in terms],
+        cache_time=settings.INLINE_CACHE_TIME,
+        # Подсказки зависят от языка пользователя
+        is_personal=True
+    )
+
+
+def _get_article(term: Term) -> InlineQueryResultArticle:
+    """
+    Готовый результат inline-запроса для термина
+    
+    Args:
+        term: Термин
+    
+    Returns:
+        Результат с названием, категорией и текстом сообщения в Markdown
+    """
+    global _articles_dataset
+    
+    if _articles_dataset != terms_service.dataset_hash:
+        _articles.clear()
+        _articles_dataset = terms_service.dataset_hash
+    
+    article = _articles.get(term.id)
+    if article is None:
+        description = f"{term.category} / {term.subcategory}"
+        if term.description:
+            description += f"\n{term.description}"
+        if len(description) > ARTICLE_DESCRIPTION_LENGTH:
+            description = description[:ARTICLE_DESCRIPTION_LENGTH - 1] + "…"
+        
+        article = _articles[term.id] = InlineQueryResultArticle(
+            id=str(term.id),
+            title=term.term,
+            description=description,
+            input_message_content=InputTextMessageContent(
+                message_text=format_term(term, show_lang=False),
+                parse_mode="Markdown"
+            )
+        )
+    return article
@@ -0,0 +1,147 @@
+"""
+Отрисовка страниц результатов (общая для обработчиков подкатегорий, поиска и пагинации)
+"""
+from typing import Hashable, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from models import ResultSet, Term
+from services import TermsService
+from keyboards import ResultsPage, get_results_keyboard
+from utils.texts import get_text, translate_category, translate_subcategory
+from utils.formatter import format_planned_page, message_length, plan_pages
+from utils.validators import MAX_MESSAGE_LENGTH
+from config import settings
+
+terms_service = TermsService()
+
+# Место под заголовок страницы (запрос до MAX_QUERY_LENGTH символов и названия
+# категорий). План страниц не зависит от точной длины заголовка, поэтому
+# одинаков для всех страниц выборки и для кэшированной первой страницы
+HEADER_RESERVE = 512
+
+
+def page_for(result_set: ResultSet, page: int) -> ResultsPage:
+    """Упакованная страница выборки (с токеном запроса для результатов поиска)"""
+    token = terms_service.search_cache.register_query(result_set.query) if result_set.query else None
+    return ResultsPage.for_results(result_set, page=page, token=token)
+
+
+def render_results_page(
+    results: List[Term],
+    page: Optional[ResultsPage],
+    lang: str,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    query: Optional[str] = None,
+    cache_key: Optional[Hashable] = None
+) -> Tuple[str, InlineKeyboardMarkup]:
+    """
+    Текст и клавиатура страницы результатов
+    
+    Границы страниц планируются по длине терминов (plan_pages): страница
+    вместе с заголовком помещается в одно сообщение Telegram. План
+    считается один раз на выборку и берётся из кэша при переходах по страницам.
+    
+    Args:
+        results: Термины выборки
+        page: Упакованная страница (номер приводится к допустимому диапазону);
+            None - первая страница без упакованных кнопок
+        lang: Язык интерфейса
+        category: Категория (None - поиск по всей базе)
+        subcategory: Подкатегория
+        query: Поисковый запрос
+        cache_key: Ключ кэша поиска: первая страница берётся из search_cache.first_page
+    
+    Returns:
+        (текст в Markdown, клавиатура)
+    """
+    # Результаты /search: категория показывается у каждого термина
+    search_all = category is None
+    header = _results_header(len(results), lang, category, subcategory, query)
+    
+    max_length = MAX_MESSAGE_LENGTH - max(HEADER_RESERVE, message_length(header))
+    # Выборка однозначно задаётся категорией, подкатегорией, языком и запросом
+    # (кэш сбрасывается при перезагрузке базы); размер - дополнительная проверка
+    plan = terms_service.page_cache.get_or_plan(
+        (category, subcategory, lang, query, len(results)),
+        lambda: plan_pages(results, per_page=settings.RESULTS_PER_PAGE, max_length=max_length, show_category=search_all)
+    )
+    
+    page_number = plan.clamp(page.page if page is not None else 1)
+    if page is not None and page.page != page_number:
+        page = page.model_copy(update={'page': page_number})
+    
+    def render() -> str:
+        return format_planned_page(results, plan, page_number, max_length=max_length, show_category=search_all)
+    
+    if cache_key is not None and page_number == 1:
+        results_text = terms_service.search_cache.first_page(cache_key, render)
+    else:
+        results_text = render()
+    
+    keyboard = get_results_keyboard(
+        lang=lang,
+        show_search=not search_all,
+        page=page,
+        plan=plan
+    )
+    return header + results_text, keyboard
+
+
+def browse_page(
+    category: str,
+    subcategory: str,
+    lang: str,
+    page: ResultsPage
+) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+    """
+    Страница просмотра подкатегории (без поиска) из кэша готовых страниц
+    
+    Такая страница зависит только от (категория, подкатегория, язык,
+    страница), поэтому отрисовывается один раз до перезагрузки базы.
+    
+    Args:
+        category: Категория
+        subcategory: Подкатегория
+        lang: Язык терминов
+        page: Упакованная страница (с ID категории и подкатегории)
+    
+    Returns:
+        (текст в Markdown, клавиатура) или None, если подкатегория пуста
+    """
+    terms = terms_service.get_terms_by_category(category, subcategory, lang=lang)
+    if not terms:
+        return None
+    
+    # Точное число страниц знает план (render_results_page); здесь номер
+    # только ограничивается, чтобы чужие callback_data не засоряли кэш
+    page_number = min(max(page.page, 1), len(terms))
+    if page.page != page_number:
+        page = page.model_copy(update={'page': page_number})
+    
+    return terms_service.page_cache.get_or_render(
+        (page.cat, page.sub, lang, page_number),
+        lambda: render_results_page(terms, page, lang=lang, category=category, subcategory=subcategory)
+    )
+
+
+def _results_header(
+    total_count: int,
+    lang: str,
+    category: Optional[str],
+    subcategory: Optional[str],
+    query: Optional[str]
+) -> str:
+    """Заголовок страницы результатов (с переводом категорий)"""
+    if category is None:
+        return get_text('search_all_results', lang, query=query, count=total_count) + "\n\n"
+    
+    category_display = translate_category(category, lang) if lang == 'ru' else category
+    subcategory_display = translate_subcategory(subcategory, lang) if lang == 'ru' else subcategory
+    if query:
+        header = get_text('search_results', lang, query=query, count=total_count)
+    else:
+        header = get_text('results_found', lang, count=total_count)
+    header += f"\n📂 {category_display} / {subcategory_display}\n\n"
+    return header
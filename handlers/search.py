@@ -0,0 +1,116 @@
+"""
+Обработчики поиска по всей базе (команда /search)
+"""
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from aiogram.fsm.context import FSMContext
+
+from models import UserState
+from services import TermsService
+from services.analytics import AnalyticsService
+from keyboards import get_navigation_keyboard
+from utils.texts import get_text
+from handlers.results import page_for, render_results_page
+
+router = Router()
+terms_service = TermsService()
+analytics = AnalyticsService()
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext):
+    """
+    Обработчик команды /search
+    "/search слово" - сразу ищет по всей базе, "/search" - включает режим поиска
+    
+    Args:
+        message: Входящее сообщение
+        command: Разобранная команда (аргументы - поисковый запрос)
+        state: FSM состояние пользователя
+    """
+    query = command.args
+    
+    if query and query.strip():
+        await _search_all(message, state, query)
+        return
+    
+    data = await state.get_data()
+    lang = data.get('language', 'kk')
+    
+    # Переходим в режим поиска по всей базе
+    await state.set_state(UserState.searching_all)
+    
+    await message.answer(
+        text=get_text('search_all_prompt', lang),
+        reply_markup=get_navigation_keyboard(lang=lang)
+    )
+
+
+@router.message(UserState.searching_all, F.text, ~F.text.startswith('/'))
+async def handle_search_all_query(message: Message, state: FSMContext):
+    """
+    Обработчик текстового ввода в режиме поиска по всей базе
+    
+    Args:
+        message: Входящее сообщение
+        state: FSM состояние пользователя
+    """
+    query = message.text
+    
+    if not query or not query.strip():
+        return
+    
+    await _search_all(message, state, query)
+
+
+async def _search_all(message: Message, state: FSMContext, query: str):
+    """Выполняет поиск по всем категориям и показывает первую страницу"""
+    data = await state.get_data()
+    lang = data.get('language', 'kk')
+    
+    results = terms_service.search_all(query=query, lang=lang)
+    
+    # Логируем поисковый запрос (без категории - поиск по всей базе)
+    username = message.from_user.username or message.from_user.first_name
+    await analytics.log_event(
+        user_id=message.from_user.id,
+        event_type='search',
+        username=username,
+        lang=lang,
+        query=query,
+        results_count=len(results)
+    )
+    
+    # Остаёмся в режиме поиска: следующее сообщение - новый запрос
+    await state.set_state(UserState.searching_all)
+    
+    if not results:
+        await message.answer(
+            text=get_text('no_results_in_filter', lang, query=query),
+            reply_markup=get_navigation_keyboard(lang=lang)
+        )
+        return
+    
+    # Сохраняем описание результатов (запрос и ID терминов)
+    result_set = terms_service.make_result_set(lang, query=query, results=results)
+    await state.update_data(
+        results=result_set.to_state(),
+        current_page=1
+    )
+    
+    # Категория показывается у каждого термина; страница повторного запроса - из кэша.
+    # Пагинация без FSM: запрос передаётся токеном в callback_data
+    message_text, keyboard = render_results_page(
+        results,
+        page_for(result_set, 1),
+        lang=lang,
+        query=query,
+        cache_key=terms_service.search_key(query, lang)
+    )
+    
+    await message.answer(
+        text=message_text,
+        reply_markup=keyboard,
+        parse_mode="Markdown"
+    )
@@ -62,7 +62,7 @@ async def cmd_menu(message: Message, state: FSMContext):
         selected_category=None,
         selected_subcategory=None,
         current_page=1,
-        current_results=[]
+        results=None
     )
     
     # Получаем список категорий
@@ -100,7 +100,7 @@ async def handle_home_action(callback: CallbackQuery, state: FSMContext):
         selected_category=None,
         selected_subcategory=None,
         current_page=1,
-        current_results=[]
+        results=None
     )
     
     # Получаем список категорий
@@ -141,7 +141,7 @@ async def handle_back_action(callback: CallbackQuery, state: FSMContext):
         await state.update_data(
             selected_subcategory=None,
             current_page=1,
-            current_results=[]
+            results=None
         )
         
         message_text = get_text('choose_subcategory', lang, category=category)
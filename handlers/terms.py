@@ -5,23 +5,25 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
-from models import UserState
+from models import UserState, ResultSet
 from services import TermsService
 from services.analytics import AnalyticsService
-from keyboards import get_results_keyboard, get_search_keyboard
-from utils.texts import get_text, translate_category, translate_subcategory
-from utils.formatter import format_results_page
-from config import settings
+from keyboards import ResultsPage, get_search_keyboard
+from utils.texts import get_text
+from utils.category_mapper import get_mapper
+from utils.validators import validate_language
+from handlers.results import browse_page, page_for, render_results_page
 
 router = Router()
 terms_service = TermsService()
 analytics = AnalyticsService()
 
 
-@router.callback_query(F.data == "action:search")
+@router.callback_query(F.data.regexp(r"^action:search(:\d+)?$"))
 async def handle_search_action(callback: CallbackQuery, state: FSMContext):
     """
     Обработчик кнопки "Поиск" - включает режим поиска внутри результатов
+    "action:search:3" - кнопка со страницы 3 (на неё вернёт отмена поиска)
     
     Args:
         callback: Callback от inline кнопки
@@ -31,6 +33,11 @@ async def handle_search_action(callback: CallbackQuery, state: FSMContext):
     lang = data.get('language', 'kk')
     subcategory = data.get('selected_subcategory', '')
     
+    # Пагинация не пишет в FSM, поэтому страница приходит из кнопки
+    page = callback.data.split(":")[2:]
+    if page:
+        await state.update_data(current_page=int(page[0]))
+    
     # Переходим в режим поиска
     await state.set_state(UserState.searching_in_results)
     
@@ -57,7 +64,7 @@ async def handle_cancel_search(callback: CallbackQuery, state: FSMContext):
     """
     data = await state.get_data()
     lang = data.get('language', 'kk')
-    current_results = data.get('current_results', [])
+    result_set = ResultSet.from_state(data.get('results'))
     current_page = data.get('current_page', 1)
     category = data.get('selected_category', '')
     subcategory = data.get('selected_subcategory', '')
@@ -65,30 +72,21 @@ async def handle_cancel_search(callback: CallbackQuery, state: FSMContext):
     # Возвращаемся к просмотру результатов
     await state.set_state(UserState.viewing_results)
     
-    # Формируем сообщение с результатами
-    per_page = settings.RESULTS_PER_PAGE
-    total_count = len(current_results)
-    
-    # Формируем заголовок с категорией и подкатегорией (с переводом)
-    category_display = translate_category(category, lang) if lang == 'ru' else category
-    subcategory_display = translate_subcategory(subcategory, lang) if lang == 'ru' else subcategory
-    header = get_text('results_found', lang, count=total_count)
-    header += f"\n📂 {category_display} / {subcategory_display}\n\n"
-    
-    results_text = format_results_page(current_results, page=current_page, per_page=per_page, show_category=False)
-    
-    message_text = header + results_text
-    
-    # Определяем пагинацию
-    has_prev = current_page > 1
-    has_next = current_page * per_page < total_count
-    
-    keyboard = get_results_keyboard(
-        lang=lang,
-        has_prev=has_prev,
-        has_next=has_next,
-        show_search=True
-    )
+    rendered = None
+    if result_set is not None and result_set.query is None:
+        # Просмотр подкатегории без поиска - готовая страница из кэша
+        rendered = browse_page(category, subcategory, lang, page_for(result_set, current_page))
+    if rendered is None:
+        search_all = result_set is not None and result_set.is_search_all
+        rendered = render_results_page(
+            terms_service.get_results(result_set),
+            page_for(result_set, current_page) if result_set is not None else None,
+            lang=lang,
+            category=None if search_all else category,
+            subcategory=None if search_all else subcategory,
+            query=result_set.query if result_set is not None else None
+        )
+    message_text, keyboard = rendered
     
     await callback.message.edit_text(
         text=message_text,
@@ -152,37 +150,25 @@ async def handle_search_query(message: Message, state: FSMContext):
         )
         return
     
-    # Сохраняем результаты поиска и сбрасываем страницу
+    # Сохраняем описание результатов поиска и сбрасываем страницу
+    result_set = terms_service.make_result_set(lang, category, subcategory, query, results)
     await state.update_data(
-        current_results=results,
+        results=result_set.to_state(),
         current_page=1
     )
     
     # Возвращаемся к просмотру результатов
     await state.set_state(UserState.viewing_results)
     
-    # Формируем сообщение с результатами
-    per_page = settings.RESULTS_PER_PAGE
-    total_count = len(results)
-    
-    # Формируем заголовок с категорией и подкатегорией (с переводом)
-    category_display = translate_category(category, lang) if lang == 'ru' else category
-    subcategory_display = translate_subcategory(subcategory, lang) if lang == 'ru' else subcategory
-    header = get_text('search_results', lang, query=query, count=total_count)
-    header += f"\n📂 {category_display} / {subcategory_display}\n\n"
-    
-    results_text = format_results_page(results, page=1, per_page=per_page, show_category=False)
-    
-    message_text = header + results_text
-    
-    # Определяем пагинацию
-    has_next = total_count > per_page
-    
-    keyboard = get_results_keyboard(
+    # Первая страница повторного запроса берётся из кэша поиска
+    message_text, keyboard = render_results_page(
+        results,
+        page_for(result_set, 1),
         lang=lang,
-        has_prev=False,
-        has_next=has_next,
-        show_search=True
+        category=category,
+        subcategory=subcategory,
+        query=query,
+        cache_key=terms_service.search_key(query, lang, category, subcategory)
     )
     
     await message.answer(
@@ -192,50 +178,68 @@ async def handle_search_query(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data == "action:next_page")
-async def handle_next_page(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(ResultsPage.filter())
+async def handle_results_page(callback: CallbackQuery, callback_data: ResultsPage, state: FSMContext):
     """
-    Обработчик кнопки "Следующая страница"
+    Обработчик кнопок пагинации ("Предыдущая"/"Следующая страница")
+    Выборка восстанавливается из callback_data, состояние FSM не читается
+    и не пишется (кроме запасного пути для неизвестного токена запроса)
     
     Args:
         callback: Callback от inline кнопки
+        callback_data: Упакованная страница результатов
         state: FSM состояние пользователя
     """
-    data = await state.get_data()
-    lang = data.get('language', 'kk')
-    current_results = data.get('current_results', [])
-    current_page = data.get('current_page', 1)
-    category = data.get('selected_category', '')
-    subcategory = data.get('selected_subcategory', '')
-    
-    per_page = 10
-    total_pages = (len(current_results) + per_page - 1) // per_page
-    
-    # Переходим на следующую страницу
-    next_page = min(current_page + 1, total_pages)
-    await state.update_data(current_page=next_page)
-    
-    # Формируем сообщение (с переводом категорий)
-    total_count = len(current_results)
-    category_display = translate_category(category, lang) if lang == 'ru' else category
-    subcategory_display = translate_subcategory(subcategory, lang) if lang == 'ru' else subcategory
-    header = get_text('results_found', lang, count=total_count)
-    header += f"\n📂 {category_display} / {subcategory_display}\n\n"
-    
-    results_text = format_results_page(current_results, page=next_page, per_page=per_page, show_category=False)
-    
-    message_text = header + results_text
-    
-    # Определяем пагинацию
-    has_prev = next_page > 1
-    has_next = next_page < total_pages
+    lang = callback_data.lang if validate_language(callback_data.lang) else 'kk'
+    
+    query = None
+    if callback_data.token:
+        query = terms_service.search_cache.resolve_query(callback_data.token)
+        if query is None:
+            # Токен выдан до перезапуска или вытеснен из кэша: запрос есть в описании выборки пользователя
+            data = await state.get_data()
+            result_set = ResultSet.from_state(data.get('results'))
+            if result_set is not None and result_set.query:
+                if terms_service.search_cache.query_token(result_set.query) == callback_data.token:
+                    query = result_set.query
+                    terms_service.search_cache.register_query(query)
+        if query is None:
+            await callback.answer(get_text('results_expired', lang), show_alert=True)
+            return
+    
+    mapper = get_mapper()
+    category = subcategory = None
+    if callback_data.cat is None:
+        results = terms_service.search_all(query, lang=lang) if query else []
+    else:
+        category = mapper.get_category_name(callback_data.cat)
+        subcategory = mapper.get_subcategory_name(callback_data.sub) if callback_data.sub is not None else None
+        if category is None or subcategory is None:
+            results = []
+        elif query:
+            results = terms_service.search_in_filtered(query, category, subcategory, lang=lang)
+        else:
+            # Просмотр подкатегории: готовая страница из кэша (поиск в словаре)
+            results = None
+    
+    if results is None:
+        rendered = browse_page(category, subcategory, lang, callback_data)
+    elif results:
+        rendered = render_results_page(
+            results,
+            callback_data,
+            lang=lang,
+            category=category,
+            subcategory=subcategory,
+            query=query
+        )
+    else:
+        rendered = None
     
-    keyboard = get_results_keyboard(
-        lang=lang,
-        has_prev=has_prev,
-        has_next=has_next,
-        show_search=True
-    )
+    if rendered is None:
+        await callback.answer(get_text('results_expired', lang), show_alert=True)
+        return
+    message_text, keyboard = rendered
     
     await callback.message.edit_text(
         text=message_text,
@@ -246,10 +250,11 @@ async def handle_next_page(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data == "action:prev_page")
-async def handle_prev_page(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(F.data.in_({"action:next_page", "action:prev_page"}))
+async def handle_legacy_page(callback: CallbackQuery, state: FSMContext):
     """
-    Обработчик кнопки "Предыдущая страница"
+    Кнопки пагинации старого формата в сообщениях, отправленных до перехода
+    на ResultsPage: номера страницы в них нет, поэтому выборка устарела
     
     Args:
         callback: Callback от inline кнопки
@@ -257,45 +262,4 @@ async def handle_prev_page(callback: CallbackQuery, state: FSMContext):
     """
     data = await state.get_data()
     lang = data.get('language', 'kk')
-    current_results = data.get('current_results', [])
-    current_page = data.get('current_page', 1)
-    category = data.get('selected_category', '')
-    subcategory = data.get('selected_subcategory', '')
-    
-    per_page = 10
-    total_pages = (len(current_results) + per_page - 1) // per_page
-    
-    # Переходим на предыдущую страницу
-    prev_page = max(current_page - 1, 1)
-    await state.update_data(current_page=prev_page)
-    
-    # Формируем сообщение (с переводом категорий)
-    total_count = len(current_results)
-    category_display = translate_category(category, lang) if lang == 'ru' else category
-    subcategory_display = translate_subcategory(subcategory, lang) if lang == 'ru' else subcategory
-    header = get_text('results_found', lang, count=total_count)
-    header += f"\n📂 {category_display} / {subcategory_display}\n\n"
-    
-    results_text = format_results_page(current_results, page=prev_page, per_page=per_page, show_category=False)
-    
-    message_text = header + results_text
-    
-    # Определяем пагинацию
-    has_prev = prev_page > 1
-    has_next = prev_page < total_pages
-    
-    keyboard = get_results_keyboard(
-        lang=lang,
-        has_prev=has_prev,
-        has_next=has_next,
-        show_search=True
-    )
-    
-    await callback.message.edit_text(
-        text=message_text,
-        reply_markup=keyboard,
-        parse_mode="Markdown"
-    )
-    
-    await callback.answer()
-
+    await callback.answer(get_text('results_expired', lang), show_alert=True)
@@ -1,8 +1,9 @@
 """
 Клавиатуры для бота
 """
+from .callbacks import ResultsPage
 from .language import get_language_keyboard
-from .categories import get_categories_keyboard, get_subcategories_keyboard
+from .categories import get_categories_keyboard, get_subcategories_keyboard, clear_keyboard_cache
 from .navigation import get_navigation_keyboard, get_results_keyboard, get_search_keyboard
 from .admin import (
     get_admin_main_keyboard,
@@ -13,9 +14,11 @@ from .admin import (
 )
 
 __all__ = [
+    'ResultsPage',
     'get_language_keyboard',
     'get_categories_keyboard',
     'get_subcategories_keyboard',
+    'clear_keyboard_cache',
     'get_navigation_keyboard',
     'get_results_keyboard',
     'get_search_keyboard',
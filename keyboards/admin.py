@@ -39,6 +39,10 @@ def get_admin_main_keyboard(lang: str = 'kk') -> InlineKeyboardMarkup:
             )
         ],
         [
+            InlineKeyboardButton(
+                text="🔄 Обновить базу",
+                callback_data="admin:reload"
+            ),
             InlineKeyboardButton(
                 text="⚙️ Настройки",
                 callback_data="admin:settings"
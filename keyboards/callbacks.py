@@ -0,0 +1,51 @@
+"""
+Упакованные callback_data для кнопок, которые не должны зависеть от FSM
+"""
+from typing import Optional
+from aiogram.filters.callback_data import CallbackData
+
+from models import ResultSet
+
+
+class ResultsPage(CallbackData, prefix="pg"):
+    """
+    Кнопка перехода на страницу результатов
+    
+    Содержит всё, что нужно для отрисовки страницы, поэтому пагинация
+    не читает и не пишет состояние пользователя, а кнопки старых
+    сообщений работают и после перезапуска бота.
+    Пример: "pg:1804289383:846930886:kk:2:" (~30 байт), с токеном запроса
+    "pg:1804289383:846930886:kk:2:Jm0Qx-4b" (ID категорий - хэши названий, до 10 цифр;
+    лимит Telegram - utils.validators.MAX_CALLBACK_DATA_LENGTH).
+    
+    cat/sub = None - результаты поиска по всей базе (/search).
+    token = None - вся подкатегория; иначе токен поискового запроса
+    (SearchCache.query_token).
+    """
+    
+    cat: Optional[int] = None
+    sub: Optional[int] = None
+    lang: str
+    page: int
+    token: Optional[str] = None
+    
+    @classmethod
+    def for_results(cls, result_set: ResultSet, page: int = 1, token: Optional[str] = None) -> 'ResultsPage':
+        """
+        Кнопка страницы для выборки из FSM
+        
+        Args:
+            result_set: Описание выборки
+            page: Номер страницы
+            token: Токен поискового запроса (для выборок поиска)
+        
+        Returns:
+            ResultsPage
+        """
+        return cls(
+            cat=result_set.category_id,
+            sub=result_set.subcategory_id,
+            lang=result_set.lang,
+            page=page,
+            token=token
+        )
@@ -1,20 +1,74 @@
 """
 Клавиатуры для категорий и подкатегорий
+
+Набор категорий и подкатегорий для языка не меняется до перезагрузки
+базы, поэтому клавиатуры строятся один раз и переиспользуются.
 """
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from utils.texts import get_text, translate_category, translate_subcategory
 from utils.category_mapper import get_mapper
 from utils.admin_auth import is_admin
 
+# Готовые клавиатуры (сбрасываются clear_keyboard_cache при перезагрузке базы)
+_categories_keyboards: Dict[Tuple[str, Tuple[str, ...], bool], InlineKeyboardMarkup] = {}
+_subcategories_keyboards: Dict[Tuple[str, Tuple[str, ...]], InlineKeyboardMarkup] = {}
+
 
 def get_categories_keyboard(categories: List[str], lang: str = 'kk', user_id: Optional[int] = None) -> InlineKeyboardMarkup:
     """
-    Создает клавиатуру с категориями (по 2 кнопки в ряд)
+    Клавиатура с категориями (по 2 кнопки в ряд)
+    Строится один раз на (язык, набор категорий, админ или нет)
     
     Args:
         categories: Список названий категорий (на казахском из CSV)
         lang: Язык интерфейса ('kk' или 'ru')
+        user_id: ID пользователя (админам добавляется кнопка админки)
+        
+    Returns:
+        InlineKeyboardMarkup с кнопками категорий (общий объект - не изменять)
+    """
+    key = (lang, tuple(categories), bool(user_id and is_admin(user_id)))
+    keyboard = _categories_keyboards.get(key)
+    if keyboard is None:
+        keyboard = _categories_keyboards[key] = _build_categories_keyboard(*key)
+    return keyboard
+
+
+def get_subcategories_keyboard(subcategories: List[str], lang: str = 'kk', user_id: Optional[int] = None) -> InlineKeyboardMarkup:
+    """
+    Клавиатура с подкатегориями (по 2 кнопки в ряд)
+    Строится один раз на (язык, набор подкатегорий)
+    
+    Args:
+        subcategories: Список названий подкатегорий (на казахском из CSV)
+        lang: Язык интерфейса ('kk' или 'ru')
+        user_id: ID пользователя (не влияет на клавиатуру)
+        
+    Returns:
+        InlineKeyboardMarkup с кнопками подкатегорий (общий объект - не изменять)
+    """
+    key = (lang, tuple(subcategories))
+    keyboard = _subcategories_keyboards.get(key)
+    if keyboard is None:
+        keyboard = _subcategories_keyboards[key] = _build_subcategories_keyboard(*key)
+    return keyboard
+
+
+def clear_keyboard_cache() -> None:
+    """Сбрасывает готовые клавиатуры (после перезагрузки базы терминов)"""
+    _categories_keyboards.clear()
+    _subcategories_keyboards.clear()
+
+
+def _build_categories_keyboard(lang: str, categories: Sequence[str], admin: bool) -> InlineKeyboardMarkup:
+    """
+    Создает клавиатуру с категориями (по 2 кнопки в ряд)
+    
+    Args:
+        lang: Язык интерфейса ('kk' или 'ru')
+        categories: Названия категорий (на казахском из CSV)
+        admin: Добавить кнопку админки
         
     Returns:
         InlineKeyboardMarkup с кнопками категорий
@@ -57,7 +111,7 @@ def get_categories_keyboard(categories: List[str], lang: str = 'kk', user_id: Op
     ]
     
     # Добавляем кнопку админки только для админов
-    if user_id and is_admin(user_id):
+    if admin:
         buttons_row.append(
             InlineKeyboardButton(
                 text="🔐 Админ",
@@ -70,13 +124,13 @@ def get_categories_keyboard(categories: List[str], lang: str = 'kk', user_id: Op
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_subcategories_keyboard(subcategories: List[str], lang: str = 'kk', user_id: Optional[int] = None) -> InlineKeyboardMarkup:
+def _build_subcategories_keyboard(lang: str, subcategories: Sequence[str]) -> InlineKeyboardMarkup:
     """
     Создает клавиатуру с подкатегориями (по 2 кнопки в ряд)
     
     Args:
-        subcategories: Список названий подкатегорий (на казахском из CSV)
         lang: Язык интерфейса ('kk' или 'ru')
+        subcategories: Названия подкатегорий (на казахском из CSV)
         
     Returns:
         InlineKeyboardMarkup с кнопками подкатегорий
@@ -1,8 +1,11 @@
 """
 Навигационные клавиатуры
 """
+from typing import Optional
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from utils.texts import get_text
+from utils.formatter import PagePlan
+from .callbacks import ResultsPage
 
 
 def get_navigation_keyboard(lang: str = 'kk', show_search: bool = False) -> InlineKeyboardMarkup:
@@ -12,7 +15,7 @@ def get_navigation_keyboard(lang: str = 'kk', show_search: bool = False) -> Inli
     Args:
         lang: Язык интерфейса
         show_search: Показывать ли кнопку поиска
-        
+    
     Returns:
         InlineKeyboardMarkup с навигационными кнопками
     """
@@ -44,30 +47,48 @@ def get_navigation_keyboard(lang: str = 'kk', show_search: bool = False) -> Inli
 
 def get_results_keyboard(
     lang: str = 'kk',
-    has_prev: bool = False,
-    has_next: bool = False,
-    show_search: bool = True
+    show_search: bool = True,
+    page: Optional[ResultsPage] = None,
+    plan: Optional[PagePlan] = None
 ) -> InlineKeyboardMarkup:
     """
     Клавиатура для просмотра результатов с пагинацией
     
     Args:
         lang: Язык интерфейса
-        has_prev: Есть ли предыдущая страница
-        has_next: Есть ли следующая страница
         show_search: Показывать ли кнопку поиска
-        
+        page: Текущая страница; кнопки пагинации получают упакованные
+            соседние страницы и работают без состояния FSM
+        plan: План страниц (utils.formatter.plan_pages); вместе с page
+            определяет наличие соседних страниц, а на кнопках показываются
+            номера терминов соседней страницы. Без page и plan кнопок
+            пагинации нет
+    
     Returns:
         InlineKeyboardMarkup с кнопками для результатов
     """
     keyboard = []
     
+    has_prev = has_next = False
+    prev_label = get_text('btn_prev', lang)
+    next_label = get_text('btn_next', lang)
+    if plan is not None and page is not None:
+        has_prev = page.page > 1
+        has_next = page.page < plan.page_count
+        if has_prev:
+            start, end = plan.bounds(page.page - 1)
+            prev_label += f" ({start + 1}-{end})"
+        if has_next:
+            start, end = plan.bounds(page.page + 1)
+            next_label = f"({start + 1}-{end}) " + next_label
+    
     # Кнопка поиска
     if show_search:
         keyboard.append([
             InlineKeyboardButton(
                 text=get_text('btn_search', lang),
-                callback_data="action:search"
+                # Номер страницы - чтобы отмена поиска вернула на неё
+                callback_data=f"action:search:{page.page}" if page is not None else "action:search"
             )
         ])
     
@@ -77,14 +98,14 @@ def get_results_keyboard(
         
         if has_prev:
             pagination_row.append(InlineKeyboardButton(
-                text=get_text('btn_prev', lang),
-                callback_data="action:prev_page"
+                text=prev_label,
+                callback_data=_page_callback(page, -1)
             ))
         
         if has_next:
             pagination_row.append(InlineKeyboardButton(
-                text=get_text('btn_next', lang),
-                callback_data="action:next_page"
+                text=next_label,
+                callback_data=_page_callback(page, 1)
             ))
         
         keyboard.append(pagination_row)
@@ -104,13 +125,18 @@ def get_results_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+def _page_callback(page: ResultsPage, step: int) -> str:
+    """callback_data соседней страницы"""
+    return page.model_copy(update={'page': page.page + step}).pack()
+
+
 def get_search_keyboard(lang: str = 'kk') -> InlineKeyboardMarkup:
     """
     Клавиатура для режима поиска
     
     Args:
         lang: Язык интерфейса
-        
+    
     Returns:
         InlineKeyboardMarkup с кнопками отмены и назад
     """
@@ -3,6 +3,8 @@ Middleware для бота
 """
 from .rate_limit import RateLimitMiddleware
 from .error_handler import ErrorHandlerMiddleware
+from .fsm_buffer import FSMBufferMiddleware
+from .edit_dedup import UnchangedEditMiddleware
 
-__all__ = ['RateLimitMiddleware', 'ErrorHandlerMiddleware']
+__all__ = ['RateLimitMiddleware', 'ErrorHandlerMiddleware', 'FSMBufferMiddleware', 'UnchangedEditMiddleware']
 
@@ -0,0 +1,130 @@
+"""
+Middleware сессии бота: пропуск правок сообщения без изменений
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import DeleteMessage, EditMessageCaption, EditMessageReplyMarkup, EditMessageText, TelegramMethod
+from aiogram.methods.base import TelegramType
+from utils.logger import get_logger
+
+logger = get_logger('edit_dedup')
+
+# Ключ сообщения: (chat_id, message_id)
+MessageKey = Tuple[Any, int]
+
+
+def is_not_modified(error: TelegramBadRequest) -> bool:
+    """Ошибка Telegram «message is not modified» (новый текст и клавиатура совпадают с текущими)"""
+    return 'message is not modified' in error.message
+
+
+class UnchangedEditMiddleware(BaseRequestMiddleware):
+    """
+    Не отправляет editMessageText, если текст и клавиатура не изменились
+    
+    Для каждого (chat_id, message_id) хранится отпечаток последнего
+    отправленного текста и клавиатуры. Повторное нажатие «Далее»/«Назад»
+    или отмена поиска без смены страницы не делают запрос к Telegram и не
+    получают ошибку «message is not modified»; обработчик только отвечает
+    на callback. Регистрируется на сессии бота (bot.session.middleware),
+    поэтому видит правки из всех обработчиков.
+    """
+    
+    def __init__(self, max_size: int = 10000):
+        """
+        Args:
+            max_size: Максимальное количество отслеживаемых сообщений
+        """
+        self.max_size = max_size
+        self._fingerprints: OrderedDict[MessageKey, int] = OrderedDict()
+        
+        # Счётчики
+        self.skipped = 0
+        self.edits = 0
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Any:
+        """Отправка запроса (или пропуск правки без изменений)"""
+        if isinstance(method, EditMessageText):
+            return await self._edit_text(make_request, bot, method)
+        
+        if isinstance(method, (EditMessageReplyMarkup, EditMessageCaption, DeleteMessage)):
+            # Сообщение изменено в обход отпечатков - забываем его
+            key = self._key(method)
+            if key is not None:
+                self._fingerprints.pop(key, None)
+        return await make_request(bot, method)
+    
+    async def _edit_text(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: EditMessageText
+    ) -> Any:
+        """editMessageText с проверкой отпечатка"""
+        key = self._key(method)
+        if key is None:
+            return await make_request(bot, method)
+        
+        fingerprint = self._fingerprint(method)
+        if self._fingerprints.get(key) == fingerprint:
+            self._fingerprints.move_to_end(key)
+            self.skipped += 1
+            logger.debug(f"Правка без изменений пропущена: {key}")
+            # Для правки без изменений Telegram тоже вернул бы ошибку, а не сообщение
+            return True
+        
+        # Отпечаток записывается до запроса: параллельное повторное нажатие
+        # с тем же содержимым будет пропущено, пока первое ещё выполняется
+        self._remember(key, fingerprint)
+        self.edits += 1
+        try:
+            return await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if is_not_modified(e):
+                # Сообщение уже такое (например, отпечаток был вытеснен)
+                self.skipped += 1
+                return True
+            self._fingerprints.pop(key, None)
+            raise
+        except Exception:
+            self._fingerprints.pop(key, None)
+            raise
+    
+    def _remember(self, key: MessageKey, fingerprint: int) -> None:
+        """Сохраняет отпечаток (с вытеснением самых давних сообщений)"""
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+        while len(self._fingerprints) > self.max_size:
+            self._fingerprints.popitem(last=False)
+    
+    @staticmethod
+    def _key(method: TelegramMethod) -> Optional[MessageKey]:
+        """(chat_id, message_id) или None для inline-сообщений"""
+        chat_id = getattr(method, 'chat_id', None)
+        message_id = getattr(method, 'message_id', None)
+        if chat_id is None or message_id is None:
+            return None
+        return chat_id, message_id
+    
+    @staticmethod
+    def _fingerprint(method: EditMessageText) -> int:
+        """Отпечаток содержимого правки: текст, режим разметки и клавиатура"""
+        markup = method.reply_markup.model_dump_json(exclude_none=True) if method.reply_markup else None
+        return hash((method.text, repr(method.parse_mode), markup))
+    
+    def stats(self) -> Dict[str, int]:
+        """Счётчики: отправлено правок, пропущено, отслеживается сообщений"""
+        return {
+            'edits': self.edits,
+            'skipped': self.skipped,
+            'tracked': len(self._fingerprints),
+        }
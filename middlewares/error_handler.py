@@ -4,7 +4,7 @@ Middleware для глобальной обработки ошибок
 import traceback
 from typing import Any, Awaitable, Callable, Dict
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, Update, ErrorEvent
+from aiogram.types import CallbackQuery, TelegramObject, Update, ErrorEvent
 from aiogram.exceptions import (
     TelegramBadRequest,
     TelegramNetworkError,
@@ -16,6 +16,8 @@ from utils.logger import get_logger
 from utils.admin_auth import is_admin
 from config import settings
 
+from .edit_dedup import is_not_modified
+
 logger = get_logger('error_handler')
 
 
@@ -39,6 +41,13 @@ class ErrorHandlerMiddleware(BaseMiddleware):
             # Не отправляем сообщение пользователю, просто логируем
             return
         except TelegramBadRequest as e:
+            if is_not_modified(e):
+                # Повторное нажатие: сообщение уже показывает то же самое - это не ошибка
+                logger.debug(f"TelegramBadRequest: {e.message}")
+                if isinstance(event, CallbackQuery):
+                    await event.answer()
+                return
+            
             # Неправильный запрос (например, слишком длинное сообщение)
             logger.error(f"TelegramBadRequest: {e.message}")
             
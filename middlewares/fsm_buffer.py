@@ -0,0 +1,132 @@
+"""
+Middleware для буферизации состояния FSM в пределах одного обновления
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject
+from utils.logger import get_logger
+
+logger = get_logger('fsm_buffer')
+
+
+class BufferedFSMContext(FSMContext):
+    """
+    FSMContext, который читает хранилище один раз и пишет один раз
+    
+    Состояние и данные загружаются при первом обращении, все
+    get/set/update_data работают с копией в памяти, а flush() в конце
+    обновления записывает изменения одним вызовом (или ничего, если
+    данные не изменились).
+    """
+    
+    def __init__(self, storage: BaseStorage, key: StorageKey, raw_state: Optional[str] = None):
+        """
+        Args:
+            storage: Хранилище FSM
+            key: Ключ пользователя
+            raw_state: Состояние, уже прочитанное FSMContextMiddleware
+        """
+        super().__init__(storage=storage, key=key)
+        self._state: Optional[str] = raw_state
+        self._initial_state: Optional[str] = raw_state
+        self._data: Optional[Dict[str, Any]] = None
+        self._initial_data: Optional[Dict[str, Any]] = None
+    
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+    
+    async def get_state(self) -> Optional[str]:
+        return self._state
+    
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        await self._load_data()
+        self._data = data.copy()
+    
+    async def get_data(self) -> Dict[str, Any]:
+        return (await self._load_data()).copy()
+    
+    async def update_data(self, data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        current = await self._load_data()
+        self._data = {**current, **kwargs}
+        return self._data.copy()
+    
+    async def _load_data(self) -> Dict[str, Any]:
+        """Данные пользователя (из хранилища - только при первом обращении)"""
+        if self._data is None:
+            self._initial_data = await self.storage.get_data(key=self.key)
+            self._data = self._initial_data.copy()
+        return self._data
+    
+    async def flush(self) -> int:
+        """
+        Записывает накопленные изменения в хранилище
+        
+        Returns:
+            Количество вызовов хранилища (0 - ничего не изменилось)
+        """
+        state_changed = self._state != self._initial_state
+        data_changed = self._data is not None and self._data != self._initial_data
+        if not state_changed and not data_changed:
+            return 0
+        
+        set_record = getattr(self.storage, 'set_record', None)
+        if set_record is not None:
+            # Хранилище умеет записывать состояние и данные одной операцией
+            data = self._data if data_changed else None
+            await set_record(self.key, self._state, data)
+            calls = 1
+        else:
+            calls = 0
+            if state_changed:
+                await self.storage.set_state(key=self.key, state=self._state)
+                calls += 1
+            if data_changed:
+                await self.storage.set_data(key=self.key, data=self._data)
+                calls += 1
+        
+        self._initial_state = self._state
+        if data_changed:
+            self._initial_data = self._data.copy()
+        return calls
+
+
+class FSMBufferMiddleware(BaseMiddleware):
+    """
+    Подменяет FSMContext обработчиков буферизованным (BufferedFSMContext)
+    
+    Регистрируется как outer middleware на dp.update после
+    FSMContextMiddleware aiogram: обработчик может сколько угодно раз
+    вызывать get_data/update_data/set_state, а в хранилище уходит одно
+    чтение данных и одна объединённая запись в конце обновления.
+    
+    Запись целиком перезаписывает данные пользователя, поэтому диспетчер
+    должен изолировать обновления одного пользователя
+    (Dispatcher(events_isolation=SimpleEventIsolation())): иначе
+    параллельное обновление (двойное нажатие) затрёт чужие изменения.
+    """
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Обработка события с буферизацией состояния"""
+        context = data.get('state')
+        if context is None:
+            return await handler(event, data)
+        
+        buffered = BufferedFSMContext(context.storage, context.key, raw_state=data.get('raw_state'))
+        data['state'] = buffered
+        try:
+            return await handler(event, data)
+        finally:
+            try:
+                await buffered.flush()
+            except Exception as e:
+                logger.error(f"Ошибка записи состояния FSM: {e}", exc_info=True)
@@ -2,6 +2,7 @@
 Модели данных для бота
 """
 from .user_state import UserState
+from .term import Term
+from .result_set import ResultSet
 
-__all__ = ['UserState']
-
+__all__ = ['UserState', 'Term', 'ResultSet']
@@ -0,0 +1,83 @@
+"""
+Компактное описание текущих результатов пользователя (хранится в FSM)
+"""
+from typing import Any, Dict, List, Optional
+
+
+class ResultSet:
+    """
+    Описание выборки вместо самих терминов в состоянии FSM
+    
+    Хранится версия базы, ID категории/подкатегории, запрос и (для поиска)
+    ID найденных терминов. Термины страницы берутся из TermsService по
+    требованию (TermsService.get_results), поэтому состояние пользователя
+    занимает сотни байт независимо от размера выборки.
+    
+    category_id = None - поиск по всей базе (/search).
+    term_ids = None - вся подкатегория (восстанавливается из кэша групп).
+    """
+    
+    __slots__ = ('version', 'lang', 'category_id', 'subcategory_id', 'query', 'term_ids')
+    
+    def __init__(
+        self,
+        version: str,
+        lang: str,
+        category_id: Optional[int] = None,
+        subcategory_id: Optional[int] = None,
+        query: Optional[str] = None,
+        term_ids: Optional[List[int]] = None
+    ):
+        """
+        Args:
+            version: Версия базы (TermsService.dataset_hash), для которой верны term_ids
+            lang: Язык терминов
+            category_id: ID категории (CategoryMapper) или None для поиска по всей базе
+            subcategory_id: ID подкатегории (CategoryMapper)
+            query: Поисковый запрос (None - просмотр подкатегории)
+            term_ids: ID терминов в порядке показа (None - вся подкатегория)
+        """
+        self.version = version
+        self.lang = lang
+        self.category_id = category_id
+        self.subcategory_id = subcategory_id
+        self.query = query
+        self.term_ids = list(term_ids) if term_ids is not None else None
+    
+    @property
+    def is_search_all(self) -> bool:
+        """Результаты поиска по всей базе (/search)"""
+        return self.category_id is None
+    
+    def to_state(self) -> Dict[str, Any]:
+        """Словарь для сохранения в FSM (только простые типы)"""
+        return {
+            'version': self.version,
+            'lang': self.lang,
+            'category_id': self.category_id,
+            'subcategory_id': self.subcategory_id,
+            'query': self.query,
+            'term_ids': self.term_ids,
+        }
+    
+    @classmethod
+    def from_state(cls, data: Optional[Dict[str, Any]]) -> Optional['ResultSet']:
+        """
+        Восстанавливает описание из FSM
+        
+        Args:
+            data: Словарь из to_state() или None
+        
+        Returns:
+            ResultSet или None, если результатов нет
+        """
+        if not data:
+            return None
+        return cls(
+            version=data.get('version', ''),
+            lang=data.get('lang', 'kk'),
+            category_id=data.get('category_id'),
+            subcategory_id=data.get('subcategory_id'),
+            query=data.get('query'),
+            term_ids=data.get('term_ids')
+        )
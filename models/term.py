@@ -0,0 +1,77 @@
+"""
+Компактное представление термина из базы данных
+"""
+import sys
+from typing import Dict, Optional
+
+
+class Term:
+    """
+    Запись термина на __slots__ (вместо Dict[str, str] на каждую строку CSV)
+
+    Поддерживает чтение в стиле словаря (term['term'], term.get('lang')),
+    поэтому форматтеры и обработчики работают с ней так же, как со строкой CSV.
+    Категория, подкатегория и язык интернированы и разделяются всеми терминами.
+    Готовые Markdown-фрагменты (utils.formatter) кэшируются на самой записи
+    и пересоздаются вместе с ней при перезагрузке базы.
+    """
+
+    FIELDS = ('term', 'description', 'category', 'subcategory', 'lang')
+
+    __slots__ = (
+        'id', 'term', 'description', 'category', 'subcategory', 'lang',
+        'markdown', 'markdown_with_category'
+    )
+
+    def __init__(
+        self,
+        term_id: int,
+        term: str,
+        description: str = '',
+        category: str = '',
+        subcategory: str = '',
+        lang: str = ''
+    ):
+        self.id = term_id
+        self.term = term
+        self.description = description
+        self.category = sys.intern(category)
+        self.subcategory = sys.intern(subcategory)
+        self.lang = sys.intern(lang)
+        # Отрисованный термин без метаданных и с категорией/подкатегорией
+        self.markdown: Optional[str] = None
+        self.markdown_with_category: Optional[str] = None
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Получить поле по имени колонки CSV (аналог dict.get)"""
+        if key in Term.FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key: str) -> str:
+        if key not in Term.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in Term.FIELDS
+
+    def keys(self):
+        return Term.FIELDS
+
+    def to_dict(self) -> Dict[str, str]:
+        """Преобразовать в словарь (для экспорта и сериализации)"""
+        return {field: getattr(self, field) for field in Term.FIELDS}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Term):
+            return self.id == other.id and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"Term(id={self.id}, term={self.term!r}, lang={self.lang!r})"
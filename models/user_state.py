@@ -12,6 +12,8 @@ class UserState(StatesGroup):
     choosing_language → choosing_category → choosing_subcategory → viewing_results
                                                                     ↓
                                                             searching_in_results
+    
+    /search (из любого состояния) → searching_all
     """
     
     # Выбор языка интерфейса
@@ -28,4 +30,7 @@ class UserState(StatesGroup):
     
     # Поиск внутри отфильтрованных результатов
     searching_in_results = State()
+    
+    # Поиск по всей базе (команда /search)
+    searching_all = State()
 
@@ -4,10 +4,15 @@
 import asyncio
 import csv
 import json
-from datetime import datetime, timedelta
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
-from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from services.analytics_log import COLUMNS, event_row
+from services.analytics_query import DailyHistogram, Metric, TopK, is_failed_search, lower_query
+from services.analytics_store import create_analytics_store
 from utils.logger import get_logger
 
 logger = get_logger('services.analytics')
@@ -29,33 +34,31 @@ class AnalyticsService:
             return
         
         self.data_dir = Path('data')
-        self.analytics_file = self.data_dir / 'analytics.csv'
         self.backups_dir = self.data_dir / 'backups'
         
         # Создаём директории если их нет
         self.data_dir.mkdir(exist_ok=True)
         self.backups_dir.mkdir(exist_ok=True)
         
-        # Инициализируем файл аналитики
-        self._ensure_analytics_file()
+        # Хранилище событий (ANALYTICS_STORAGE: CSV-журнал по дням или SQLite)
+        self._store = create_analytics_store(self.data_dir)
+        self._maintained_on: Optional[date] = None
+        self._maintain()
         
         # Асинхронная очередь для событий
         self._queue: Optional[asyncio.Queue] = None
         self._worker_task: Optional[asyncio.Task] = None
         self._running = False
         
+        # Результаты экранов статистики: ключ -> (время расчёта, результат).
+        # Действительны, пока хранилище не изменилось и не истёк TTL
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self._results_version: Hashable = ()
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        
         AnalyticsService._initialized = True
     
-    def _ensure_analytics_file(self):
-        """Создаёт файл аналитики с заголовками если его нет"""
-        if not self.analytics_file.exists():
-            with open(self.analytics_file, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp', 'user_id', 'username', 'event_type', 
-                    'lang', 'category', 'subcategory', 'query', 'results_count'
-                ])
-    
     async def start(self):
         """Запуск фонового воркера для записи событий"""
         if self._running:
@@ -73,6 +76,10 @@ class AnalyticsService:
             await self._queue.put(None)  # Сигнал остановки
         if self._worker_task:
             await self._worker_task
+        if self._process_pool:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        self._store.close()
     
     async def _worker(self):
         """Фоновый воркер для записи событий в файл"""
@@ -111,32 +118,32 @@ class AnalyticsService:
             await self._write_batch(batch)
     
     async def _write_batch(self, batch: List[Dict]):
-        """Асинхронная запись батча событий в файл"""
+        """Асинхронная запись батча событий в хранилище"""
         if not batch:
             return
         
         # Используем asyncio.to_thread для неблокирующей записи
         def write_to_file():
             try:
-                with open(self.analytics_file, 'a', encoding='utf-8', newline='') as f:
-                    writer = csv.writer(f)
-                    for event in batch:
-                        writer.writerow([
-                            event['timestamp'],
-                            event['user_id'],
-                            event['username'],
-                            event['event_type'],
-                            event['lang'],
-                            event['category'],
-                            event['subcategory'],
-                            event['query'],
-                            event['results_count']
-                        ])
+                self._store.append([event_row(event) for event in batch])
             except Exception as e:
                 logger.error(f"Ошибка при записи аналитики: {e}", exc_info=True)
+                return
+            if self._maintained_on != date.today():
+                self._maintain()
         
         await asyncio.to_thread(write_to_file)
     
+    def _maintain(self) -> None:
+        """Раз в день: сжатие закрытых дней и удаление событий старше ANALYTICS_RETENTION_DAYS"""
+        from config import settings
+        today = date.today()
+        try:
+            self._store.maintain(today, settings.ANALYTICS_RETENTION_DAYS)
+        except Exception as e:
+            logger.error(f"Ошибка при обслуживании хранилища аналитики: {e}", exc_info=True)
+        self._maintained_on = today
+    
     async def log_event(
         self,
         user_id: int,
@@ -188,92 +195,36 @@ class AnalyticsService:
         """
         Получить статистику за последние N дней
         
+        CSV - сумма дневных агрегатов (O(days)), SQLite - агрегаты по индексу
+        времени; журнал целиком не читается. Период - календарные дни с
+        (сегодня - N) по сегодня.
+        
         Args:
             days: Количество дней для анализа
-            
+        
         Returns:
             Словарь со статистикой
         """
-        if not self.analytics_file.exists():
-            return self._empty_stats()
+        return self._store.stats(days)
+    
+    def query(self, days: int, metrics: Sequence[Metric]) -> Dict[str, Any]:
+        """
+        Считает метрики за последние N дней за один проход по хранилищу
         
-        cutoff_date = datetime.now() - timedelta(days=days)
-        events = []
+        Args:
+            days: Количество дней для анализа
+            metrics: Метрики (services.analytics_query)
         
+        Returns:
+            Словарь {имя метрики: результат} (пустой при ошибке чтения)
+        """
+        since = (datetime.now() - timedelta(days=days)).isoformat()
         try:
-            with open(self.analytics_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        event_time = datetime.fromisoformat(row['timestamp'])
-                        if event_time >= cutoff_date:
-                            events.append(row)
-                    except (ValueError, KeyError):
-                        continue
+            func, args, _ = self._store.query_task(since, metrics)
+            return func(*args)
         except Exception as e:
             logger.error(f"Ошибка при чтении аналитики: {e}", exc_info=True)
-            return self._empty_stats()
-        
-        if not events:
-            return self._empty_stats()
-        
-        # Уникальные пользователи
-        unique_users = set(int(e['user_id']) for e in events if e['user_id'].isdigit())
-        
-        # Статистика по языкам
-        lang_counter = Counter(e['lang'] for e in events if e['lang'])
-        
-        # Статистика по категориям
-        category_counter = Counter(e['category'] for e in events if e['category'] and e['event_type'] == 'category_selected')
-        
-        # Статистика по поисковым запросам
-        search_events = [e for e in events if e['event_type'] == 'search']
-        query_counter = Counter(e['query'].lower() for e in search_events if e['query'])
-        
-        # Успешные/неуспешные поиски
-        successful_searches = sum(1 for e in search_events if int(e.get('results_count', 0)) > 0)
-        failed_searches = len(search_events) - successful_searches
-        
-        # События сегодня
-        today = datetime.now().date()
-        today_events = [e for e in events if datetime.fromisoformat(e['timestamp']).date() == today]
-        today_users = set(int(e['user_id']) for e in today_events if e['user_id'].isdigit())
-        
-        return {
-            'period_days': days,
-            'total_events': len(events),
-            'unique_users': len(unique_users),
-            'unique_users_today': len(today_users),
-            'languages': dict(lang_counter),
-            'top_categories': dict(category_counter.most_common(10)),
-            'top_queries': dict(query_counter.most_common(10)),
-            'search_stats': {
-                'total': len(search_events),
-                'successful': successful_searches,
-                'failed': failed_searches,
-                'success_rate': (successful_searches / len(search_events) * 100) if search_events else 0
-            },
-            'events_today': len(today_events)
-        }
-    
-    def _empty_stats(self) -> Dict:
-        """Возвращает пустую статистику"""
-        return {
-            'period_days': 0,
-            'total_events': 0,
-            'unique_users': 0,
-            'unique_users_today': 0,
-            'languages': {},
-            'top_categories': {},
-            'top_queries': {},
-            'search_stats': {
-                'total': 0,
-                'successful': 0,
-                'failed': 0,
-                'success_rate': 0
-            },
-            'events_today': 0
-        }
+            return {}
     
     def get_failed_queries(self, days: int = 7, limit: int = 10) -> List[Dict]:
         """
@@ -282,38 +233,14 @@ class AnalyticsService:
         Args:
             days: Количество дней для анализа
             limit: Максимальное количество результатов
-            
+        
         Returns:
             Список словарей с запросами и количеством попыток
         """
-        if not self.analytics_file.exists():
-            return []
-        
-        cutoff_date = datetime.now() - timedelta(days=days)
-        failed_queries = []
-        
-        try:
-            with open(self.analytics_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        event_time = datetime.fromisoformat(row['timestamp'])
-                        if (event_time >= cutoff_date and 
-                            row['event_type'] == 'search' and 
-                            int(row.get('results_count', 0)) == 0 and
-                            row.get('query')):
-                            failed_queries.append(row['query'].lower())
-                    except (ValueError, KeyError):
-                        continue
-        except Exception as e:
-            logger.error(f"Ошибка при чтении аналитики: {e}", exc_info=True)
-            return []
-        
-        # Подсчитываем частоту
-        query_counter = Counter(failed_queries)
+        result = self.query(days, [TopK('failed_queries', lower_query, limit, where=is_failed_search)])
         return [
             {'query': query, 'count': count}
-            for query, count in query_counter.most_common(limit)
+            for query, count in result.get('failed_queries', [])
         ]
     
     def get_user_activity(self, days: int = 7) -> Dict:
@@ -322,40 +249,113 @@ class AnalyticsService:
         
         Args:
             days: Количество дней для анализа
-            
+        
         Returns:
             Словарь с активностью по дням
         """
-        if not self.analytics_file.exists():
-            return {}
-        
-        cutoff_date = datetime.now() - timedelta(days=days)
-        daily_activity = defaultdict(int)
-        
+        return self.query(days, [DailyHistogram('daily_activity')]).get('daily_activity', {})
+    
+    # Асинхронные варианты для обработчиков: чтение идёт в пуле потоков
+    # (или в отдельном процессе для большого журнала), а повторные
+    # открытия экрана берут результат из кэша, не блокируя обработку обновлений.
+    
+    async def get_stats_async(self, days: int = 7) -> Dict:
+        """Асинхронный get_stats (с кэшем результата)"""
+        return await self._cached(('stats', days), lambda: asyncio.to_thread(self.get_stats, days))
+    
+    async def query_async(self, days: int, metrics: Sequence[Metric]) -> Dict[str, Any]:
+        """Асинхронный query (с кэшем результата по описанию метрик)"""
+        key = ('query', days, tuple(metric.signature() for metric in metrics))
         try:
-            with open(self.analytics_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        event_time = datetime.fromisoformat(row['timestamp'])
-                        if event_time >= cutoff_date:
-                            date_key = event_time.date().isoformat()
-                            daily_activity[date_key] += 1
-                    except (ValueError, KeyError):
-                        continue
+            return await self._cached(key, lambda: self._run_query_async(days, metrics))
         except Exception as e:
+            # Ошибка не кэшируется: следующее открытие экрана повторит чтение
             logger.error(f"Ошибка при чтении аналитики: {e}", exc_info=True)
             return {}
+    
+    async def get_user_activity_async(self, days: int = 7) -> Dict:
+        """Асинхронный get_user_activity (с кэшем результата)"""
+        result = await self.query_async(days, [DailyHistogram('daily_activity')])
+        return result.get('daily_activity', {})
+    
+    async def _run_query_async(self, days: int, metrics: Sequence[Metric]) -> Dict[str, Any]:
+        """
+        Запрос вне цикла событий
         
-        return dict(daily_activity)
+        Запрос выполняется в потоке или, если хранилищу нужно прочитать не
+        меньше ANALYTICS_PROCESS_POOL_MIN_SIZE байт, в отдельном процессе
+        (разбор CSV не конкурирует с ботом за GIL).
+        """
+        from config import settings
+        since = (datetime.now() - timedelta(days=days)).isoformat()
+        func, args, size = await asyncio.to_thread(self._store.query_task, since, metrics)
+        if size >= settings.ANALYTICS_PROCESS_POOL_MIN_SIZE:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_process_pool(), func, *args)
+        return await asyncio.to_thread(func, *args)
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Пул из одного процесса для чтения большого журнала (создаётся при первом запросе)"""
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._process_pool
+    
+    async def _cached(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Результат из кэша или compute() с сохранением
+        
+        Одновременные запросы с одним ключом ждут один расчёт.
+        
+        Args:
+            key: Ключ результата (метрика, период, параметры)
+            compute: Расчёт результата
+        
+        Returns:
+            Результат (общий объект - не изменять)
+        """
+        from config import settings
+        # Версия CSV - обход каталога журнала, SQLite - запрос к базе: вне цикла событий
+        version = await asyncio.to_thread(self._log_version)
+        if version != self._results_version:
+            # Журнал изменился - прежние результаты устарели
+            self._results.clear()
+            self._results_version = version
+        
+        cached = self._results.get(key)
+        if cached is not None and time.monotonic() - cached[0] < settings.ANALYTICS_CACHE_TTL:
+            return cached[1]
+        
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # shield: отмена одного обработчика не отменяет общий расчёт
+        result = await asyncio.shield(task)
+        if self._results_version == version:
+            self._results[key] = (time.monotonic(), result)
+        return result
+    
+    def _log_version(self) -> Hashable:
+        """Версия хранилища для кэша результатов"""
+        try:
+            return self._store.version()
+        except Exception:
+            return ()
+    
+    def log_size(self) -> int:
+        """Размер хранилища аналитики на диске в байтах"""
+        return self._store.size()
     
     def export_analytics(self, output_path: Optional[Path] = None) -> Path:
         """
-        Экспорт аналитики в CSV
+        Экспорт аналитики в CSV (все события одним файлом)
         
         Args:
             output_path: Путь для сохранения (если None - создаст автоматически)
-            
+        
         Returns:
             Путь к экспортированному файлу
         """
@@ -363,9 +363,10 @@ class AnalyticsService:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             output_path = self.data_dir / f'analytics_export_{timestamp}.csv'
         
-        if self.analytics_file.exists():
-            import shutil
-            shutil.copy(self.analytics_file, output_path)
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(self._store.iter_rows())
         
         return output_path
 
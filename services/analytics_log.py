@@ -0,0 +1,321 @@
+"""
+Журнал аналитики, разбитый по дням (data/analytics/YYYY-MM-DD.csv)
+
+Строка журнала - одно событие; колонки перечислены в COLUMNS. Событие
+пишется в файл дня своей метки времени. Закрытые дни сжимаются в
+YYYY-MM-DD.csv.gz, дни старше срока хранения удаляются. Запрос за период
+читает только файлы дней периода, а не всю историю.
+
+Чтение идёт с произвольного байтового смещения и возвращает смещение
+конца каждой записи, чтобы агрегаты могли продолжать с того места, где
+остановились.
+"""
+import csv
+import gzip
+import os
+import shutil
+import struct
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger('services.analytics_log')
+
+# Порядок колонок в CSV
+COLUMNS = (
+    'timestamp', 'user_id', 'username', 'event_type',
+    'lang', 'category', 'subcategory', 'query', 'results_count'
+)
+
+# Индексы колонок для разбора строк без csv.DictReader
+TIMESTAMP, USER_ID, USERNAME, EVENT_TYPE, LANG, CATEGORY, SUBCATEGORY, QUERY, RESULTS_COUNT = range(len(COLUMNS))
+
+# Файлы дней: открытый и сжатый
+PLAIN_SUFFIX = '.csv'
+GZIP_SUFFIX = '.csv.gz'
+
+
+def event_row(event: Dict) -> List[str]:
+    """
+    Строка CSV для события из очереди AnalyticsService
+    
+    Args:
+        event: Событие (ключи - COLUMNS)
+    
+    Returns:
+        Значения колонок в виде строк
+    """
+    return [str(event[column]) for column in COLUMNS]
+
+
+def event_day(row: List[str]) -> str:
+    """Дата события 'YYYY-MM-DD' (префикс ISO-метки времени, без разбора datetime)"""
+    return row[TIMESTAMP][:10]
+
+
+def iter_rows(path: Path, offset: int = 0) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Записи журнала начиная с байтового смещения
+    
+    Запись может занимать несколько строк (поле в кавычках с переводом
+    строки): строки накапливаются, пока число кавычек не станет чётным.
+    Заголовок и неполная последняя запись (файл дописывается) пропускаются.
+    Сжатые файлы (.gz) читаются так же, смещения - в распакованных данных.
+    
+    Args:
+        path: Путь к CSV (или CSV.gz)
+        offset: Смещение начала записи (0 - с начала файла)
+    
+    Yields:
+        (смещение конца записи, значения колонок)
+    """
+    opener = gzip.open if path.name.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+        end = offset
+        pending = b''
+        for line in f:
+            end += len(line)
+            if pending or b'"' in line:
+                pending += line
+                if pending.count(b'"') % 2 or not line.endswith(b'\n'):
+                    continue
+                record, pending = pending.decode('utf-8', errors='replace'), b''
+                row = next(csv.reader([record]), None)
+            elif line.endswith(b'\n'):
+                # Без кавычек запись - просто значения через запятую
+                row = line.decode('utf-8', errors='replace').rstrip('\r\n').split(',')
+            else:
+                continue
+            if not row or len(row) != len(COLUMNS) or row[TIMESTAMP] == 'timestamp':
+                continue
+            yield end, row
+
+
+def data_size(path: Path) -> int:
+    """
+    Размер распакованных данных файла дня (в тех же единицах, что смещения iter_rows)
+    
+    Для .gz берётся из трейлера gzip (ISIZE - размер по модулю 2**32,
+    файл дня заведомо меньше), файл не распаковывается.
+    """
+    if not path.name.endswith('.gz'):
+        return path.stat().st_size
+    with open(path, 'rb') as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack('<I', f.read(4))[0]
+
+
+class AnalyticsLog:
+    """
+    Каталог файлов дней журнала аналитики
+    
+    Запись, сжатие и удаление старых дней выполняются из потока записи
+    воркера AnalyticsService; чтение - из пула потоков или отдельного
+    процесса. Сжатый файл появляется атомарно (rename), поэтому читатель
+    всегда видит полный файл.
+    """
+    
+    def __init__(self, directory: Path):
+        """
+        Args:
+            directory: Каталог файлов дней (data/analytics)
+        """
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+    
+    def path_for(self, day: str) -> Path:
+        """Открытый (несжатый) файл дня"""
+        return self.directory / f'{day}{PLAIN_SUFFIX}'
+    
+    def partitions(self, since_day: Optional[str] = None) -> List[Tuple[str, Path]]:
+        """
+        Файлы дней по порядку дат
+        
+        Args:
+            since_day: Первый нужный день 'YYYY-MM-DD' (None - все дни)
+        
+        Returns:
+            Список (день, путь); если у дня есть сжатый файл - путь к .csv.gz
+        """
+        days: Dict[str, Path] = {}
+        for path in self.directory.iterdir():
+            name = path.name
+            if name.endswith(GZIP_SUFFIX):
+                day = name[:-len(GZIP_SUFFIX)]
+            elif name.endswith(PLAIN_SUFFIX):
+                day = name[:-len(PLAIN_SUFFIX)]
+                if day in days:
+                    continue
+            else:
+                continue
+            if len(day) == 10 and (since_day is None or day >= since_day):
+                days[day] = path
+        return sorted(days.items())
+    
+    def append(self, rows: Sequence[List[str]]) -> Dict[str, Tuple[List[List[str]], int]]:
+        """
+        Дописывает строки в файлы их дней
+        
+        Args:
+            rows: Строки журнала (event_row)
+        
+        Returns:
+            {день: (строки дня, размер файла дня после записи)}
+        """
+        by_day: Dict[str, List[List[str]]] = defaultdict(list)
+        for row in rows:
+            by_day[event_day(row)].append(row)
+        
+        written = {}
+        with self._lock:
+            for day, day_rows in by_day.items():
+                path = self.path_for(day)
+                new_file = not path.exists()
+                with open(path, 'a', encoding='utf-8', newline='') as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(COLUMNS)
+                    writer.writerows(day_rows)
+                written[day] = (day_rows, path.stat().st_size)
+        return written
+    
+    def compact(self, today: date, retention_days: int = 0) -> List[str]:
+        """
+        Сжимает закрытые дни и удаляет дни старше срока хранения
+        
+        Закрытым считается день раньше вчерашнего: события, поставленные в
+        очередь перед полуночью, ещё могут дописываться во вчерашний файл.
+        
+        Args:
+            today: Текущая дата
+            retention_days: Сколько дней хранить (0 - без ограничения)
+        
+        Returns:
+            Удалённые дни (для удаления их агрегатов)
+        """
+        closed_before = (today - timedelta(days=1)).isoformat()
+        keep_from = (today - timedelta(days=retention_days)).isoformat() if retention_days else ''
+        removed = []
+        with self._lock:
+            for day, path in self.partitions():
+                if day < keep_from:
+                    self._remove_day(day)
+                    removed.append(day)
+                elif day < closed_before:
+                    self._compress(day)
+        if removed:
+            logger.info(f"Удалены дни аналитики старше {retention_days} дней: {len(removed)}")
+        return removed
+    
+    def _compress(self, day: str) -> None:
+        """Сжимает файл дня (временный файл + rename, затем удаление исходного)"""
+        path = self.path_for(day)
+        if not path.exists():
+            return
+        gz_path = self.directory / f'{day}{GZIP_SUFFIX}'
+        try:
+            if not gz_path.exists():
+                tmp_path = gz_path.with_name(gz_path.name + '.tmp')
+                with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp_path, gz_path)
+            # Сжатый файл уже есть (в том числе после прерванного сжатия) - исходный не нужен
+            path.unlink()
+        except OSError as e:
+            logger.error(f"Ошибка при сжатии {path}: {e}", exc_info=True)
+    
+    def _remove_day(self, day: str) -> None:
+        """Удаляет файлы дня (открытый и сжатый)"""
+        for suffix in (PLAIN_SUFFIX, GZIP_SUFFIX):
+            try:
+                (self.directory / f'{day}{suffix}').unlink()
+            except FileNotFoundError:
+                pass
+    
+    def migrate(self, legacy_path: Path) -> bool:
+        """
+        Переносит прежний единый журнал (data/analytics.csv) в файлы дней
+        
+        Выполняется, только если файлов дней ещё нет. Файлы пишутся во
+        временный каталог и затем переносятся в каталог журнала (посторонние
+        файлы в нём не мешают); исходный журнал переименовывается в
+        analytics.csv.migrated. При ошибке перенесённые файлы удаляются, и
+        перенос повторяется при следующем запуске.
+        
+        Args:
+            legacy_path: Путь к прежнему журналу
+        
+        Returns:
+            True, если перенос выполнен
+        """
+        if not legacy_path.exists() or self.partitions():
+            return False
+        
+        tmp_dir = self.directory.with_name(self.directory.name + '.migrating')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_log = AnalyticsLog(tmp_dir)
+        batch: List[List[str]] = []
+        count = 0
+        for _, row in iter_rows(legacy_path):
+            batch.append(row)
+            if len(batch) >= 10000:
+                tmp_log.append(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            tmp_log.append(batch)
+            count += len(batch)
+        
+        moved: List[Path] = []
+        try:
+            for tmp_path in sorted(tmp_dir.iterdir()):
+                path = self.directory / tmp_path.name
+                os.replace(tmp_path, path)
+                moved.append(path)
+            os.replace(legacy_path, legacy_path.with_name(legacy_path.name + '.migrated'))
+        except OSError as e:
+            logger.error(f"Ошибка при переносе журнала аналитики: {e}", exc_info=True)
+            for path in moved:
+                path.unlink(missing_ok=True)
+            return False
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+        logger.info(f"Журнал аналитики перенесён в файлы дней: {count} событий")
+        return True
+    
+    def size(self) -> int:
+        """Размер всех файлов дней в байтах"""
+        total = 0
+        for _, path in self.partitions():
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass  # файл дня только что сжат
+        return total
+    
+    def version(self) -> Tuple:
+        """
+        Версия журнала для кэша результатов
+        
+        Сжатые файлы не меняются, поэтому достаточно списка дней и
+        размера/времени изменения открытых файлов.
+        """
+        version = []
+        for day, path in self.partitions():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                stat = None  # файл дня только что сжат
+            if stat is not None and path.name.endswith(PLAIN_SUFFIX):
+                version.append((day, stat.st_size, stat.st_mtime_ns))
+            else:
+                version.append(day)
+        return tuple(version)
@@ -0,0 +1,168 @@
+"""
+Запросы к журналу аналитики: несколько метрик за один проход
+
+Экран админки объявляет нужные метрики (счётчики, топ-K, число
+уникальных значений, гистограмма по дням), и все они считаются за одно
+чтение журнала. Читаются только файлы дней периода
+(AnalyticsLog.partitions), поэтому более старая история не разбирается.
+
+Пример:
+    result = analytics.query(7, [
+        TopK('top_queries', lower_query, where=is_search),
+        TopK('failed_queries', lower_query, where=is_failed_search),
+    ])
+    result['failed_queries']  # [('запрос', 5), ...]
+"""
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from services.analytics_log import EVENT_TYPE, QUERY, RESULTS_COUNT, TIMESTAMP, USER_ID, event_day, iter_rows
+
+Row = List[str]
+Predicate = Callable[[Row], bool]
+KeyFunc = Callable[[Row], str]
+
+
+# Условия и ключи для метрик
+
+def is_search(row: Row) -> bool:
+    """Поиск с непустым запросом"""
+    return row[EVENT_TYPE] == 'search' and bool(row[QUERY])
+
+
+def is_failed_search(row: Row) -> bool:
+    """Поиск с непустым запросом и без результатов"""
+    return is_search(row) and row[RESULTS_COUNT] == '0'
+
+
+def lower_query(row: Row) -> str:
+    """Поисковый запрос в нижнем регистре"""
+    return row[QUERY].lower()
+
+
+def user_id(row: Row) -> str:
+    """ID пользователя"""
+    return row[USER_ID]
+
+
+class Metric(ABC):
+    """
+    Метрика запроса: накапливает значения по строкам журнала
+    
+    Args:
+        name: Ключ результата в словаре run_query
+        where: Условие отбора строк (None - все строки периода)
+    """
+    
+    def __init__(self, name: str, where: Optional[Predicate] = None):
+        self.name = name
+        self.where = where
+    
+    def signature(self) -> tuple:
+        """Описание метрики для ключа кэша результатов (без накопленных значений)"""
+        return type(self).__name__, self.name, self.where
+    
+    @abstractmethod
+    def add(self, row: Row) -> None:
+        """Учитывает строку, прошедшую условие where"""
+    
+    @abstractmethod
+    def result(self) -> Any:
+        """Итоговое значение метрики"""
+
+
+class Count(Metric):
+    """Количество строк"""
+    
+    def __init__(self, name: str, where: Optional[Predicate] = None):
+        super().__init__(name, where)
+        self._count = 0
+    
+    def add(self, row: Row) -> None:
+        self._count += 1
+    
+    def result(self) -> int:
+        return self._count
+
+
+class TopK(Metric):
+    """Самые частые значения ключа: [(значение, количество), ...]"""
+    
+    def __init__(self, name: str, key: KeyFunc, k: int = 10, where: Optional[Predicate] = None):
+        super().__init__(name, where)
+        self.key = key
+        self.k = k
+        self._counter: Counter = Counter()
+    
+    def signature(self) -> tuple:
+        return super().signature() + (self.key, self.k)
+    
+    def add(self, row: Row) -> None:
+        self._counter[self.key(row)] += 1
+    
+    def result(self) -> List[tuple]:
+        return self._counter.most_common(self.k)
+
+
+class Distinct(Metric):
+    """Количество уникальных значений ключа"""
+    
+    def __init__(self, name: str, key: KeyFunc, where: Optional[Predicate] = None):
+        super().__init__(name, where)
+        self.key = key
+        self._values: set = set()
+    
+    def signature(self) -> tuple:
+        return super().signature() + (self.key,)
+    
+    def add(self, row: Row) -> None:
+        self._values.add(self.key(row))
+    
+    def result(self) -> int:
+        return len(self._values)
+
+
+class DailyHistogram(Metric):
+    """Количество строк по дням: {'YYYY-MM-DD': количество}"""
+    
+    def __init__(self, name: str, where: Optional[Predicate] = None):
+        super().__init__(name, where)
+        self._days: Counter = Counter()
+    
+    def add(self, row: Row) -> None:
+        self._days[event_day(row)] += 1
+    
+    def result(self) -> Dict[str, int]:
+        return dict(self._days)
+
+
+def run_query(paths: Sequence[Path], since: str, metrics: Sequence[Metric]) -> Dict[str, Any]:
+    """
+    Считает все метрики за один проход по файлам журнала
+    
+    Функция и метрики сериализуемы (pickle), поэтому запрос можно
+    выполнить в отдельном процессе.
+    
+    Args:
+        paths: Файлы дней периода по порядку (AnalyticsLog.partitions)
+        since: Начало периода (метка времени ISO, включительно)
+        metrics: Метрики запроса
+    
+    Returns:
+        Словарь {имя метрики: результат}
+    """
+    filtered = [(metric.add, metric.where) for metric in metrics]
+    for path in paths:
+        if not path.exists() and path.name.endswith('.csv'):
+            # День сжат после получения списка файлов
+            path = path.with_name(path.name + '.gz')
+        for _, row in iter_rows(path):
+            # Метки времени ISO одного формата сравниваются как строки
+            if row[TIMESTAMP] < since:
+                continue
+            for add, where in filtered:
+                if where is None or where(row):
+                    add(row)
+    return {metric.name: metric.result() for metric in metrics}
@@ -0,0 +1,277 @@
+"""
+Дневные агрегаты аналитики
+
+Вместо чтения всего журнала при каждом открытии статистики события
+сворачиваются в агрегаты по дням по мере записи (воркер AnalyticsService).
+Каждый день хранится в отдельном JSON-файле data/analytics_rollups/YYYY-MM-DD.json;
+статистика за N дней - сумма N агрегатов.
+
+Файлы агрегатов пишутся не после каждого батча, а раз в flush_interval
+секунд (изменённые дни) и при остановке: JSON дня содержит всех
+пользователей и запросы дня, и его перезапись на каждый батч стоила бы
+O(размер дня).
+
+Согласованность с журналом: в каждом дне записан размер файла дня
+(services.analytics_log), до которого он учтён. При старте файлы дней
+(в том числе уже сжатые) дочитываются с этого смещения, а дни без
+агрегата (или с повреждённым файлом) строятся заново из своего файла -
+агрегаты не теряют и не удваивают события после аварийной остановки.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from services.analytics_log import (
+    CATEGORY, EVENT_TYPE, LANG, QUERY, RESULTS_COUNT, USER_ID,
+    AnalyticsLog, data_size, iter_rows
+)
+from utils.logger import get_logger
+
+logger = get_logger('services.analytics_rollup')
+
+
+class DailyRollup:
+    """Агрегаты событий за один день"""
+    
+    __slots__ = (
+        'day', 'offset', 'events', 'users', 'languages',
+        'categories', 'queries', 'searches', 'successful_searches'
+    )
+    
+    def __init__(self, day: str):
+        self.day = day
+        self.offset = 0  # размер файла дня, до которого день учтён
+        self.events = 0
+        self.users: Set[int] = set()
+        self.languages: Counter = Counter()
+        self.categories: Counter = Counter()  # выборы категорий
+        self.queries: Counter = Counter()  # поисковые запросы (в нижнем регистре)
+        self.searches = 0
+        self.successful_searches = 0
+    
+    def add(self, row: List[str]) -> None:
+        """Учитывает событие (строку журнала)"""
+        self.events += 1
+        user_id = row[USER_ID]
+        if user_id.isdigit():
+            self.users.add(int(user_id))
+        if row[LANG]:
+            self.languages[row[LANG]] += 1
+        
+        event_type = row[EVENT_TYPE]
+        if event_type == 'category_selected' and row[CATEGORY]:
+            self.categories[row[CATEGORY]] += 1
+        elif event_type == 'search':
+            self.searches += 1
+            if row[QUERY]:
+                self.queries[row[QUERY].lower()] += 1
+            if row[RESULTS_COUNT].isdigit() and int(row[RESULTS_COUNT]) > 0:
+                self.successful_searches += 1
+    
+    def merge(self, other: 'DailyRollup') -> None:
+        """Прибавляет агрегаты другого дня"""
+        self.events += other.events
+        self.users |= other.users
+        self.languages.update(other.languages)
+        self.categories.update(other.categories)
+        self.queries.update(other.queries)
+        self.searches += other.searches
+        self.successful_searches += other.successful_searches
+    
+    def to_dict(self) -> Dict:
+        """Состояние для JSON-файла дня"""
+        return {
+            'day': self.day,
+            'offset': self.offset,
+            'events': self.events,
+            'users': sorted(self.users),
+            'languages': self.languages,
+            'categories': self.categories,
+            'queries': self.queries,
+            'searches': self.searches,
+            'successful_searches': self.successful_searches,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DailyRollup':
+        """Восстанавливает день из JSON-файла"""
+        rollup = cls(data['day'])
+        rollup.offset = data['offset']
+        rollup.events = data['events']
+        rollup.users = set(data['users'])
+        rollup.languages = Counter(data['languages'])
+        rollup.categories = Counter(data['categories'])
+        rollup.queries = Counter(data['queries'])
+        rollup.searches = data['searches']
+        rollup.successful_searches = data['successful_searches']
+        return rollup
+
+
+class AnalyticsRollups:
+    """
+    Дневные агрегаты журнала аналитики с сохранением на диск
+    
+    Обновляется из потока записи воркера и читается из обработчиков,
+    поэтому все операции выполняются под блокировкой.
+    """
+    
+    def __init__(self, directory: Path, flush_interval: float = 30.0):
+        """
+        Args:
+            directory: Каталог файлов дней (data/analytics_rollups)
+            flush_interval: Как часто записывать изменённые дни (секунды)
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._days: Dict[str, DailyRollup] = {}
+        self._dirty: Set[str] = set()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def load(self, log: AnalyticsLog) -> None:
+        """
+        Загружает файлы дней и сверяет их с журналом
+        
+        Файл дня (открытый или сжатый) дочитывается после учтённого
+        размера; день без агрегата, с повреждённым агрегатом или с файлом
+        короче учтённого размера строится заново из своего файла.
+        
+        Args:
+            log: Журнал аналитики
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._days = {}
+            for path in self.directory.glob('????-??-??.json'):
+                data = self._read_json(path)
+                if data is None:
+                    continue
+                try:
+                    rollup = DailyRollup.from_dict(data)
+                except (KeyError, TypeError, ValueError) as e:
+                    # Файл прежнего формата или испорчен - день строится заново из журнала
+                    logger.warning(f"Файл агрегатов {path} не прочитан: {e!r}")
+                    continue
+                self._days[rollup.day] = rollup
+            
+            replayed = 0
+            changed = []
+            for day, path in log.partitions():
+                rollup = self._days.get(day)
+                size = data_size(path)
+                if rollup is not None and rollup.offset == size:
+                    continue  # день учтён полностью
+                if rollup is not None and rollup.offset > size:
+                    rollup = None
+                if rollup is None:
+                    rollup = self._days[day] = DailyRollup(day)
+                for end, row in iter_rows(path, rollup.offset):
+                    rollup.add(row)
+                    rollup.offset = end
+                    replayed += 1
+                    if not changed or changed[-1] != day:
+                        changed.append(day)
+            self._flush_locked(changed)
+        
+        logger.info(
+            f"Агрегаты аналитики: {len(self._days)} дней"
+            + (f", дочитано событий из журнала: {replayed}" if replayed else "")
+        )
+    
+    def add_written(self, written: Dict[str, Tuple[List[List[str]], int]]) -> None:
+        """
+        Учитывает записанный батч; изменённые дни пишутся раз в flush_interval
+        
+        Args:
+            written: Результат AnalyticsLog.append - {день: (строки, размер файла дня)}
+        """
+        with self._lock:
+            for day, (rows, size) in written.items():
+                rollup = self._days.get(day)
+                if rollup is None:
+                    rollup = self._days[day] = DailyRollup(day)
+                for row in rows:
+                    rollup.add(row)
+                rollup.offset = size
+            self._dirty.update(written)
+            if time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush_locked(self._dirty)
+    
+    def flush(self) -> None:
+        """Записывает изменённые дни (при остановке)"""
+        with self._lock:
+            self._flush_locked(self._dirty)
+    
+    def drop(self, days: Iterable[str]) -> None:
+        """Удаляет агрегаты дней (удалённых из журнала по сроку хранения)"""
+        with self._lock:
+            for day in days:
+                self._days.pop(day, None)
+                self._dirty.discard(day)
+                try:
+                    (self.directory / f'{day}.json').unlink()
+                except FileNotFoundError:
+                    pass
+    
+    def _flush_locked(self, days: Iterable[str]) -> None:
+        """Пишет агрегаты дней (под блокировкой); незаписанные остаются изменёнными"""
+        days = list(days)
+        try:
+            for day in days:
+                self._write_json(self.directory / f'{day}.json', self._days[day].to_dict())
+                self._dirty.discard(day)
+        except OSError as e:
+            logger.error(f"Ошибка при сохранении агрегатов аналитики: {e}", exc_info=True)
+        self._flushed_at = time.monotonic()
+    
+    def summarize(self, days: int, today: Optional[date] = None) -> Tuple[DailyRollup, DailyRollup]:
+        """
+        Сумма агрегатов за период и агрегат сегодняшнего дня
+        
+        Период - календарные дни с (сегодня - days) по сегодня включительно,
+        то есть O(days) сложений вместо чтения журнала.
+        
+        Args:
+            days: Количество дней
+            today: Текущая дата (по умолчанию date.today())
+        
+        Returns:
+            (сумма за период, сегодня) - новые объекты, не связанные с хранилищем
+        """
+        today = today or date.today()
+        first_day = today - timedelta(days=days)
+        total = DailyRollup(first_day.isoformat())
+        current = DailyRollup(today.isoformat())
+        with self._lock:
+            for offset in range(days + 1):
+                rollup = self._days.get((first_day + timedelta(days=offset)).isoformat())
+                if rollup is not None:
+                    total.merge(rollup)
+            if current.day in self._days:
+                current.merge(self._days[current.day])
+        return total, current
+    
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict]:
+        """JSON-файл или None (нет файла / повреждён)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Файл агрегатов {path} не прочитан: {e}")
+            return None
+    
+    @staticmethod
+    def _write_json(path: Path, data: Dict) -> None:
+        """Атомарная запись JSON (временный файл + os.replace)"""
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
@@ -0,0 +1,400 @@
+"""
+Хранилище аналитики в SQLite (ANALYTICS_STORAGE=sqlite)
+
+Одна таблица events с колонками журнала (COLUMNS) и индексами по
+(timestamp), (event_type, timestamp) и (query). Батчи воркера пишутся
+одной транзакцией через executemany подготовленного INSERT; база в
+режиме WAL, поэтому чтение статистики не ждёт записи.
+
+Статистика и метрики запросов считаются агрегатами SQL по индексу
+времени: условия и ключи известных метрик (is_search, is_failed_search,
+lower_query, user_id) переводятся в WHERE/GROUP BY, остальные метрики
+получают строки периода по индексу и считаются как для CSV.
+
+Перенос CSV-журнала (файлы дней и .csv.gz, прежний analytics.csv):
+    python -m services.analytics_sqlite                  # data/analytics или data/analytics.csv
+    python -m services.analytics_sqlite old/analytics.csv --db data/analytics.sqlite3
+Повторный запуск переносит только новые события: для каждого файла
+запоминается, до какого места он перенесён, поэтому открытый файл
+текущего дня дочитывается, а не пропускается.
+"""
+import argparse
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from services.analytics_log import COLUMNS, GZIP_SUFFIX, AnalyticsLog, data_size, iter_rows
+from services.analytics_query import (
+    Count, DailyHistogram, Distinct, Metric, TopK, is_failed_search, is_search, lower_query, user_id
+)
+from services.analytics_store import AnalyticsStore, QueryTask, empty_stats
+from utils.logger import get_logger
+
+logger = get_logger('services.analytics_sqlite')
+
+INSERT_SQL = f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+SCHEMA = (
+    # user_id и results_count с INTEGER-аффинностью: строки CSV ('42') сохраняются числами
+    "CREATE TABLE IF NOT EXISTS events ("
+    "id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, user_id INTEGER, username TEXT NOT NULL, "
+    "event_type TEXT NOT NULL, lang TEXT NOT NULL, category TEXT NOT NULL, subcategory TEXT NOT NULL, "
+    "query TEXT NOT NULL, results_count INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp)",
+    "CREATE INDEX IF NOT EXISTS events_type_timestamp ON events (event_type, timestamp)",
+    "CREATE INDEX IF NOT EXISTS events_query ON events (query)",
+    # Перенесённые CSV-файлы и размер перенесённых данных (для повторного запуска переноса)
+    "CREATE TABLE IF NOT EXISTS imported_files ("
+    "name TEXT PRIMARY KEY, rows INTEGER NOT NULL, size INTEGER NOT NULL, "
+    "imported_at TEXT NOT NULL) WITHOUT ROWID",
+)
+
+# Условия метрик в SQL (метрики с другими условиями считаются по строкам)
+SQL_WHERE = {
+    None: "1",
+    is_search: "event_type = 'search' AND query != ''",
+    is_failed_search: "event_type = 'search' AND query != '' AND results_count = 0",
+}
+
+# Ключи метрик: колонка и приведение значения из базы к значению ключа.
+# Регистр запросов сводится в Python: lower() SQLite меняет только ASCII
+SQL_KEYS = {
+    lower_query: ('query', str.lower),
+    user_id: ('user_id', str),
+}
+
+
+def connect_readonly(path: Path) -> sqlite3.Connection:
+    """Отдельное соединение только для чтения (для потока или процесса запроса)"""
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+
+def query_database(path: Path, since: str, metrics: Sequence[Metric]) -> Dict[str, Any]:
+    """
+    Считает метрики за период агрегатами SQL
+    
+    Функция и метрики сериализуемы (pickle), поэтому запрос можно
+    выполнить в отдельном процессе.
+    
+    Args:
+        path: Файл базы
+        since: Начало периода (метка времени ISO, включительно)
+        metrics: Метрики (services.analytics_query)
+    
+    Returns:
+        Словарь {имя метрики: результат}
+    """
+    result: Dict[str, Any] = {}
+    with closing(connect_readonly(path)) as connection:
+        remaining = []
+        for metric in metrics:
+            value = _sql_metric(connection, metric, since)
+            if value is None:
+                remaining.append(metric)
+            else:
+                result[metric.name] = value
+        
+        if remaining:
+            # Строки периода по индексу времени - в формате строк CSV
+            filtered = [(metric.add, metric.where) for metric in remaining]
+            cursor = connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM events WHERE timestamp >= ? ORDER BY timestamp", (since,)
+            )
+            for values in cursor:
+                row = [str(value) for value in values]
+                for add, where in filtered:
+                    if where is None or where(row):
+                        add(row)
+            for metric in remaining:
+                result[metric.name] = metric.result()
+    return {metric.name: result[metric.name] for metric in metrics}
+
+
+def _sql_metric(connection: sqlite3.Connection, metric: Metric, since: str) -> Optional[Any]:
+    """Результат метрики одним SQL-запросом или None, если метрика не переводится в SQL"""
+    where = SQL_WHERE.get(metric.where)
+    if where is None:
+        return None
+    
+    if isinstance(metric, Count):
+        return connection.execute(
+            f"SELECT count(*) FROM events WHERE timestamp >= ? AND {where}", (since,)
+        ).fetchone()[0]
+    
+    if isinstance(metric, DailyHistogram):
+        return dict(connection.execute(
+            f"SELECT substr(timestamp, 1, 10) AS day, count(*) FROM events "
+            f"WHERE timestamp >= ? AND {where} GROUP BY day ORDER BY day", (since,)
+        ))
+    
+    if isinstance(metric, (TopK, Distinct)) and metric.key in SQL_KEYS:
+        column, convert = SQL_KEYS[metric.key]
+        counter: Counter = Counter()
+        for value, count in connection.execute(
+            f"SELECT {column}, count(*) FROM events WHERE timestamp >= ? AND {where} GROUP BY {column}", (since,)
+        ):
+            counter[convert(value)] += count
+        return counter.most_common(metric.k) if isinstance(metric, TopK) else len(counter)
+    
+    return None
+
+
+class SQLiteAnalyticsStore(AnalyticsStore):
+    """События аналитики в SQLite (WAL): запись одним соединением, чтение - отдельными"""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу базы SQLite
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        # Соединение для PRAGMA data_version: версия читается, не дожидаясь записи
+        self._version_lock = threading.Lock()
+        self._version_connection: Optional[sqlite3.Connection] = None
+        # Счётчик изменений этим процессом (для версии кэша результатов)
+        self._generation = 0
+        with self._lock:
+            connection = self._writer()
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+    
+    def _writer(self) -> sqlite3.Connection:
+        """Соединение для записи (под блокировкой; открывается заново после close)"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        return self._connection
+    
+    def append(self, rows: Sequence[List[str]]) -> None:
+        """Батч одной транзакцией (executemany подготовленного INSERT)"""
+        with self._lock:
+            connection = self._writer()
+            with connection:
+                connection.executemany(INSERT_SQL, rows)
+            self._generation += 1
+    
+    def stats(self, days: int, today: Optional[date] = None) -> Dict:
+        """Агрегаты SQL за календарные дни с (сегодня - days) по сегодня"""
+        today = today or date.today()
+        since = (today - timedelta(days=days)).isoformat()
+        with closing(connect_readonly(self.path)) as connection:
+            total_events, unique_users = connection.execute(
+                "SELECT count(*), count(DISTINCT user_id) FROM events WHERE timestamp >= ?", (since,)
+            ).fetchone()
+            if not total_events:
+                return empty_stats()
+            
+            events_today, unique_users_today = connection.execute(
+                "SELECT count(*), count(DISTINCT user_id) FROM events WHERE timestamp >= ?", (today.isoformat(),)
+            ).fetchone()
+            languages = dict(connection.execute(
+                "SELECT lang, count(*) FROM events WHERE timestamp >= ? AND lang != '' GROUP BY lang", (since,)
+            ))
+            top_categories = dict(connection.execute(
+                "SELECT category, count(*) AS uses FROM events "
+                "WHERE event_type = 'category_selected' AND timestamp >= ? AND category != '' "
+                "GROUP BY category ORDER BY uses DESC LIMIT 10", (since,)
+            ))
+            searches, successful_searches = connection.execute(
+                "SELECT count(*), coalesce(sum(results_count > 0), 0) FROM events "
+                "WHERE event_type = 'search' AND timestamp >= ?", (since,)
+            ).fetchone()
+            top_queries = _sql_metric(connection, TopK('top_queries', lower_query, 10, where=is_search), since)
+        
+        return {
+            'period_days': days,
+            'total_events': total_events,
+            'unique_users': unique_users,
+            'unique_users_today': unique_users_today,
+            'languages': languages,
+            'top_categories': top_categories,
+            'top_queries': dict(top_queries),
+            'search_stats': {
+                'total': searches,
+                'successful': successful_searches,
+                'failed': searches - successful_searches,
+                'success_rate': (successful_searches / searches * 100) if searches else 0
+            },
+            'events_today': events_today
+        }
+    
+    def query_task(self, since: str, metrics: Sequence[Metric]) -> QueryTask:
+        """
+        Агрегаты SQL в отдельном соединении
+        
+        Объём 0: строки отбираются по индексу, а SQLite отпускает GIL на
+        время выполнения запроса, поэтому отдельный процесс не нужен.
+        """
+        return query_database, (self.path, since, metrics), 0
+    
+    def maintain(self, today: date, retention_days: int) -> None:
+        """Удаляет события старше срока хранения (по индексу времени)"""
+        if not retention_days:
+            return
+        keep_from = (today - timedelta(days=retention_days)).isoformat()
+        with self._lock:
+            connection = self._writer()
+            with connection:
+                removed = connection.execute("DELETE FROM events WHERE timestamp < ?", (keep_from,)).rowcount
+            self._generation += 1
+        if removed:
+            logger.info(f"Удалены события аналитики старше {retention_days} дней: {removed}")
+    
+    def version(self) -> Hashable:
+        """
+        Изменения этим процессом и data_version отдельного соединения для
+        чтения (меняется после каждой фиксации записи любым другим
+        соединением, в том числе соединением записи)
+        """
+        with self._version_lock:
+            if self._version_connection is None:
+                self._version_connection = sqlite3.connect(
+                    f'file:{self.path}?mode=ro', uri=True, check_same_thread=False
+                )
+            data_version = self._version_connection.execute("PRAGMA data_version").fetchone()[0]
+            return self._generation, data_version
+    
+    def size(self) -> int:
+        """Файл базы вместе с журналом WAL"""
+        total = 0
+        for suffix in ('', '-wal'):
+            try:
+                total += self.path.with_name(self.path.name + suffix).stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+    
+    def iter_rows(self) -> Iterator[List[str]]:
+        with closing(connect_readonly(self.path)) as connection:
+            for values in connection.execute(f"SELECT {', '.join(COLUMNS)} FROM events ORDER BY id"):
+                yield [str(value) for value in values]
+    
+    def is_empty(self) -> bool:
+        """В базе нет событий"""
+        with self._lock:
+            return self._writer().execute("SELECT 1 FROM events LIMIT 1").fetchone() is None
+    
+    def import_csv(self, paths: Iterable[Path]) -> Tuple[int, int]:
+        """
+        Переносит CSV-журнал в базу
+        
+        Каждый файл переносится одной транзакцией вместе с отметкой в
+        imported_files (до какого смещения перенесён), поэтому прерванный
+        перенос можно просто повторить, а файл, который ещё дописывается
+        (открытый день), при следующем запуске дочитывается с этого места.
+        
+        Args:
+            paths: Файлы (.csv, .csv.gz, прежний analytics.csv) и каталоги файлов дней
+        
+        Returns:
+            (перенесено файлов, перенесено событий)
+        """
+        files = 0
+        events = 0
+        for path in _csv_files(paths):
+            # Имя без .gz: файл дня, сжатый после переноса, не переносится повторно
+            name = str(path.resolve())
+            if name.endswith(GZIP_SUFFIX):
+                name = name[:-len('.gz')]
+            
+            with self._lock:
+                connection = self._writer()
+                imported = connection.execute(
+                    "SELECT size FROM imported_files WHERE name = ?", (name,)
+                ).fetchone()
+                start = imported[0] if imported else 0
+                if start >= data_size(path):
+                    logger.info(f"{path} уже перенесён, пропускаем")
+                    continue
+                
+                # Конец последней перенесённой записи и число записей
+                progress = {'size': start, 'rows': 0}
+                
+                def counted() -> Iterator[List[str]]:
+                    for end, row in iter_rows(path, start):
+                        progress['size'] = end
+                        progress['rows'] += 1
+                        yield row
+                
+                with connection:
+                    connection.executemany(INSERT_SQL, counted())
+                    if progress['rows']:
+                        connection.execute(
+                            "INSERT INTO imported_files (name, rows, size, imported_at) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT (name) DO UPDATE SET rows = rows + excluded.rows, "
+                            "size = excluded.size, imported_at = excluded.imported_at",
+                            (name, progress['rows'], progress['size'], datetime.now().isoformat())
+                        )
+                if not progress['rows']:
+                    continue  # дописана только неполная запись
+                self._generation += 1
+            
+            files += 1
+            events += progress['rows']
+            logger.info(f"{path}: перенесено событий {progress['rows']}")
+        return files, events
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        with self._version_lock:
+            if self._version_connection is not None:
+                self._version_connection.close()
+                self._version_connection = None
+
+
+def _csv_files(paths: Iterable[Path]) -> Iterator[Path]:
+    """Файлы для переноса: каталоги раскрываются в файлы дней по порядку дат"""
+    for path in paths:
+        if path.is_dir():
+            for _, partition in AnalyticsLog(path).partitions():
+                yield partition
+        elif path.exists():
+            yield path
+        else:
+            logger.warning(f"{path} не найден, пропускаем")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Перенос CSV-журнала аналитики в базу SQLite (командная строка)"""
+    from config import settings
+    
+    parser = argparse.ArgumentParser(description="Перенос CSV-журнала аналитики в SQLite")
+    parser.add_argument(
+        'paths', nargs='*', type=Path,
+        help="CSV-файлы и каталоги файлов дней (по умолчанию - data/analytics или data/analytics.csv)"
+    )
+    parser.add_argument(
+        '--db', default=settings.ANALYTICS_STORAGE_PATH,
+        help="Файл базы (по умолчанию ANALYTICS_STORAGE_PATH)"
+    )
+    args = parser.parse_args(argv)
+    
+    paths = args.paths
+    if not paths:
+        # Журнал по дням уже содержит перенесённый analytics.csv (analytics.csv.migrated)
+        log_dir = Path('data/analytics')
+        paths = [log_dir] if log_dir.is_dir() else [Path('data/analytics.csv')]
+    
+    store = SQLiteAnalyticsStore(args.db)
+    try:
+        files, events = store.import_csv(paths)
+    finally:
+        store.close()
+    print(f"Перенесено файлов: {files}, событий: {events} -> {args.db}")
+
+
+if __name__ == '__main__':
+    main()
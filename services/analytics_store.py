@@ -0,0 +1,206 @@
+"""
+Хранилище событий аналитики
+
+Бэкенд подключаемый (AnalyticsStore) и выбирается настройкой
+ANALYTICS_STORAGE:
+- 'csv' - журнал по дням в data/analytics/ с дневными агрегатами (по умолчанию),
+- 'sqlite' - база SQLite с индексами по времени и типу события
+  (services.analytics_sqlite); существующий CSV-журнал переносится в неё
+  командой python -m services.analytics_sqlite.
+"""
+import shutil
+from abc import ABC, abstractmethod
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+from services.analytics_log import AnalyticsLog, iter_rows
+from services.analytics_query import Metric, run_query
+from services.analytics_rollup import AnalyticsRollups
+from utils.logger import get_logger
+
+logger = get_logger('services.analytics_store')
+
+# Запрос, который можно выполнить в потоке или отдельном процессе:
+# (функция, аргументы, объём данных для чтения в байтах)
+QueryTask = Tuple[Callable[..., Dict[str, Any]], tuple, int]
+
+
+def empty_stats() -> Dict:
+    """Статистика без событий"""
+    return {
+        'period_days': 0,
+        'total_events': 0,
+        'unique_users': 0,
+        'unique_users_today': 0,
+        'languages': {},
+        'top_categories': {},
+        'top_queries': {},
+        'search_stats': {
+            'total': 0,
+            'successful': 0,
+            'failed': 0,
+            'success_rate': 0
+        },
+        'events_today': 0
+    }
+
+
+class AnalyticsStore(ABC):
+    """
+    Хранилище событий аналитики
+    
+    Запись и обслуживание вызываются из потока воркера AnalyticsService,
+    чтение - из пула потоков, поэтому реализация должна быть потокобезопасной.
+    """
+    
+    @abstractmethod
+    def append(self, rows: Sequence[List[str]]) -> None:
+        """Записывает батч событий (строки event_row)"""
+    
+    @abstractmethod
+    def stats(self, days: int, today: Optional[date] = None) -> Dict:
+        """Статистика за календарные дни с (сегодня - days) по сегодня (формат get_stats)"""
+    
+    @abstractmethod
+    def query_task(self, since: str, metrics: Sequence[Metric]) -> QueryTask:
+        """Запрос метрик за период с меткой since (функция и аргументы сериализуемы)"""
+    
+    @abstractmethod
+    def maintain(self, today: date, retention_days: int) -> None:
+        """Ежедневное обслуживание: удаление событий старше срока хранения"""
+    
+    @abstractmethod
+    def version(self) -> Hashable:
+        """Версия данных для кэша результатов (меняется при каждой записи)"""
+    
+    @abstractmethod
+    def size(self) -> int:
+        """Размер хранилища на диске в байтах"""
+    
+    @abstractmethod
+    def iter_rows(self) -> Iterator[List[str]]:
+        """Все события по порядку записи (для экспорта)"""
+    
+    def close(self) -> None:
+        """Освобождает ресурсы (по умолчанию ничего)"""
+
+
+class CsvAnalyticsStore(AnalyticsStore):
+    """
+    Журнал по дням (services.analytics_log) и дневные агрегаты для get_stats
+    
+    Закрытые дни сжимаются в .csv.gz, дни старше срока хранения удаляются
+    вместе с агрегатами. Прежний единый analytics.csv переносится в файлы
+    дней при первом запуске.
+    """
+    
+    def __init__(self, data_dir: Path):
+        """
+        Args:
+            data_dir: Каталог данных (data)
+        """
+        self.directory = data_dir / 'analytics'
+        self.legacy_file = data_dir / 'analytics.csv'
+        self.rollups_dir = data_dir / 'analytics_rollups'
+        
+        # Журнал по дням; прежний единый analytics.csv переносится в него один раз
+        self._log = AnalyticsLog(self.directory)
+        if self._log.migrate(self.legacy_file):
+            # Агрегаты прежнего журнала ссылаются на его смещения - строим заново
+            shutil.rmtree(self.rollups_dir, ignore_errors=True)
+        
+        # Дневные агрегаты для get_stats (дочитывают журнал после прошлого запуска)
+        self._rollups = AnalyticsRollups(self.rollups_dir)
+        self._rollups.load(self._log)
+    
+    def append(self, rows: Sequence[List[str]]) -> None:
+        written = self._log.append(rows)
+        # Батч записан - сворачиваем его в дневные агрегаты
+        self._rollups.add_written(written)
+    
+    def stats(self, days: int, today: Optional[date] = None) -> Dict:
+        """Сумма дневных агрегатов (O(days)), журнал не читается"""
+        total, current = self._rollups.summarize(days, today)
+        if not total.events:
+            return empty_stats()
+        
+        searches = total.searches
+        successful_searches = total.successful_searches
+        
+        return {
+            'period_days': days,
+            'total_events': total.events,
+            'unique_users': len(total.users),
+            'unique_users_today': len(current.users),
+            'languages': dict(total.languages),
+            'top_categories': dict(total.categories.most_common(10)),
+            'top_queries': dict(total.queries.most_common(10)),
+            'search_stats': {
+                'total': searches,
+                'successful': successful_searches,
+                'failed': searches - successful_searches,
+                'success_rate': (successful_searches / searches * 100) if searches else 0
+            },
+            'events_today': current.events
+        }
+    
+    def query_task(self, since: str, metrics: Sequence[Metric]) -> QueryTask:
+        """Проход по файлам дней периода; объём - их размер на диске"""
+        paths = [path for _, path in self._log.partitions(since_day=since[:10])]
+        size = sum(path.stat().st_size for path in paths if path.exists())
+        return run_query, (paths, since, metrics), size
+    
+    def maintain(self, today: date, retention_days: int) -> None:
+        """Сжимает закрытые дни и удаляет дни старше срока хранения"""
+        removed = self._log.compact(today, retention_days)
+        self._rollups.drop(removed)
+    
+    def version(self) -> Hashable:
+        """Дни журнала, размер и mtime открытых файлов"""
+        return self._log.version()
+    
+    def size(self) -> int:
+        return self._log.size()
+    
+    def iter_rows(self) -> Iterator[List[str]]:
+        for _, path in self._log.partitions():
+            for _, row in iter_rows(path):
+                yield row
+    
+    def close(self) -> None:
+        """Записывает дневные агрегаты, изменённые после последнего сброса"""
+        self._rollups.flush()
+
+
+def create_analytics_store(data_dir: Path) -> AnalyticsStore:
+    """
+    Создаёт хранилище аналитики по настройкам (ANALYTICS_STORAGE)
+    
+    'csv' - CsvAnalyticsStore в data_dir (по умолчанию),
+    'sqlite' - SQLiteAnalyticsStore (ANALYTICS_STORAGE_PATH).
+    
+    Args:
+        data_dir: Каталог данных (data)
+    
+    Returns:
+        Хранилище для AnalyticsService
+    """
+    from config import settings
+    
+    backend = settings.ANALYTICS_STORAGE.lower()
+    if backend == 'csv':
+        return CsvAnalyticsStore(data_dir)
+    
+    if backend == 'sqlite':
+        from services.analytics_sqlite import SQLiteAnalyticsStore
+        store = SQLiteAnalyticsStore(settings.ANALYTICS_STORAGE_PATH)
+        has_csv = any((data_dir / 'analytics').glob('*.csv*')) or (data_dir / 'analytics.csv').exists()
+        if has_csv and store.is_empty():
+            logger.warning(
+                "База аналитики пуста, а CSV-журнал есть: перенесите его командой "
+                "python -m services.analytics_sqlite"
+            )
+        return store
+    
+    raise ValueError(f"Неизвестное хранилище аналитики: {settings.ANALYTICS_STORAGE}")
@@ -0,0 +1,506 @@
+"""
+Постоянное хранилище FSM (состояние и данные пользователей)
+
+По умолчанию - SQLite в режиме WAL с отложенной записью: изменения
+копятся в памяти и сбрасываются одной транзакцией раз в
+FSM_FLUSH_INTERVAL секунд, поэтому несколько set_state/update_data
+одного обработчика превращаются в одну запись строки и не добавляют
+задержки на каждое нажатие.
+
+Бэкенд подключаемый (StorageBackend); для нескольких процессов бота
+есть вариант 'redis' - штатный RedisStorage aiogram (Redis или
+совместимый сервер), требует пакет redis.
+
+Сессии, неактивные дольше TTL, вытесняются: навигация пользователя
+удаляется, а язык сохраняется в компактной таблице языков и
+восстанавливается при следующем обращении. Сверх ограничения числа
+сессий самые давние (LRU) только выгружаются из памяти и при следующем
+обращении читаются из хранилища заново.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+from utils.logger import get_logger
+
+logger = get_logger('services.fsm_storage')
+
+# Запись хранилища: (состояние, данные)
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+# Ключ данных FSM, который переживает вытеснение сессии
+LANGUAGE_KEY = 'language'
+
+
+class StorageBackend(ABC):
+    """
+    Синхронное key-value хранилище записей FSM
+    
+    Методы вызываются из пула потоков (asyncio.to_thread), поэтому
+    реализация должна быть потокобезопасной.
+    """
+    
+    @abstractmethod
+    def load(self, key: str) -> Optional[Record]:
+        """Запись по ключу; для вытесненной сессии - (None, {'language': ...}); иначе None"""
+    
+    @abstractmethod
+    def save_many(self, records: List[Tuple[str, Optional[str], Dict[str, Any]]]) -> None:
+        """Сохраняет записи (ключ, состояние, данные) одной транзакцией"""
+    
+    @abstractmethod
+    def delete_many(self, keys: List[str]) -> None:
+        """Удаляет записи"""
+    
+    @abstractmethod
+    def evict_many(self, sessions: List[Tuple[str, Optional[str]]]) -> None:
+        """Удаляет сессии (ключ, язык), сохраняя язык в таблице языков"""
+    
+    @abstractmethod
+    def touch_many(self, keys: List[str]) -> None:
+        """Отмечает обращение к записям (время активности для expire)"""
+    
+    @abstractmethod
+    def expire(self, before: float) -> int:
+        """Вытесняет сессии без обращений с момента before (time.time()); возвращает их число"""
+    
+    @abstractmethod
+    def close(self) -> None:
+        """Закрывает соединение"""
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Записи FSM в памяти процесса (состояние теряется при перезапуске)
+    
+    Та же семантика, что у постоянных бэкендов, включая вытеснение
+    сессий и таблицу языков; подходит для разработки и тестов.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Tuple[Optional[str], Dict[str, Any], float]] = {}
+        self._languages: Dict[str, str] = {}
+    
+    def load(self, key: str) -> Optional[Record]:
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                return row[0], row[1]
+            language = self._languages.get(key)
+        return (None, {LANGUAGE_KEY: language}) if language else None
+    
+    def save_many(self, records: List[Tuple[str, Optional[str], Dict[str, Any]]]) -> None:
+        now = time.time()
+        with self._lock:
+            for key, state, data in records:
+                self._rows[key] = (state, data, now)
+    
+    def delete_many(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._rows.pop(key, None)
+    
+    def evict_many(self, sessions: List[Tuple[str, Optional[str]]]) -> None:
+        with self._lock:
+            for key, language in sessions:
+                self._rows.pop(key, None)
+                if language:
+                    self._languages[key] = language
+    
+    def touch_many(self, keys: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                row = self._rows.get(key)
+                if row is not None:
+                    self._rows[key] = (row[0], row[1], now)
+    
+    def expire(self, before: float) -> int:
+        with self._lock:
+            expired = [key for key, (_, _, updated_at) in self._rows.items() if updated_at < before]
+            for key in expired:
+                language = self._rows.pop(key)[1].get(LANGUAGE_KEY)
+                if language:
+                    self._languages[key] = language
+        return len(expired)
+    
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(StorageBackend):
+    """Записи FSM в SQLite (WAL): одна строка на пользователя, данные - JSON"""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу базы SQLite
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS fsm ("
+                "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, updated_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS fsm_updated_at ON fsm (updated_at)")
+            # Языки вытесненных сессий
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS fsm_languages (key TEXT PRIMARY KEY, language TEXT NOT NULL) WITHOUT ROWID"
+            )
+    
+    def load(self, key: str) -> Optional[Record]:
+        with self._lock:
+            row = self._connection.execute("SELECT state, data FROM fsm WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                language = self._connection.execute(
+                    "SELECT language FROM fsm_languages WHERE key = ?", (key,)
+                ).fetchone()
+        if row is not None:
+            return row[0], json.loads(row[1])
+        return (None, {LANGUAGE_KEY: language[0]}) if language else None
+    
+    def save_many(self, records: List[Tuple[str, Optional[str], Dict[str, Any]]]) -> None:
+        now = time.time()
+        rows = [
+            (key, state, json.dumps(data, ensure_ascii=False, separators=(',', ':')), now)
+            for key, state, data in records
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "state = excluded.state, data = excluded.data, updated_at = excluded.updated_at",
+                rows
+            )
+    
+    def delete_many(self, keys: List[str]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM fsm WHERE key = ?", [(key,) for key in keys])
+    
+    def evict_many(self, sessions: List[Tuple[str, Optional[str]]]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM fsm WHERE key = ?", [(key,) for key, _ in sessions])
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO fsm_languages (key, language) VALUES (?, ?)",
+                [(key, language) for key, language in sessions if language]
+            )
+    
+    def touch_many(self, keys: List[str]) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany("UPDATE fsm SET updated_at = ? WHERE key = ?", [(now, key) for key in keys])
+    
+    def expire(self, before: float) -> int:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO fsm_languages (key, language) "
+                "SELECT key, json_extract(data, '$.language') FROM fsm "
+                "WHERE updated_at < ? AND json_extract(data, '$.language') IS NOT NULL",
+                (before,)
+            )
+            return self._connection.execute("DELETE FROM fsm WHERE updated_at < ?", (before,)).rowcount
+    
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class PersistentStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram поверх StorageBackend с отложенной записью
+    
+    Прочитанные записи держатся в памяти процесса; изменения помечают
+    ключ «грязным», а фоновая задача раз в flush_interval секунд пишет
+    все грязные ключи одной транзакцией. Поэтому несколько изменений за
+    одно обновление (и между соседними обновлениями) сливаются в одну
+    запись. При close() несохранённые изменения сбрасываются.
+    
+    Фоновый чистильщик (start_sweeper) вытесняет сессии, неактивные
+    дольше session_ttl (язык вытесненного пользователя сохраняется), и
+    выгружает из памяти самые давние сверх max_sessions (LRU) - они
+    остаются в бэкенде. Поэтому память процесса не растёт с числом
+    когда-либо заходивших пользователей. Время активности в бэкенде
+    обновляется и при чтении, так что активная сессия не истекает.
+    """
+    
+    def __init__(
+        self,
+        backend: StorageBackend,
+        flush_interval: float = 0.5,
+        session_ttl: float = 7 * 24 * 3600,
+        max_sessions: int = 10000
+    ):
+        """
+        Args:
+            backend: Бэкенд хранения
+            flush_interval: Период сброса изменений в секундах
+            session_ttl: Время неактивности, после которого сессия вытесняется (секунды)
+            max_sessions: Максимальное количество сессий в памяти (лишние выгружаются)
+        """
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        
+        self._records: Dict[str, Record] = {}
+        # Время последнего обращения к сессии; порядок - от самой давней (LRU)
+        self._access: OrderedDict[str, float] = OrderedDict()
+        self._dirty: Set[str] = set()
+        # Сессии, к которым обращались после прошлой проверки (для touch_many)
+        self._touched: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self._closed = False
+        
+        # Счётчики вытеснения
+        self.evicted_idle = 0
+        self.evicted_overflow = 0
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record_key = self.key_builder.build(key)
+        _, data = await self._get_record(record_key)
+        state_name = state.state if isinstance(state, State) else state
+        self._records[record_key] = (state_name, data)
+        self._mark_dirty(record_key)
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get_record(self.key_builder.build(key))
+        return state
+    
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record_key = self.key_builder.build(key)
+        state, _ = await self._get_record(record_key)
+        self._records[record_key] = (state, data.copy())
+        self._mark_dirty(record_key)
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get_record(self.key_builder.build(key))
+        return data.copy()
+    
+    async def set_record(self, key: StorageKey, state: StateType = None, data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Записывает состояние и данные одной операцией (для BufferedFSMContext)
+        
+        Args:
+            key: Ключ пользователя
+            state: Новое состояние
+            data: Новые данные (None - оставить прежние)
+        """
+        record_key = self.key_builder.build(key)
+        _, current_data = await self._get_record(record_key)
+        state_name = state.state if isinstance(state, State) else state
+        self._records[record_key] = (state_name, data.copy() if data is not None else current_data)
+        self._mark_dirty(record_key)
+    
+    async def close(self) -> None:
+        """Останавливает фоновую запись и сбрасывает несохранённые изменения"""
+        if self._closed:
+            return
+        self._closed = True
+        for task in (self._sweeper_task, self._flush_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await asyncio.to_thread(self.backend.close)
+    
+    async def flush(self) -> int:
+        """
+        Записывает все изменённые записи одной транзакцией
+        
+        Returns:
+            Количество записанных записей
+        """
+        if not self._dirty:
+            return 0
+        
+        dirty, self._dirty = self._dirty, set()
+        to_save = []
+        to_delete = []
+        for record_key in dirty:
+            state, data = self._records.get(record_key, (None, {}))
+            if state is None and not data:
+                to_delete.append(record_key)
+            else:
+                to_save.append((record_key, state, data))
+        
+        try:
+            if to_save:
+                await asyncio.to_thread(self.backend.save_many, to_save)
+            if to_delete:
+                await asyncio.to_thread(self.backend.delete_many, to_delete)
+        except Exception as e:
+            # Не теряем изменения: попробуем записать их при следующем сбросе
+            self._dirty.update(dirty)
+            logger.error(f"Ошибка записи состояния FSM: {e}", exc_info=True)
+            return 0
+        return len(dirty)
+    
+    async def start_sweeper(self, interval: float = 60.0) -> None:
+        """
+        Запускает фоновое вытеснение неактивных сессий
+        
+        Args:
+            interval: Период проверки в секундах
+        """
+        if self._sweeper_task is None and not self._closed:
+            self._sweeper_task = asyncio.create_task(self._sweeper_loop(interval))
+    
+    async def sweep(self) -> int:
+        """
+        Вытесняет сессии, неактивные дольше session_ttl, и выгружает самые давние сверх max_sessions
+        
+        Перед выбором сессий несохранённые изменения записываются, поэтому
+        выгруженная сессия читается из бэкенда в актуальном виде.
+        
+        Returns:
+            Количество вытесненных и выгруженных сессий (в памяти и в бэкенде)
+        """
+        await self.flush()
+        cutoff = time.time() - self.session_ttl
+        
+        idle = []
+        for record_key, accessed_at in self._access.items():
+            if accessed_at >= cutoff:
+                break
+            idle.append(record_key)
+        overflow_count = len(self._access) - len(idle) - self.max_sessions
+        overflow = []
+        if overflow_count > 0:
+            # Изменённые во время flush() сессии не выгружаем - их запишет следующий сброс
+            candidates = islice(self._access, len(idle), None)
+            overflow = list(islice((key for key in candidates if key not in self._dirty), overflow_count))
+        
+        sessions = []
+        for record_key in idle:
+            _, data = self._records.pop(record_key, (None, {}))
+            del self._access[record_key]
+            self._dirty.discard(record_key)
+            self._touched.discard(record_key)
+            sessions.append((record_key, data.get(LANGUAGE_KEY)))
+        for record_key in overflow:
+            # Запись остаётся в бэкенде и загрузится при следующем обращении
+            self._records.pop(record_key, None)
+            del self._access[record_key]
+        
+        touched, self._touched = list(self._touched), set()
+        if sessions:
+            await asyncio.to_thread(self.backend.evict_many, sessions)
+        if touched:
+            await asyncio.to_thread(self.backend.touch_many, touched)
+        # Сессии в бэкенде без обращений дольше session_ttl (в том числе выгруженные)
+        expired = await asyncio.to_thread(self.backend.expire, cutoff)
+        
+        self.evicted_idle += len(idle)
+        self.evicted_overflow += len(overflow)
+        if sessions or overflow or expired:
+            logger.info(
+                f"Сессии FSM: вытеснено неактивных {len(idle)}, выгружено сверх лимита {len(overflow)}, "
+                f"истекло в хранилище {expired}; в памяти {len(self._records)}"
+            )
+        return len(sessions) + len(overflow) + expired
+    
+    def stats(self) -> Dict[str, int]:
+        """Счётчики сессий: в памяти, ожидают записи, вытеснено неактивных, выгружено сверх лимита"""
+        return {
+            'sessions': len(self._records),
+            'dirty': len(self._dirty),
+            'evicted_idle': self.evicted_idle,
+            'evicted_overflow': self.evicted_overflow,
+        }
+    
+    async def _get_record(self, record_key: str) -> Record:
+        """Запись из памяти или из бэкенда (при первом обращении)"""
+        record = self._records.get(record_key)
+        if record is None:
+            record = await asyncio.to_thread(self.backend.load, record_key) or (None, {})
+            # Пока читали, запись могла появиться из другого обработчика
+            record = self._records.setdefault(record_key, record)
+        self._access[record_key] = time.time()
+        self._access.move_to_end(record_key)
+        self._touched.add(record_key)
+        return record
+    
+    def _mark_dirty(self, record_key: str) -> None:
+        """Помечает запись для отложенной записи и запускает фоновый сброс"""
+        self._dirty.add(record_key)
+        if self._flush_task is None and not self._closed:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self) -> None:
+        """Фоновая задача: периодический сброс изменений"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка в фоновой записи FSM: {e}", exc_info=True)
+    
+    async def _sweeper_loop(self, interval: float) -> None:
+        """Фоновая задача: периодическое вытеснение сессий"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Ошибка вытеснения сессий FSM: {e}", exc_info=True)
+
+
+def create_fsm_storage() -> BaseStorage:
+    """
+    Создаёт хранилище FSM по настройкам (FSM_STORAGE)
+    
+    'sqlite' - PersistentStorage + SQLite (по умолчанию),
+    'redis' - RedisStorage aiogram (FSM_REDIS_URL, нужен пакет redis);
+        неактивные сессии удаляет сам Redis по TTL ключей (вместе с языком),
+    'memory' - PersistentStorage + MemoryBackend (состояние теряется при перезапуске).
+    
+    Returns:
+        Хранилище для Dispatcher(storage=...)
+    """
+    from config import settings
+    
+    backend = settings.FSM_STORAGE.lower()
+    if backend == 'redis':
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as e:
+            raise RuntimeError("FSM_STORAGE=redis требует пакет redis (pip install redis)") from e
+        return RedisStorage.from_url(
+            settings.FSM_REDIS_URL,
+            state_ttl=settings.FSM_SESSION_TTL,
+            data_ttl=settings.FSM_SESSION_TTL
+        )
+    
+    if backend in ('sqlite', 'memory'):
+        return PersistentStorage(
+            SQLiteBackend(settings.FSM_STORAGE_PATH) if backend == 'sqlite' else MemoryBackend(),
+            flush_interval=settings.FSM_FLUSH_INTERVAL,
+            session_ttl=settings.FSM_SESSION_TTL,
+            max_sessions=settings.FSM_MAX_SESSIONS
+        )
+    
+    raise ValueError(f"Неизвестное хранилище FSM: {settings.FSM_STORAGE}")
@@ -0,0 +1,116 @@
+"""
+Кэш готовых страниц просмотра подкатегорий (текст + клавиатура)
+
+Страница без поиска зависит только от (категория, подкатегория, язык,
+страница), поэтому отрисовывается один раз, а переход по страницам
+становится поиском в словаре и одним edit_text.
+
+Здесь же хранятся планы страниц выборок (plan_pages): план считается
+один раз на выборку, а не при каждом переходе по страницам.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger('services.page_cache')
+
+# Готовая страница: (текст в Markdown, клавиатура)
+RenderedPage = Tuple[str, Any]
+
+
+class PageCache:
+    """
+    Ограниченный LRU-кэш отрисованных страниц
+    
+    Страницы строятся лениво при первом показе; при переполнении
+    вытесняется страница, которую дольше всего не показывали.
+    Кэш сбрасывается при перезагрузке базы терминов (TermsService.reload).
+    """
+    
+    def __init__(self, max_size: int = 2000):
+        """
+        Args:
+            max_size: Максимальное количество страниц
+        """
+        self.max_size = max_size
+        self._pages: OrderedDict[Hashable, RenderedPage] = OrderedDict()
+        self._plans: OrderedDict[Hashable, Any] = OrderedDict()
+        
+        # Счётчики для админ-панели
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get_or_render(self, key: Hashable, render: Callable[[], RenderedPage]) -> RenderedPage:
+        """
+        Готовая страница из кэша или результат render() с сохранением
+        
+        Args:
+            key: (ID категории, ID подкатегории, язык, страница)
+            render: Функция отрисовки страницы
+        
+        Returns:
+            (текст, клавиатура)
+        """
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+        
+        self.misses += 1
+        page = self._pages[key] = render()
+        
+        while len(self._pages) > self.max_size:
+            self._pages.popitem(last=False)
+            self.evictions += 1
+        return page
+    
+    def get_or_plan(self, key: Hashable, plan: Callable[[], Any]) -> Any:
+        """
+        План страниц выборки из кэша или результат plan() с сохранением
+        
+        Args:
+            key: Описание выборки (категория, подкатегория, язык, запрос, размер)
+            plan: Функция планирования страниц
+        
+        Returns:
+            PagePlan
+        """
+        page_plan = self._plans.get(key)
+        if page_plan is not None:
+            self._plans.move_to_end(key)
+            return page_plan
+        
+        page_plan = self._plans[key] = plan()
+        while len(self._plans) > self.max_size:
+            self._plans.popitem(last=False)
+        return page_plan
+    
+    def clear(self) -> None:
+        """Сбрасывает все страницы и планы (после перезагрузки базы терминов)"""
+        if self._pages:
+            logger.info(f"Кэш страниц сброшен: {len(self._pages)} страниц")
+        self._pages.clear()
+        self._plans.clear()
+    
+    def __len__(self) -> int:
+        return len(self._pages)
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Счётчики кэша
+        
+        Returns:
+            Словарь: size, max_size, hits, misses, hit_rate (%), evictions
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._pages),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups * 100 if lookups else 0.0,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,209 @@
+"""
+Кэш результатов поиска (LRU + TTL) со счётчиками попаданий
+
+Хранит списки ID найденных терминов и отрисованную первую страницу,
+чтобы повторяющиеся запросы (см. топ запросов в аналитике) не
+выполняли поиск и форматирование заново. Также выдаёт короткие токены
+запросов для callback_data кнопок пагинации.
+"""
+import base64
+import hashlib
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger('services.search_cache')
+
+
+class CachedSearch:
+    """Запись кэша: ID результатов и отрисованная первая страница"""
+    
+    __slots__ = ('term_ids', 'first_page', 'expires_at')
+    
+    def __init__(self, term_ids: Iterable[int], expires_at: float):
+        self.term_ids = array('I', term_ids)
+        self.first_page: Optional[str] = None
+        self.expires_at = expires_at
+
+
+class SearchCache:
+    """
+    Ограниченный LRU-кэш с временем жизни записей
+    
+    Ключ - (нормализованный запрос, категория, подкатегория, язык, ...).
+    При переполнении вытесняется запись, к которой дольше всего не
+    обращались; просроченные записи удаляются при обращении.
+    """
+    
+    def __init__(self, max_size: int = 1000, ttl: float = 600.0):
+        """
+        Args:
+            max_size: Максимальное количество записей
+            ttl: Время жизни записи в секундах
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, CachedSearch] = OrderedDict()
+        # Токен -> текст запроса (для кнопок пагинации)
+        self._queries: OrderedDict[str, str] = OrderedDict()
+        
+        # Счётчики для админ-панели
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.page_hits = 0
+    
+    def get(self, key: Hashable) -> Optional[CachedSearch]:
+        """
+        Запись по ключу (с обновлением её позиции в LRU)
+        
+        Args:
+            key: Ключ запроса
+        
+        Returns:
+            Запись или None, если её нет или она просрочена
+        """
+        entry = self._live(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+    
+    def _live(self, key: Hashable) -> Optional[CachedSearch]:
+        """Непросроченная запись по ключу; просроченная удаляется"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        return entry
+    
+    def put(self, key: Hashable, term_ids: Iterable[int]) -> CachedSearch:
+        """
+        Сохраняет результаты поиска
+        
+        Args:
+            key: Ключ запроса
+            term_ids: ID найденных терминов (в порядке ранжирования)
+        
+        Returns:
+            Новая запись
+        """
+        entry = CachedSearch(term_ids, time.monotonic() + self.ttl)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+    
+    def first_page(self, key: Optional[Hashable], render: Callable[[], str]) -> str:
+        """
+        Отрисованная первая страница результатов (из кэша или render())
+        
+        Страница хранится в записи поиска и живёт не дольше неё: для
+        просроченной записи страница отрисовывается заново и не кэшируется.
+        
+        Args:
+            key: Ключ запроса (None - без кэширования)
+            render: Функция отрисовки страницы
+        
+        Returns:
+            Текст первой страницы
+        """
+        entry = self._live(key) if key is not None else None
+        if entry is None:
+            return render()
+        
+        if entry.first_page is None:
+            entry.first_page = render()
+        else:
+            self.page_hits += 1
+        return entry.first_page
+    
+    @staticmethod
+    def query_token(query: str) -> str:
+        """
+        Короткий токен поискового запроса (8 символов base64url)
+        
+        Токен зависит только от текста запроса, поэтому одинаков во всех
+        процессах и после перезапуска.
+        
+        Args:
+            query: Поисковый запрос
+        
+        Returns:
+            Токен для callback_data
+        """
+        digest = hashlib.blake2b(' '.join(query.split()).encode('utf-8'), digest_size=6).digest()
+        return base64.urlsafe_b64encode(digest).decode('ascii')
+    
+    def register_query(self, query: str) -> str:
+        """
+        Запоминает запрос и возвращает его токен
+        
+        Args:
+            query: Поисковый запрос
+        
+        Returns:
+            Токен (см. query_token)
+        """
+        token = self.query_token(query)
+        self._queries[token] = ' '.join(query.split())
+        self._queries.move_to_end(token)
+        
+        while len(self._queries) > self.max_size:
+            self._queries.popitem(last=False)
+        return token
+    
+    def resolve_query(self, token: str) -> Optional[str]:
+        """
+        Текст запроса по токену
+        
+        Args:
+            token: Токен из register_query
+        
+        Returns:
+            Запрос или None, если токен неизвестен (вытеснен или выдан до перезапуска)
+        """
+        return self._queries.get(token)
+    
+    def clear(self) -> None:
+        """
+        Сбрасывает все записи (например, после перезагрузки базы терминов)
+        Токены запросов от базы не зависят и сохраняются
+        """
+        if self._entries:
+            logger.info(f"Кэш поиска сброшен: {len(self._entries)} записей")
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Счётчики кэша
+        
+        Returns:
+            Словарь: size, max_size, hits, misses, hit_rate (%),
+            evictions, expirations, page_hits
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups * 100 if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'page_hits': self.page_hits,
+        }
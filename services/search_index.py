@@ -0,0 +1,703 @@
+"""
+Поисковые индексы по базе терминов
+
+Все тексты нормализуются функциями utils.text_normalizer один раз
+при построении индекса; запрос нормализуется теми же функциями.
+"""
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Container, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from models.term import Term
+from utils.text_normalizer import fold, stem, tokenize
+
+# Длина n-граммы для инвертированного индекса
+NGRAM_SIZE = 3
+
+# Нечёткий поиск (SymSpell): максимальное расстояние и длина префикса,
+# по которому строится словарь удалений
+FUZZY_MAX_DISTANCE = 2
+FUZZY_PREFIX_LENGTH = 7
+
+# Уровни совпадения (порядок ранжирования результатов)
+MATCH_EXACT = 0        # Название совпадает с запросом
+MATCH_PARTIAL = 1      # Запрос (или все его основы) входит в название
+MATCH_DESCRIPTION = 2  # Запрос (или все его основы) входит в описание
+
+# Параметры BM25 и вес совпадения в названии относительно описания
+BM25_K1 = 1.2
+BM25_B = 0.75
+NAME_BOOST = 2.0
+
+_EMPTY = array('I')
+
+# Начало слова в названии (для автодополнения по любому слову)
+_WORD_START = re.compile(r'\b\w')
+
+
+def normalize(text: str) -> str:
+    """Нормализация текста для поиска (применяется к терминам при загрузке и к запросу)"""
+    return fold(text)
+
+
+def ngrams(text: str, size: int = NGRAM_SIZE) -> Set[str]:
+    """Множество символьных n-грамм строки"""
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class PostingLists:
+    """
+    Списки вхождений «ключ -> возрастающий массив ID» в плоском виде (CSR)
+    
+    Вместо десятков тысяч мелких массивов хранятся один плоский массив ID
+    и массив смещений: так индекс компактнее и быстро грузится из снимка.
+    """
+    
+    def __init__(self, lists: Optional[Dict[str, List[int]]] = None, state: Optional[Tuple] = None):
+        """
+        Args:
+            lists: Ключ -> список ID (при построении)
+            state: Готовое состояние из снимка (см. export_state)
+        """
+        if state is None:
+            keys = list(lists or {})
+            offsets, flat = _flatten((lists or {}).values())
+        else:
+            keys, offsets, flat = state
+        self._slots: Dict[str, int] = dict(zip(keys, range(len(keys))))
+        self._offsets = offsets
+        self._flat = flat
+    
+    def get(self, key: str) -> Optional[array]:
+        """Список ID по ключу или None"""
+        span = self.span(key)
+        if span is None:
+            return None
+        return self._flat[span[0]:span[1]]
+    
+    def span(self, key: str) -> Optional[Tuple[int, int]]:
+        """Границы списка ключа в плоском массиве (для параллельных массивов) или None"""
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        return self._offsets[slot], self._offsets[slot + 1]
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def export_state(self) -> Tuple:
+        """Состояние для бинарного снимка"""
+        return list(self._slots), self._offsets, self._flat
+
+
+class FoldedDescriptions(Sequence[str]):
+    """
+    Нормализованные описания терминов, вычисляемые при обращении
+    
+    Описания занимают большую часть памяти базы, поэтому их свёрнутые
+    копии не хранятся: индексы читают их один раз при построении, а
+    поиск - только для кандидатов, не совпавших по названию.
+    """
+    
+    __slots__ = ('_terms',)
+    
+    def __init__(self, terms: Sequence[Term]):
+        self._terms = terms
+    
+    def __len__(self) -> int:
+        return len(self._terms)
+    
+    def __getitem__(self, term_id: int) -> str:
+        return normalize(self._terms[term_id].description)
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс по символьным триграммам названий и описаний
+    
+    Строится один раз при загрузке: названия и описания нормализуются
+    для каждого термина однократно. Списки вхождений (posting lists) -
+    отсортированные массивы ID терминов, кандидаты на запрос получаются
+    их пересечением и затем проверяются точным вхождением подстроки.
+    """
+    
+    def __init__(self, terms: Sequence[Term], state: Optional[Tuple] = None):
+        """
+        Args:
+            terms: Термины (ID термина = индекс в последовательности)
+            state: Готовое состояние из снимка (см. export_state); если None - строится
+        
+        Нормализованные названия хранятся в одном экземпляре: индексы основ,
+        опечаток и префиксов строятся по этому же списку, а в снимок он
+        попадает готовым. Описания (большая часть текста базы) не хранятся:
+        они нормализуются при построении индексов и при проверке кандидатов.
+        """
+        self.descriptions = FoldedDescriptions(terms)
+        if state is not None:
+            self.names, postings_state, self._name_order = state
+            self.postings = PostingLists(state=postings_state)
+            return
+        
+        self.names: List[str] = [normalize(term.term) for term in terms]
+        self.postings = self._build_postings()
+        # ID в порядке названий: точное название ищется бинарным поиском (для запросов короче триграммы)
+        self._name_order = array('I', sorted(range(len(self.names)), key=self.names.__getitem__))
+    
+    def _build_postings(self) -> PostingLists:
+        """Строит списки вхождений: триграмма -> возрастающий массив ID"""
+        postings: Dict[str, List[int]] = {}
+        for term_id, (name, description) in enumerate(zip(self.names, self.descriptions)):
+            # Триграммы через границу названия и описания не образуются
+            for gram in ngrams(name) | ngrams(description):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = []
+                posting.append(term_id)
+        return PostingLists(postings)
+    
+    def export_state(self) -> Tuple:
+        """Состояние для бинарного снимка (вместе с нормализованными названиями)"""
+        return self.names, self.postings.export_state(), self._name_order
+    
+    def candidates(self, query: str, max_candidates: Optional[int] = None) -> Optional[List[int]]:
+        """
+        Кандидаты на запрос пересечением списков вхождений
+        
+        Args:
+            query: Нормализованный запрос
+            max_candidates: Если самый короткий список вхождений длиннее,
+                индекс не используется (прямой перебор дешевле)
+        
+        Returns:
+            Возрастающий список ID кандидатов или None, если индекс
+            неприменим (запрос короче триграммы или перебор выгоднее)
+        """
+        grams = ngrams(query)
+        if not grams:
+            return None
+        
+        postings = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        
+        if max_candidates is not None and len(postings[0]) > max_candidates:
+            return None
+        
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                return []
+        return sorted(result)
+    
+    def exact(self, query: str) -> List[int]:
+        """ID терминов, название которых совпадает с нормализованным запросом (по возрастанию)"""
+        names, order = self.names, self._name_order
+        position = bisect_left(order, query, key=names.__getitem__)
+        result = []
+        while position < len(order) and names[order[position]] == query:
+            result.append(order[position])
+            position += 1
+        return result
+    
+    def match_level(
+        self,
+        term_id: int,
+        query: str,
+        name_stem_ids: Container[int] = frozenset(),
+        stem_ids: Container[int] = frozenset()
+    ) -> Optional[int]:
+        """
+        Уровень совпадения термина с запросом
+        
+        Args:
+            term_id: ID термина
+            query: Нормализованный запрос
+            name_stem_ids: Термины, в названии которых есть все основы запроса
+            stem_ids: Термины, в названии или описании которых есть все основы запроса
+        
+        Returns:
+            MATCH_EXACT, MATCH_PARTIAL, MATCH_DESCRIPTION или None
+        """
+        name = self.names[term_id]
+        if name == query:
+            return MATCH_EXACT
+        if query in name or term_id in name_stem_ids:
+            return MATCH_PARTIAL
+        if term_id in stem_ids or query in self.descriptions[term_id]:
+            return MATCH_DESCRIPTION
+        return None
+    
+    def rank(
+        self,
+        term_ids: Iterable[int],
+        query: str,
+        limit: int,
+        stems: Optional['StemMatch'] = None
+    ) -> List[int]:
+        """
+        Ранжирует термины: точные совпадения -> частичные -> по описанию
+        
+        Внутри уровня термины упорядочены по BM25, при равенстве -
+        в порядке term_ids (по возрастанию ID). Отбор через ограниченную
+        кучу: в памяти держатся только limit лучших терминов.
+        
+        Args:
+            term_ids: Кандидаты (возрастающие ID)
+            query: Нормализованный запрос
+            limit: Максимальное количество результатов
+            stems: Совпадения по основам слов (StemIndex.match)
+        """
+        stems = stems or StemMatch()
+        match_level = self.match_level
+        ranked = (
+            (-level, stems.score(term_id), -term_id)
+            for term_id in term_ids
+            for level in (match_level(term_id, query, stems.name_ids, stems.ids),)
+            if level is not None
+        )
+        return [-term_id for _, _, term_id in heapq.nlargest(limit, ranked)]
+
+
+class FieldIndex:
+    """
+    Основы слов одного поля (название или описание) с частотами для BM25
+    
+    Хранит списки вхождений, параллельный им массив частот основы в
+    документе и заранее посчитанный знаменатель нормализации длины
+    k1 * (1 - b + b * len / avg_len) для каждого документа.
+    """
+    
+    def __init__(
+        self,
+        texts: Sequence[str] = (),
+        langs: Sequence[str] = (),
+        state: Optional[Tuple] = None
+    ):
+        """
+        Args:
+            texts: Нормализованные тексты поля (ID = индекс)
+            langs: Язык правил стемминга для каждого текста
+            state: Готовое состояние из снимка (см. export_state)
+        """
+        if state is not None:
+            postings_state, self.frequencies, self.length_norms = state
+            self.postings = PostingLists(state=postings_state)
+            return
+        
+        lists: Dict[str, List[int]] = {}
+        counts: Dict[str, List[int]] = {}
+        lengths = array('H')
+        for term_id, (text, lang) in enumerate(zip(texts, langs)):
+            words = tokenize(text)
+            lengths.append(min(len(words), 0xFFFF))
+            for word_stem, count in Counter(stem(word, lang) for word in words).items():
+                lists.setdefault(word_stem, []).append(term_id)
+                counts.setdefault(word_stem, []).append(min(count, 0xFF))
+        
+        self.postings = PostingLists(lists)
+        self.frequencies = array('B')
+        for word_stem in lists:
+            self.frequencies.extend(counts[word_stem])
+        
+        avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.length_norms = array('f', (
+            BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length) if avg_length else BM25_K1
+            for length in lengths
+        ))
+    
+    def export_state(self) -> Tuple:
+        """Состояние для бинарного снимка"""
+        return self.postings.export_state(), self.frequencies, self.length_norms
+    
+    def get(self, key: str) -> Optional[array]:
+        """ID документов, содержащих основу, или None"""
+        return self.postings.get(key)
+    
+    def idf(self, span: Tuple[int, int]) -> float:
+        """Обратная частота основы по её списку вхождений (BM25, всегда > 0)"""
+        doc_frequency = span[1] - span[0]
+        return math.log(1 + (len(self.length_norms) - doc_frequency + 0.5) / (doc_frequency + 0.5))
+    
+    def score(self, span: Tuple[int, int], idf: float, term_id: int) -> float:
+        """
+        Вклад основы в BM25 документа (0, если основы в документе нет)
+        
+        Args:
+            span: Границы списка вхождений основы (PostingLists.span)
+            idf: Вес основы (с учётом веса поля)
+            term_id: ID документа
+        """
+        start, end = span
+        position = bisect_left(self.postings._flat, term_id, start, end)
+        if position == end or self.postings._flat[position] != term_id:
+            return 0.0
+        frequency = self.frequencies[position]
+        return idf * frequency * (BM25_K1 + 1) / (frequency + self.length_norms[term_id])
+
+
+class StemMatch:
+    """
+    Результат поиска по основам для одного запроса
+    
+    Множества совпавших терминов считаются сразу пересечением списков
+    вхождений, а BM25 - лениво и только для терминов, дошедших до
+    ранжирования (после фильтра по группе), поиском в списках вхождений.
+    """
+    
+    __slots__ = ('name_ids', 'ids', '_weights')
+    
+    def __init__(
+        self,
+        name_ids: Set[int] = frozenset(),
+        ids: Set[int] = frozenset(),
+        weights: Sequence[Tuple[FieldIndex, Tuple[int, int], float]] = ()
+    ):
+        """
+        Args:
+            name_ids: Термины, в названии которых есть все основы запроса
+            ids: Термины, в названии или описании которых есть все основы запроса
+            weights: (поле, границы списка основы, idf с весом поля) для каждой основы
+        """
+        self.name_ids = name_ids
+        self.ids = ids
+        self._weights = weights
+    
+    def score(self, term_id: int) -> float:
+        """BM25 термина (0, если термин не содержит основ запроса)"""
+        if term_id not in self.ids:
+            return 0.0
+        return sum(field.score(span, idf, term_id) for field, span, idf in self._weights)
+
+
+class StemIndex:
+    """
+    Инвертированный индекс по основам слов с ранжированием BM25
+    
+    Стемминг, частоты основ и длины документов считаются при загрузке.
+    Названия терминов казахские во всех языковых версиях базы, поэтому
+    основы названий строятся по казахским правилам, а основы описаний -
+    по правилам языка термина. Запрос стеммится теми же правилами.
+    Совпадение в названии весит NAME_BOOST относительно описания.
+    """
+    
+    def __init__(
+        self,
+        terms: Sequence[Term],
+        names: Sequence[str],
+        descriptions: Sequence[str],
+        state: Optional[Tuple[Tuple, Tuple]] = None
+    ):
+        """
+        Args:
+            terms: Термины (для языка описаний)
+            names: Нормализованные названия
+            descriptions: Нормализованные описания
+            state: Готовые поля (названия, описания) из снимка
+        """
+        if state is not None:
+            self.names = FieldIndex(state=state[0])
+            self.descriptions = FieldIndex(state=state[1])
+            return
+        
+        self.names = FieldIndex(names, ['kk'] * len(names))
+        self.descriptions = FieldIndex(descriptions, [term.lang for term in terms])
+    
+    def export_state(self) -> Tuple[Tuple, Tuple]:
+        """Состояние для бинарного снимка"""
+        return self.names.export_state(), self.descriptions.export_state()
+    
+    def match(self, query: str, lang: str) -> StemMatch:
+        """
+        Термины, содержащие все основы запроса
+        
+        Args:
+            query: Нормализованный запрос
+            lang: Язык запроса (правила стемминга для описаний)
+        
+        Returns:
+            StemMatch: совпавшие термины и их BM25
+        """
+        # Пары основ каждого слова запроса: (по правилам названий, по правилам языка)
+        stem_pairs = list(dict.fromkeys((stem(word, 'kk'), stem(word, lang)) for word in tokenize(query)))
+        if not stem_pairs:
+            return StemMatch()
+        
+        name_ids = self._all_of(self.names, [name_stem for name_stem, _ in stem_pairs])
+        # Основа слова может встретиться в названии или в описании;
+        # термин должен содержать каждое слово запроса
+        any_ids: Optional[Set[int]] = None
+        weights = []
+        for name_stem, description_stem in stem_pairs:
+            ids = set()
+            for field, key, boost in ((self.names, name_stem, NAME_BOOST), (self.descriptions, description_stem, 1.0)):
+                span = field.postings.span(key)
+                if span is not None:
+                    ids.update(field.postings.get(key))
+                    weights.append((field, span, field.idf(span) * boost))
+            any_ids = ids if any_ids is None else any_ids & ids
+            if not any_ids:
+                return StemMatch()
+        return StemMatch(name_ids, any_ids, weights)
+    
+    @staticmethod
+    def _all_of(field: FieldIndex, keys: List[str]) -> Set[int]:
+        """Пересечение списков вхождений по всем ключам"""
+        result: Optional[Set[int]] = None
+        for key in keys:
+            posting = field.get(key)
+            if posting is None:
+                return set()
+            result = set(posting) if result is None else result & set(posting)
+            if not result:
+                return set()
+        return result or set()
+
+
+def edit_distance(source: str, target: str, max_distance: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (перестановка соседних символов = 1 правка)
+    
+    Returns:
+        Расстояние или max_distance + 1, если оно больше max_distance
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+    if source == target:
+        return 0
+    
+    previous_previous: List[int] = []
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, start=1):
+        current = [i] + [0] * len(target)
+        row_min = i
+        for j, target_char in enumerate(target, start=1):
+            cost = 0 if source_char == target_char else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and source_char == target[j - 2]
+                    and source[i - 2] == target_char):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    
+    distance = previous[-1]
+    return distance if distance <= max_distance else max_distance + 1
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """Все варианты слова с удалением до max_distance символов (включая само слово)"""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for variant in frontier:
+            if len(variant) <= 1:
+                continue
+            for i in range(len(variant)):
+                next_frontier.add(variant[:i] + variant[i + 1:])
+        next_frontier -= result
+        result |= next_frontier
+        frontier = next_frontier
+    return result
+
+
+class FuzzyIndex:
+    """
+    Словарь удалений в стиле SymSpell по нормализованным названиям терминов
+    
+    Индексируются только отдельные слова названий (многословный запрос
+    ищется по словам). Для каждого слова заранее построены варианты с
+    удалением до FUZZY_MAX_DISTANCE символов из префикса длиной
+    FUZZY_PREFIX_LENGTH, поэтому поиск с опечаткой - это несколько
+    обращений к словарю и проверка немногих кандидатов точным
+    расстоянием, без перебора базы.
+    
+    Списки хранятся плоскими массивами со смещениями (см. PostingLists).
+    """
+    
+    def __init__(self, names: Sequence[str], state: Optional[Tuple] = None):
+        """
+        Args:
+            names: Нормализованные названия (ID термина = индекс)
+            state: Готовое состояние из снимка (см. export_state)
+        """
+        if state is None:
+            state = self._build(names)
+        self.words, self._word_offsets, self._word_terms, deletes_state = state
+        self._deletes = PostingLists(state=deletes_state)
+    
+    @staticmethod
+    def _build(names: Sequence[str]) -> Tuple:
+        word_ids: Dict[str, int] = {}
+        words: List[str] = []
+        terms_by_word: List[List[int]] = []
+        for term_id, name in enumerate(names):
+            for token in set(tokenize(name)):
+                word_id = word_ids.get(token)
+                if word_id is None:
+                    word_id = word_ids[token] = len(words)
+                    words.append(token)
+                    terms_by_word.append([])
+                terms_by_word[word_id].append(term_id)
+        
+        words_by_delete: Dict[str, List[int]] = {}
+        for word_id, word in enumerate(words):
+            for variant in _deletes(word[:FUZZY_PREFIX_LENGTH], FUZZY_MAX_DISTANCE):
+                words_by_delete.setdefault(variant, []).append(word_id)
+        
+        word_offsets, word_terms = _flatten(terms_by_word)
+        return words, word_offsets, word_terms, PostingLists(words_by_delete).export_state()
+    
+    def export_state(self) -> Tuple:
+        """Состояние для бинарного снимка"""
+        return self.words, self._word_offsets, self._word_terms, self._deletes.export_state()
+    
+    def lookup(self, query: str, max_distance: int = FUZZY_MAX_DISTANCE) -> List[Tuple[int, int]]:
+        """
+        Термины, в названиях которых есть слова, близкие к словам запроса
+        
+        Каждое слово запроса ищется отдельно; термин подходит, если для
+        каждого слова запроса в его названии есть близкое слово. Расстояние
+        термина - сумма расстояний по словам запроса.
+        
+        Args:
+            query: Нормализованный запрос
+            max_distance: Максимальное расстояние редактирования для слова
+        
+        Returns:
+            Пары (расстояние, ID термина), отсортированные по расстоянию и ID
+        """
+        total: Optional[Dict[int, int]] = None
+        for word in dict.fromkeys(tokenize(query)):
+            best = self._lookup_word(word, max_distance)
+            if total is not None:
+                best = {
+                    term_id: distance + best[term_id]
+                    for term_id, distance in total.items()
+                    if term_id in best
+                }
+            total = best
+            if not total:
+                return []
+        
+        return sorted((distance, term_id) for term_id, distance in (total or {}).items())
+    
+    def _lookup_word(self, word: str, max_distance: int) -> Dict[int, int]:
+        """ID терминов -> наименьшее расстояние от слова до слова названия"""
+        # Короткие слова с большим допуском совпадают почти со всем
+        max_distance = min(max_distance, FUZZY_MAX_DISTANCE, max(len(word) - 2, 0))
+        
+        words = self.words
+        word_offsets, word_terms = self._word_offsets, self._word_terms
+        
+        checked: Set[int] = set()
+        best: Dict[int, int] = {}
+        for variant in _deletes(word[:FUZZY_PREFIX_LENGTH], max_distance):
+            word_ids = self._deletes.get(variant)
+            if word_ids is None:
+                continue
+            for word_id in word_ids:
+                if word_id in checked:
+                    continue
+                checked.add(word_id)
+                distance = edit_distance(word, words[word_id], max_distance)
+                if distance > max_distance:
+                    continue
+                for term_id in word_terms[word_offsets[word_id]:word_offsets[word_id + 1]]:
+                    if distance < best.get(term_id, max_distance + 1):
+                        best[term_id] = distance
+        return best
+
+
+class PrefixIndex:
+    """
+    Автодополнение по префиксу: отсортированные массивы ключей (одного языка)
+    
+    Ключи - нормализованные названия целиком и их хвосты, начинающиеся с
+    каждого следующего слова («сауда орталығы» -> «сауда орталығы»,
+    «орталығы»). Поиск - бинарный поиск начала диапазона и проход по
+    ключам с этим префиксом: O(log n + длина префикса + k), без перебора
+    терминов. Совпадения с начала названия идут раньше совпадений по слову.
+    """
+    
+    def __init__(
+        self,
+        names: Sequence[str] = (),
+        term_ids: Iterable[int] = (),
+        state: Optional[Tuple] = None
+    ):
+        """
+        Args:
+            names: Нормализованные названия всех терминов (индекс = ID)
+            term_ids: ID терминов, попадающих в индекс (например, одного языка)
+            state: Готовое состояние из снимка (см. export_state)
+        """
+        if state is None:
+            name_keys = []
+            word_keys = []
+            for term_id in term_ids:
+                name = names[term_id]
+                name_keys.append((name, term_id))
+                for match in _WORD_START.finditer(name, 1):
+                    word_keys.append((name[match.start():], term_id))
+            state = _sorted_keys(name_keys) + _sorted_keys(word_keys)
+        self._name_keys, self._name_ids, self._word_keys, self._word_ids = state
+    
+    def export_state(self) -> Tuple:
+        """Состояние для бинарного снимка"""
+        return self._name_keys, self._name_ids, self._word_keys, self._word_ids
+    
+    def lookup(self, prefix: str, limit: int) -> List[int]:
+        """
+        ID терминов, название (или слово названия) которых начинается с префикса
+        
+        Args:
+            prefix: Нормализованный префикс
+            limit: Максимальное количество результатов
+        
+        Returns:
+            ID терминов: сначала совпадения с начала названия, затем по слову;
+            внутри - в алфавитном порядке
+        """
+        result: List[int] = []
+        if not prefix or limit <= 0:
+            return result
+        seen: Set[int] = set()
+        for keys, ids in ((self._name_keys, self._name_ids), (self._word_keys, self._word_ids)):
+            position = bisect_left(keys, prefix)
+            while position < len(keys) and keys[position].startswith(prefix):
+                term_id = ids[position]
+                position += 1
+                if term_id in seen:
+                    continue
+                seen.add(term_id)
+                result.append(term_id)
+                if len(result) >= limit:
+                    return result
+        return result
+
+
+def _sorted_keys(pairs: List[Tuple[str, int]]) -> Tuple[List[str], array]:
+    """(ключ, ID) -> (отсортированные ключи, параллельный массив ID)"""
+    pairs.sort()
+    return [key for key, _ in pairs], array('I', [term_id for _, term_id in pairs])
+
+
+def _flatten(lists: Iterable[List[int]]) -> Tuple[array, array]:
+    """Список списков -> (смещения, плоский массив); i-й список = flat[offsets[i]:offsets[i + 1]]"""
+    offsets = array('I', [0])
+    flat = array('I')
+    for items in lists:
+        flat.extend(items)
+        offsets.append(len(flat))
+    return offsets, flat
@@ -3,12 +3,157 @@
 Использует паттерн Singleton для единственного экземпляра
 """
 import csv
-from typing import List, Dict, Set, Optional
+import gc
+import threading
+from array import array
+from operator import itemgetter
+from typing import Callable, List, Dict, Set, Optional
 from pathlib import Path
+from models.result_set import ResultSet
+from models.term import Term
+from services.page_cache import PageCache
+from services.search_cache import SearchCache
+from services.search_index import FuzzyIndex, PrefixIndex, StemIndex, TrigramIndex, normalize
+from services.terms_snapshot import file_hash, load_snapshot, save_snapshot, snapshot_path_for
+from utils.category_mapper import get_mapper
 from utils.logger import get_logger
 
 logger = get_logger('services.terms_service')
 
+# Языки, для которых строятся кэши
+LANGUAGES = ('kk', 'ru')
+
+
+class TermsDataset:
+    """
+    Одна версия базы терминов: записи Term, кэши категорий и поисковые индексы
+    
+    Собирается целиком (TermsService.build_dataset, в том числе в отдельном
+    потоке) и подменяет текущую базу сервиса (TermsService.apply_dataset).
+    """
+    
+    def __init__(self, terms: Optional[List[Term]] = None, dataset_hash: str = ''):
+        """
+        Args:
+            terms: Термины; ID термина совпадает с его индексом в списке
+            dataset_hash: Хэш содержимого CSV
+        """
+        self.terms: List[Term] = terms if terms is not None else []
+        self.dataset_hash = dataset_hash
+        self.categories: Dict[str, List[str]] = {}
+        self.subcategories: Dict[str, List[str]] = {}
+        self.term_groups: Dict[str, List[Term]] = {}
+        self.search_index = TrigramIndex([])
+        self.stem_index = StemIndex([], [], [])
+        self.fuzzy_index = FuzzyIndex([])
+        self.prefix_indexes: Dict[str, PrefixIndex] = {}
+    
+    @classmethod
+    def from_terms(cls, terms: List[Term], dataset_hash: str) -> 'TermsDataset':
+        """База из разобранного CSV: кэши и индексы строятся заново"""
+        dataset = cls(terms, dataset_hash)
+        # Предварительно кэшируем категории
+        dataset._build_cache()
+        dataset._build_search_indexes()
+        return dataset
+    
+    @classmethod
+    def from_state(cls, state: Dict, dataset_hash: str) -> 'TermsDataset':
+        """База из состояния бинарного снимка"""
+        columns = state['columns']
+        terms = list(map(Term, range(len(columns[0])), *columns))
+        dataset = cls(terms, dataset_hash)
+        dataset.categories = state['categories']
+        dataset.subcategories = state['subcategories']
+        dataset.term_groups = {
+            key: [terms[term_id] for term_id in ids]
+            for key, ids in state['term_groups'].items()
+        }
+        dataset._build_search_indexes(state)
+        return dataset
+    
+    def export_state(self) -> Dict:
+        """
+        Состояние для бинарного снимка: термины по колонкам и готовые кэши
+        
+        Группы терминов хранятся как массивы ID, а не ссылки на записи.
+        """
+        return {
+            'columns': [[getattr(term, field) for term in self.terms] for field in Term.FIELDS],
+            'categories': self.categories,
+            'subcategories': self.subcategories,
+            'term_groups': {
+                key: array('I', [term.id for term in bucket])
+                for key, bucket in self.term_groups.items()
+            },
+            'trigram_index': self.search_index.export_state(),
+            'stem_index': self.stem_index.export_state(),
+            'fuzzy_index': self.fuzzy_index.export_state(),
+            'prefix_indexes': {lang: index.export_state() for lang, index in self.prefix_indexes.items()},
+        }
+    
+    def _build_cache(self) -> None:
+        """Строит кэш категорий, подкатегорий и терминов для быстрого доступа O(1)"""
+        self.categories = {}
+        self.subcategories = {}
+        self.term_groups = {}
+        
+        categories: Dict[str, Set[str]] = {lang: set() for lang in LANGUAGES}
+        subcategories: Dict[str, Set[str]] = {}
+        
+        for term in self.terms:
+            lang = term.lang
+            cat = term.category
+            if lang not in categories or not cat:
+                continue
+            
+            categories[lang].add(cat)
+            
+            # Кэш подкатегорий
+            subcats = subcategories.setdefault(f"{cat}:{lang}", set())
+            subcat = term.subcategory
+            if subcat:
+                subcats.add(subcat)
+                
+                # Кэш терминов по категории/подкатегории/языку
+                cache_key_terms = f"{cat}:{subcat}:{lang}"
+                bucket = self.term_groups.get(cache_key_terms)
+                if bucket is None:
+                    bucket = self.term_groups[cache_key_terms] = []
+                bucket.append(term)
+        
+        for lang, cats in categories.items():
+            self.categories[lang] = sorted(cats)
+        
+        # Преобразуем set в list для подкатегорий
+        for key, subcats in subcategories.items():
+            self.subcategories[key] = sorted(subcats)
+        
+        logger.info(f"Кэш построен: {len(self.term_groups)} групп терминов")
+    
+    def _build_search_indexes(self, state: Optional[Dict] = None) -> None:
+        """
+        Строит поисковые индексы (или восстанавливает их из снимка)
+        
+        Названия и описания нормализуются один раз на термин при разборе
+        CSV; все индексы используют общие списки TrigramIndex.
+        """
+        state = state or {}
+        index = TrigramIndex(self.terms, state=state.get('trigram_index'))
+        self.search_index = index
+        self.stem_index = StemIndex(self.terms, index.names, index.descriptions, state=state.get('stem_index'))
+        self.fuzzy_index = FuzzyIndex(index.names, state=state.get('fuzzy_index'))
+        
+        prefix_states = state.get('prefix_indexes', {})
+        self.prefix_indexes = {
+            lang: PrefixIndex(
+                index.names,
+                (term.id for term in self.terms if term.lang == lang),
+                state=prefix_states.get(lang)
+            )
+            for lang in LANGUAGES
+        }
+
 
 class TermsService:
     """Сервис для загрузки и поиска терминов (Singleton)"""
@@ -16,101 +161,201 @@ class TermsService:
     _instance: Optional['TermsService'] = None
     _initialized: bool = False
     
-    def __new__(cls, csv_path: str = 'data/extracted_terms_full.csv'):
+    LANGUAGES = LANGUAGES
+    
+    def __new__(cls, csv_path: str = 'data/extracted_terms_full.csv', snapshot_path: Optional[str] = None):
         """Singleton - создаёт только один экземпляр"""
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
     
-    def __init__(self, csv_path: str = 'data/extracted_terms_full.csv'):
+    def __init__(self, csv_path: str = 'data/extracted_terms_full.csv', snapshot_path: Optional[str] = None):
         """
         Инициализация сервиса (выполняется только один раз)
         
         Args:
             csv_path: Путь к CSV файлу с терминами
+            snapshot_path: Путь к бинарному снимку (по умолчанию data/cache/<имя CSV>.snapshot)
         """
         # Пропускаем повторную инициализацию
         if TermsService._initialized:
             return
-            
+        
         self.csv_path = Path(csv_path)
-        self.terms: List[Dict[str, str]] = []
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else snapshot_path_for(self.csv_path)
+        # Одна сборка базы за раз (перезагрузки выполняются в потоках)
+        self._build_lock = threading.Lock()
+        self.terms: List[Term] = []
+        
+        # Хэш содержимого CSV - версия загруженного набора данных
+        self.dataset_hash: str = ''
         
         # Кэши для ускорения работы
         self._categories_cache: Dict[str, List[str]] = {}
         self._subcategories_cache: Dict[str, List[str]] = {}
-        self._terms_cache: Dict[str, List[Dict[str, str]]] = {}  # Кэш терминов по категориям/подкатегориям
+        self._terms_cache: Dict[str, List[Term]] = {}  # Кэш терминов по категориям/подкатегориям
+        self._search_index = TrigramIndex([])  # Триграммный индекс для поиска
+        self._stem_index = StemIndex([], [], [])  # Основы слов (стемминг kk/ru)
+        self._fuzzy_index = FuzzyIndex([])  # Словарь удалений для поиска с опечатками
+        self._prefix_indexes: Dict[str, PrefixIndex] = {}  # Автодополнение: язык -> индекс
+        
+        # Кэш результатов повторяющихся запросов (сбрасывается при перезагрузке базы)
+        from config import settings
+        self.search_cache = SearchCache(settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL)
+        # Готовые страницы просмотра подкатегорий (сбрасываются при перезагрузке базы)
+        self.page_cache = PageCache(settings.PAGE_CACHE_SIZE)
         
         self._load_terms()
         TermsService._initialized = True
     
+    def reload(self) -> bool:
+        """
+        Перезагружает базу терминов (после обновления CSV)
+        
+        Новая база собирается целиком и подменяет текущую только после
+        успешной загрузки; при ошибке прежняя база остаётся в работе.
+        
+        Returns:
+            True, если содержимое CSV изменилось
+        
+        Raises:
+            Exception: CSV не удалось прочитать или разобрать
+        """
+        return self.apply_dataset(self.build_dataset())
+    
+    def build_dataset(self) -> TermsDataset:
+        """
+        Собирает новую версию базы, не трогая текущую
+        
+        Можно вызывать из отдельного потока (asyncio.to_thread): сервис
+        не меняется до apply_dataset. Сначала пробует бинарный снимок с тем
+        же хэшем CSV; CSV разбирается, только если снимка нет или
+        содержимое CSV изменилось.
+        
+        Returns:
+            Загруженная база
+        
+        Raises:
+            Exception: CSV не удалось прочитать или разобрать
+        """
+        # Записи Term отслеживаются сборщиком мусора (в отличие от словарей строк),
+        # поэтому на время загрузки GC отключаем, а после подмены - замораживаем кучу
+        with self._build_lock:
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                csv_hash = file_hash(self.csv_path)
+                state = load_snapshot(self.snapshot_path, csv_hash)
+                
+                if state is not None:
+                    dataset = TermsDataset.from_state(state, csv_hash)
+                    logger.info(f"Загружено {len(dataset.terms)} терминов из снимка {self.snapshot_path}")
+                    return dataset
+                
+                with open(self.csv_path, 'r', encoding='utf-8', newline='') as file:
+                    reader = csv.reader(file, quoting=csv.QUOTE_MINIMAL)
+                    terms = self._parse_rows(reader)
+                logger.info(f"Загружено {len(terms)} терминов из {self.csv_path}")
+                
+                dataset = TermsDataset.from_terms(terms, csv_hash)
+                save_snapshot(self.snapshot_path, csv_hash, dataset.export_state())
+                return dataset
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+    
+    def apply_dataset(self, dataset: TermsDataset) -> bool:
+        """
+        Подменяет текущую базу собранной (в цикле событий, без await)
+        
+        Кэш результатов поиска и кэш готовых страниц сбрасываются:
+        они относятся к прежней версии базы.
+        
+        Args:
+            dataset: База из build_dataset
+        
+        Returns:
+            True, если содержимое CSV изменилось
+        """
+        previous_hash = self.dataset_hash
+        self.terms = dataset.terms
+        self.dataset_hash = dataset.dataset_hash
+        self._categories_cache = dataset.categories
+        self._subcategories_cache = dataset.subcategories
+        self._terms_cache = dataset.term_groups
+        self._search_index = dataset.search_index
+        self._stem_index = dataset.stem_index
+        self._fuzzy_index = dataset.fuzzy_index
+        self._prefix_indexes = dataset.prefix_indexes
+        self._load_mapper()
+        self.search_cache.clear()
+        self.page_cache.clear()
+        
+        # Прежние записи освобождаются подсчётом ссылок (циклов в них нет),
+        # новые замораживаем вместе с остальной кучей
+        gc.freeze()
+        return self.dataset_hash != previous_hash
+    
     def _load_terms(self) -> None:
-        """Загружает термины из CSV файла в память"""
+        """Первая загрузка базы; при ошибке сервис работает с пустой базой"""
         try:
-            with open(self.csv_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file, quoting=csv.QUOTE_MINIMAL)
-                self.terms = []
-                for row in reader:
-                    # Пропускаем строки с пустыми ключами
-                    cleaned_row = {}
-                    for key, value in row.items():
-                        if key is not None:
-                            clean_key = key.strip() if key else ''
-                            clean_value = value.strip() if value else ''
-                            if clean_key:  # Только если ключ не пустой
-                                cleaned_row[clean_key] = clean_value
-                    
-                    # Добавляем только если есть термин
-                    if cleaned_row.get('term'):
-                        self.terms.append(cleaned_row)
-                        
-            logger.info(f"Загружено {len(self.terms)} терминов из {self.csv_path}")
-            
-            # Предварительно кэшируем категории
-            self._build_cache()
-            
+            dataset = self.build_dataset()
         except FileNotFoundError:
             logger.error(f"Файл {self.csv_path} не найден")
-            self.terms = []
+            dataset = TermsDataset()
         except Exception as e:
             logger.error(f"Ошибка при загрузке CSV: {e}", exc_info=True)
-            self.terms = []
+            dataset = TermsDataset()
+        self.apply_dataset(dataset)
     
-    def _build_cache(self) -> None:
-        """Строит кэш категорий, подкатегорий и терминов для быстрого доступа O(1)"""
-        for lang in ['kk', 'ru']:
-            categories: Set[str] = set()
-            
-            for term in self.terms:
-                term_lang = term.get('lang', '').strip()
-                if term_lang == lang:
-                    cat = term.get('category', '').strip()
-                    subcat = term.get('subcategory', '').strip()
-                    
-                    if cat:
-                        categories.add(cat)
-                        
-                        # Кэш подкатегорий
-                        cache_key_subcat = f"{cat}:{lang}"
-                        if cache_key_subcat not in self._subcategories_cache:
-                            self._subcategories_cache[cache_key_subcat] = set()
-                        if subcat:
-                            self._subcategories_cache[cache_key_subcat].add(subcat)
-                        
-                        # Кэш терминов по категории/подкатегории/языку
-                        if subcat:
-                            cache_key_terms = f"{cat}:{subcat}:{lang}"
-                            if cache_key_terms not in self._terms_cache:
-                                self._terms_cache[cache_key_terms] = []
-                            self._terms_cache[cache_key_terms].append(term)
-            
-            self._categories_cache[lang] = sorted(list(categories))
+    def _load_mapper(self) -> None:
+        """Заполняет маппер ID категорий названиями из загруженной базы"""
+        get_mapper().load(
+            (cat for cats in self._categories_cache.values() for cat in cats),
+            (subcat for subcats in self._subcategories_cache.values() for subcat in subcats)
+        )
+    
+    @staticmethod
+    def _parse_rows(reader) -> List[Term]:
+        """
+        Разбирает строки CSV в записи Term без промежуточных словарей
         
-        # Преобразуем set в list для подкатегорий
-        for key in self._subcategories_cache:
-            self._subcategories_cache[key] = sorted(list(self._subcategories_cache[key]))
+        Args:
+            reader: csv.reader по файлу (первая строка - заголовок)
+        
+        Returns:
+            Список терминов; ID термина совпадает с его индексом в списке
+        """
+        header = next(reader, None)
+        if not header:
+            return []
+        
+        # Индексы колонок по очищенным названиям (пустые ключи пропускаем)
+        columns = {}
+        for index, key in enumerate(header):
+            clean_key = key.strip() if key else ''
+            if clean_key and clean_key not in columns:
+                columns[clean_key] = index
+        # Отсутствующие колонки читаются из добивки пустыми значениями
+        positions = [columns.get(field, len(header)) for field in Term.FIELDS]
+        row_length = max(positions) + 1
+        pick = itemgetter(*positions)
         
-        logger.info(f"Кэш построен: {len(self._terms_cache)} групп терминов")
+        terms: List[Term] = []
+        append = terms.append
+        for row in reader:
+            if len(row) < row_length:
+                row = row + [''] * (row_length - len(row))
+            term, description, category, subcategory, lang = pick(row)
+            term = term.strip()
+            
+            # Добавляем только если есть термин
+            if term:
+                append(Term(
+                    len(terms), term, description.strip(),
+                    category.strip(), subcategory.strip(), lang.strip()
+                ))
+        return terms
     
     def get_categories(self, lang: str = 'kk') -> List[str]:
         """
@@ -118,7 +363,7 @@ class TermsService:
         
         Args:
             lang: Язык для фильтрации ('kk' или 'ru')
-            
+        
         Returns:
             Отсортированный список уникальных категорий
         """
@@ -131,7 +376,7 @@ class TermsService:
         Args:
             category: Название категории
             lang: Язык для фильтрации ('kk' или 'ru')
-            
+        
         Returns:
             Отсортированный список уникальных подкатегорий
         """
@@ -143,7 +388,7 @@ class TermsService:
         category: str,
         subcategory: str,
         lang: str = 'kk'
-    ) -> List[Dict[str, str]]:
+    ) -> List[Term]:
         """
         Получить все термины из указанной категории и подкатегории
         Оптимизировано: O(1) доступ из кэша вместо O(n) поиска
@@ -152,24 +397,92 @@ class TermsService:
             category: Название категории
             subcategory: Название подкатегории
             lang: Язык для фильтрации ('kk' или 'ru')
-            
+        
         Returns:
             Список терминов из указанной категории/подкатегории
         """
         cache_key = f"{category}:{subcategory}:{lang}"
         return self._terms_cache.get(cache_key, [])
     
+    def make_result_set(
+        self,
+        lang: str,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        query: Optional[str] = None,
+        results: Optional[List[Term]] = None
+    ) -> ResultSet:
+        """
+        Компактное описание выборки для хранения в FSM
+        
+        Args:
+            lang: Язык терминов
+            category: Категория (None - поиск по всей базе)
+            subcategory: Подкатегория
+            query: Поисковый запрос (None - просмотр подкатегории)
+            results: Найденные термины (для поиска; подкатегория хранится без ID)
+        
+        Returns:
+            ResultSet с версией текущей базы
+        """
+        mapper = get_mapper()
+        return ResultSet(
+            version=self.dataset_hash,
+            lang=lang,
+            category_id=mapper.register_category(category) if category is not None else None,
+            subcategory_id=mapper.register_subcategory(subcategory) if subcategory is not None else None,
+            query=query,
+            term_ids=[term.id for term in results] if results is not None else None
+        )
+    
+    def get_results(self, result_set: Optional[ResultSet]) -> List[Term]:
+        """
+        Термины выборки по её описанию
+        
+        ID терминов используются напрямую, если база не менялась; после
+        перезагрузки базы поиск выполняется заново (обычно из кэша поиска).
+        
+        Args:
+            result_set: Описание выборки из FSM
+        
+        Returns:
+            Термины в порядке показа (пустой список, если выборки нет)
+        """
+        if result_set is None:
+            return []
+        
+        if result_set.term_ids is not None and result_set.version == self.dataset_hash:
+            terms = self.terms
+            return [terms[term_id] for term_id in result_set.term_ids]
+        
+        mapper = get_mapper()
+        lang = result_set.lang
+        if result_set.is_search_all:
+            return self.search_all(result_set.query, lang=lang) if result_set.query else []
+        
+        category = mapper.get_category_name(result_set.category_id)
+        subcategory = mapper.get_subcategory_name(result_set.subcategory_id)
+        if category is None or subcategory is None:
+            return []
+        if result_set.query:
+            return self.search_in_filtered(result_set.query, category, subcategory, lang=lang)
+        return self.get_terms_by_category(category, subcategory, lang=lang)
+    
     def search_in_filtered(
         self,
         query: str,
         category: str,
         subcategory: str,
         lang: str = 'kk',
-        max_results: int = None
-    ) -> List[Dict[str, str]]:
+        max_results: int = None,
+        fuzzy: bool = True
+    ) -> List[Term]:
         """
         Поиск терминов внутри отфильтрованной выборки
-        Оптимизировано: использует кэш терминов вместо прохода по всем терминам
+        Оптимизировано: кандидаты берутся из триграммного индекса и индекса
+        основ слов, термины нормализованы и стеммированы один раз при загрузке.
+        Если ничего не найдено и fuzzy=True - поиск с опечатками по названиям.
+        Результаты запросов с параметрами по умолчанию кэшируются (search_cache).
         """
         from config import settings
         
@@ -177,6 +490,7 @@ class TermsService:
             return []
         
         # Используем значение из конфига если не указано
+        cacheable = max_results is None and fuzzy
         if max_results is None:
             max_results = settings.MAX_SEARCH_RESULTS
         
@@ -187,22 +501,191 @@ class TermsService:
         if not filtered_terms:
             return []
         
-        query_lower = query.lower().strip()
-        exact_matches = []
-        partial_matches = []
-        description_matches = []
+        query_normalized = normalize(query.strip())
+        if not query_normalized:
+            return []
         
-        # Ищем только в отфильтрованных терминах (обычно 10-200 штук вместо 8000)
-        for term in filtered_terms:
-            term_name = term.get('term', '').lower()
-            description = term.get('description', '').lower()
-            
-            if term_name == query_lower:
-                exact_matches.append(term)
-            elif query_lower in term_name:
-                partial_matches.append(term)
-            elif query_lower in description:
-                description_matches.append(term)
-        
-        results = exact_matches + partial_matches + description_matches
-        return results[:max_results]
+        def in_group(term: Term) -> bool:
+            return term.subcategory == subcategory and term.category == category and term.lang == lang
+        
+        def search() -> List[int]:
+            return self._search_ids(query_normalized, lang, in_group, max_results, fuzzy, group=filtered_terms)
+        
+        if cacheable:
+            ranked = self._cached_ids((query_normalized, category, subcategory, lang), search)
+        else:
+            ranked = search()
+        return [self.terms[term_id] for term_id in ranked]
+    
+    def search_all(
+        self,
+        query: str,
+        lang: str = 'kk',
+        limit: int = None,
+        fuzzy: bool = True
+    ) -> List[Term]:
+        """
+        Поиск терминов по всей базе (все категории и подкатегории языка)
+        
+        Кандидаты берутся из общих индексов (триграммы и основы слов),
+        полного прохода по базе нет. Запросы короче триграммы ищутся
+        по точному названию и основам.
+        
+        Args:
+            query: Поисковый запрос
+            lang: Язык терминов ('kk' или 'ru')
+            limit: Максимальное количество результатов
+            fuzzy: Искать с опечатками, если точный поиск ничего не нашёл
+        
+        Returns:
+            Термины: точные совпадения -> частичные -> по описанию
+        """
+        from config import settings
+        
+        if not query:
+            return []
+        
+        cacheable = limit is None and fuzzy
+        if limit is None:
+            limit = settings.MAX_SEARCH_RESULTS
+        
+        query_normalized = normalize(query.strip())
+        if not query_normalized:
+            return []
+        
+        def search() -> List[int]:
+            return self._search_ids(query_normalized, lang, lambda term: term.lang == lang, limit, fuzzy)
+        
+        if cacheable:
+            ranked = self._cached_ids((query_normalized, None, None, lang), search)
+        else:
+            ranked = search()
+        return [self.terms[term_id] for term_id in ranked]
+    
+    @staticmethod
+    def search_key(
+        query: str,
+        lang: str = 'kk',
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None
+    ) -> Optional[tuple]:
+        """
+        Ключ кэша результатов поиска (для search_cache.first_page)
+        
+        Args:
+            query: Поисковый запрос (как передан в поиск)
+            lang: Язык
+            category: Категория (None - поиск по всей базе)
+            subcategory: Подкатегория (None - поиск по всей базе)
+        
+        Returns:
+            (нормализованный запрос, категория, подкатегория, язык) или None для пустого запроса
+        """
+        query_normalized = normalize(query.strip()) if query else ''
+        if not query_normalized:
+            return None
+        return query_normalized, category, subcategory, lang
+    
+    def _cached_ids(self, key: tuple, search: Callable[[], List[int]]) -> List[int]:
+        """ID результатов из кэша поиска или результат search() с сохранением в кэш"""
+        entry = self.search_cache.get(key)
+        if entry is None:
+            entry = self.search_cache.put(key, search())
+        return entry.term_ids
+    
+    def autocomplete(self, prefix: str, lang: str = 'kk', limit: int = None) -> List[Term]:
+        """
+        Термины, название которых (или слово в названии) начинается с префикса
+        
+        Для inline-режима: вызывается на каждое нажатие клавиши, поэтому
+        использует только отсортированный индекс префиксов, без поиска
+        по описаниям и без перебора терминов.
+        
+        Args:
+            prefix: Начало названия
+            lang: Язык терминов ('kk' или 'ru')
+            limit: Максимальное количество результатов
+        
+        Returns:
+            Термины: сначала совпадения с начала названия, затем по слову
+        """
+        from config import settings
+        
+        if limit is None:
+            limit = settings.INLINE_RESULTS_LIMIT
+        
+        index = self._prefix_indexes.get(lang)
+        if index is None or not prefix:
+            return []
+        
+        term_ids = index.lookup(normalize(prefix.strip()), limit)
+        return [self.terms[term_id] for term_id in term_ids]
+    
+    def _search_ids(
+        self,
+        query: str,
+        lang: str,
+        accept: Callable[[Term], bool],
+        limit: int,
+        fuzzy: bool,
+        group: Optional[List[Term]] = None
+    ) -> List[int]:
+        """
+        Общий поиск по индексам
+        
+        Кандидаты: пересечение триграммных списков вхождений плюс термины,
+        содержащие все основы слов запроса. Если запрос короче триграммы
+        или группа меньше самого короткого списка вхождений - перебирается
+        группа (без группы - точные названия). Если ничего не найдено -
+        поиск с опечатками.
+        
+        Args:
+            query: Нормализованный запрос
+            lang: Язык запроса (правила стемминга)
+            accept: Фильтр терминов (группа или язык)
+            limit: Максимальное количество результатов
+            fuzzy: Разрешить поиск с опечатками
+            group: Термины группы (категория/подкатегория/язык), если поиск в группе
+        
+        Returns:
+            ID терминов: точные совпадения -> частичные -> по описанию
+        """
+        index = self._search_index
+        stems = self._stem_index.match(query, lang)
+        
+        candidate_ids = index.candidates(query, max_candidates=len(group) if group is not None else None)
+        if candidate_ids is None and group is not None:
+            term_ids = [term.id for term in group]
+        else:
+            if candidate_ids is None:
+                candidate_ids = index.exact(query)
+            if stems.ids:
+                candidate_ids = sorted(stems.ids.union(candidate_ids))
+            terms = self.terms
+            term_ids = [term_id for term_id in candidate_ids if accept(terms[term_id])]
+        
+        ranked = index.rank(term_ids, query, limit, stems)
+        if not ranked and fuzzy:
+            ranked = self._fuzzy_search(query, accept, limit)
+        return ranked
+    
+    def _fuzzy_search(self, query: str, accept: Callable[[Term], bool], limit: int) -> List[int]:
+        """
+        Поиск с опечатками по названиям (расстояние редактирования 1-2)
+        
+        Args:
+            query: Нормализованный запрос
+            accept: Фильтр терминов (группа или язык)
+            limit: Максимальное количество результатов
+        
+        Returns:
+            ID терминов: сначала ближайшие по расстоянию
+        """
+        terms = self.terms
+        result = []
+        for _, term_id in self._fuzzy_index.lookup(query):
+            if accept(terms[term_id]):
+                result.append(term_id)
+                if len(result) >= limit:
+                    break
+        return result
@@ -0,0 +1,108 @@
+"""
+Бинарный снимок базы терминов для быстрого старта
+
+Снимок хранит уже разобранные термины (по колонкам) и все предварительно
+построенные кэши TermsService. Он привязан к хэшу содержимого CSV: если CSV
+изменился, снимок считается устаревшим и пересобирается из CSV.
+
+Формат файла: заголовок (магическая строка, версия формата, хэш CSV)
+и pickle-полезная нагрузка. Читается одним read().
+"""
+import hashlib
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, Dict, Optional
+from utils.logger import get_logger
+
+logger = get_logger('services.terms_snapshot')
+
+SNAPSHOT_MAGIC = b'KRNKSNAP'
+# Увеличивается при любом изменении содержимого снимка
+SNAPSHOT_FORMAT = 9
+
+_HASH_SIZE = 16
+_HEADER = struct.Struct(f'<8sH{_HASH_SIZE}s')
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path: Path) -> str:
+    """
+    Хэш содержимого файла (BLAKE2b, 128 бит)
+    
+    Args:
+        path: Путь к файлу
+        
+    Returns:
+        Хэш в шестнадцатеричном виде
+    """
+    digest = hashlib.blake2b(digest_size=_HASH_SIZE)
+    with open(path, 'rb') as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path_for(csv_path: Path) -> Path:
+    """Путь к снимку по умолчанию: data/cache/<имя CSV>.snapshot"""
+    return csv_path.parent / 'cache' / f'{csv_path.stem}.snapshot'
+
+
+def load_snapshot(path: Path, csv_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Загрузить снимок, если он соответствует текущему CSV
+    
+    Args:
+        path: Путь к файлу снимка
+        csv_hash: Хэш текущего содержимого CSV
+        
+    Returns:
+        Состояние TermsService или None, если снимка нет или он устарел
+    """
+    try:
+        raw = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Не удалось прочитать снимок {path}: {e}")
+        return None
+    
+    if len(raw) < _HEADER.size:
+        return None
+    
+    magic, fmt, digest = _HEADER.unpack_from(raw)
+    if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT or digest.hex() != csv_hash:
+        logger.info(f"Снимок {path} устарел, будет пересобран из CSV")
+        return None
+    
+    try:
+        return pickle.loads(memoryview(raw)[_HEADER.size:])
+    except Exception as e:
+        logger.warning(f"Снимок {path} повреждён: {e}")
+        return None
+
+
+def save_snapshot(path: Path, csv_hash: str, state: Dict[str, Any]) -> None:
+    """
+    Атомарно сохранить снимок (через временный файл и os.replace)
+    
+    Ошибки записи не критичны: бот продолжит работу с данными из CSV.
+    
+    Args:
+        path: Путь к файлу снимка
+        csv_hash: Хэш содержимого CSV, из которого построено состояние
+        state: Состояние TermsService
+    """
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, bytes.fromhex(csv_hash))
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logger.info(f"Снимок терминов сохранён: {path}")
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить снимок {path}: {e}")
+        tmp_path.unlink(missing_ok=True)
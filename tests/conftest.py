@@ -0,0 +1,14 @@
+"""
+Общие настройки тестов
+
+Тесты запускаются из корня проекта: python -m pytest -q
+"""
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# config.Settings требует BOT_TOKEN в формате Telegram
+os.environ.setdefault('BOT_TOKEN', '123456:' + 'A' * 35)
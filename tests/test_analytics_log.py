@@ -0,0 +1,140 @@
+"""
+Журнал аналитики по дням: перенос прежнего analytics.csv, сжатие и срок хранения
+"""
+import csv
+import os
+from datetime import date, timedelta
+
+import pytest
+
+from services import analytics_log
+from services.analytics_log import COLUMNS, AnalyticsLog, data_size, iter_rows
+
+TODAY = date(2026, 3, 10)
+
+
+def day(offset):
+    return (TODAY - timedelta(days=offset)).isoformat()
+
+
+def row(day_str, user_id, query='вода'):
+    return [f'{day_str}T09:30:00', str(user_id), 'user', 'search', 'ru', '', '', query, '1']
+
+
+def read_all(log):
+    return [row for _, path in log.partitions() for _, row in iter_rows(path)]
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    """Прежний единый журнал: несколько дней, запрос с кавычками и переводом строки"""
+    rows = [
+        row(day(3), 1),
+        row(day(3), 2, query='a,b "c"\nd'),
+        row(day(2), 3),
+        row(day(0), 4),
+    ]
+    path = tmp_path / 'analytics.csv'
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    return path, rows
+
+
+def test_migrate_splits_by_day(tmp_path, legacy):
+    legacy_path, rows = legacy
+    log = AnalyticsLog(tmp_path / 'analytics')
+    
+    assert log.migrate(legacy_path)
+    assert [d for d, _ in log.partitions()] == [day(3), day(2), day(0)]
+    assert read_all(log) == rows
+    assert not legacy_path.exists()
+    assert (tmp_path / 'analytics.csv.migrated').exists()
+    assert not (tmp_path / 'analytics.migrating').exists()
+    
+    # Повторный запуск ничего не делает
+    assert not log.migrate(legacy_path)
+
+
+def test_migrate_into_directory_with_other_files(tmp_path, legacy):
+    legacy_path, rows = legacy
+    directory = tmp_path / 'analytics'
+    directory.mkdir()
+    (directory / 'notes.txt').write_text('x', encoding='utf-8')
+    
+    log = AnalyticsLog(directory)
+    assert log.migrate(legacy_path)
+    assert read_all(log) == rows
+    assert (directory / 'notes.txt').exists()
+
+
+def test_migrate_skipped_when_days_exist(tmp_path, legacy):
+    legacy_path, _ = legacy
+    log = AnalyticsLog(tmp_path / 'analytics')
+    log.append([row(day(0), 9)])
+    
+    assert not log.migrate(legacy_path)
+    assert legacy_path.exists()
+    assert len(read_all(log)) == 1
+
+
+def test_migrate_failure_keeps_legacy_log(tmp_path, legacy, monkeypatch):
+    legacy_path, rows = legacy
+    log = AnalyticsLog(tmp_path / 'analytics')
+    replace = os.replace
+    
+    def failing_replace(src, dst):
+        if str(src) == str(legacy_path):
+            raise PermissionError('read-only')
+        return replace(src, dst)
+    
+    monkeypatch.setattr(analytics_log.os, 'replace', failing_replace)
+    assert not log.migrate(legacy_path)
+    assert log.partitions() == []
+    assert legacy_path.exists()
+    assert not (tmp_path / 'analytics.migrating').exists()
+    
+    # Следующий запуск переносит журнал
+    monkeypatch.setattr(analytics_log.os, 'replace', replace)
+    assert log.migrate(legacy_path)
+    assert read_all(log) == rows
+
+
+def test_compact_compresses_closed_days(tmp_path):
+    log = AnalyticsLog(tmp_path / 'analytics')
+    rows = [row(day(offset), offset) for offset in (3, 2, 1, 0)]
+    log.append(rows)
+    sizes = {d: path.stat().st_size for d, path in log.partitions()}
+    
+    assert log.compact(TODAY) == []
+    names = sorted(path.name for path in (tmp_path / 'analytics').iterdir())
+    # Вчерашний день ещё может дописываться - остаётся открытым
+    assert names == [f'{day(3)}.csv.gz', f'{day(2)}.csv.gz', f'{day(1)}.csv', f'{day(0)}.csv']
+    assert read_all(log) == rows
+    # Смещения сжатых файлов - в распакованных данных
+    assert {d: data_size(path) for d, path in log.partitions()} == sizes
+
+
+def test_compact_retention(tmp_path):
+    log = AnalyticsLog(tmp_path / 'analytics')
+    log.append([row(day(offset), offset) for offset in (40, 31, 30, 2, 0)])
+    log.compact(TODAY)
+    
+    assert log.compact(TODAY, retention_days=30) == [day(40), day(31)]
+    assert [d for d, _ in log.partitions()] == [day(30), day(2), day(0)]
+
+
+def test_compact_after_interrupted_compression(tmp_path):
+    log = AnalyticsLog(tmp_path / 'analytics')
+    log.append([row(day(5), 1), row(day(5), 2)])
+    plain = log.path_for(day(5))
+    # Сжатие прервалось после rename: остались оба файла и временный
+    log.compact(TODAY)
+    log.append([row(day(5), 3)])
+    (tmp_path / 'analytics' / f'{day(5)}.csv.gz.tmp').write_bytes(b'partial')
+    
+    assert [path.name for _, path in log.partitions()] == [f'{day(5)}.csv.gz']
+    log.compact(TODAY)
+    assert not plain.exists()
+    assert [r[1] for r in read_all(log)] == ['1', '2']
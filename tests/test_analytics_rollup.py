@@ -0,0 +1,149 @@
+"""
+Дневные агрегаты аналитики: дочитывание журнала после неполного сохранения
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from services.analytics_log import AnalyticsLog
+from services.analytics_rollup import AnalyticsRollups
+
+TODAY = date.today()
+OLD_DAY = (TODAY - timedelta(days=5)).isoformat()
+DAY = TODAY.isoformat()
+
+
+def row(day, user_id, query='', results=0, event='search'):
+    return [f'{day}T12:00:00', str(user_id), 'user', event, 'kk', 'Медицина', 'Емхана', query, str(results)]
+
+
+def batch(day, start, count):
+    return [row(day, start + i, query=f'запрос {i % 3}', results=i % 2) for i in range(count)]
+
+
+@pytest.fixture
+def log(tmp_path):
+    return AnalyticsLog(tmp_path / 'analytics')
+
+
+def rebuilt(log, tmp_path):
+    """Агрегаты, построенные с нуля из журнала (эталон)"""
+    rollups = AnalyticsRollups(tmp_path / 'rebuilt')
+    rollups.load(log)
+    return rollups
+
+
+def assert_same(rollups, expected):
+    for days in (0, 7):
+        actual_total, actual_today = rollups.summarize(days)
+        expected_total, expected_today = expected.summarize(days)
+        assert actual_total.to_dict() == expected_total.to_dict()
+        assert actual_today.to_dict() == expected_today.to_dict()
+
+
+def test_replay_after_partial_flush(log, tmp_path):
+    rollups = AnalyticsRollups(tmp_path / 'rollups', flush_interval=3600)
+    rollups.load(log)
+    rollups.add_written(log.append(batch(DAY, 0, 10)))
+    rollups.flush()
+    # Эти батчи ещё не сохранены - процесс «падает» до сброса
+    rollups.add_written(log.append(batch(DAY, 10, 7)))
+    rollups.add_written(log.append(batch(OLD_DAY, 0, 4)))
+    
+    restarted = AnalyticsRollups(tmp_path / 'rollups')
+    restarted.load(log)
+    
+    total, current = restarted.summarize(7)
+    assert total.events == 21
+    assert current.events == 17
+    assert_same(restarted, rebuilt(log, tmp_path))
+
+
+def test_flush_interval_limits_writes(log, tmp_path):
+    rollups_dir = tmp_path / 'rollups'
+    rollups = AnalyticsRollups(rollups_dir, flush_interval=3600)
+    rollups.load(log)
+    rollups.add_written(log.append(batch(DAY, 0, 3)))
+    assert not (rollups_dir / f'{DAY}.json').exists()
+    
+    rollups.flush()
+    assert (rollups_dir / f'{DAY}.json').exists()
+    
+    every_batch = AnalyticsRollups(tmp_path / 'every_batch', flush_interval=0)
+    every_batch.load(log)
+    every_batch.add_written(log.append(batch(DAY, 3, 1)))
+    assert (tmp_path / 'every_batch' / f'{DAY}.json').exists()
+
+
+def test_replay_compressed_day(log, tmp_path):
+    rollups = AnalyticsRollups(tmp_path / 'rollups', flush_interval=3600)
+    rollups.load(log)
+    rollups.add_written(log.append(batch(OLD_DAY, 0, 5)))
+    rollups.flush()
+    rollups.add_written(log.append(batch(OLD_DAY, 5, 3)))
+    
+    # День сжат, а сохранённый агрегат отстаёт от файла
+    log.compact(TODAY)
+    assert log.partitions()[0][1].name.endswith('.csv.gz')
+    
+    restarted = AnalyticsRollups(tmp_path / 'rollups')
+    restarted.load(log)
+    assert restarted.summarize(7)[0].events == 8
+    assert_same(restarted, rebuilt(log, tmp_path))
+
+
+def test_rebuild_when_offset_beyond_file(log, tmp_path):
+    rollups = AnalyticsRollups(tmp_path / 'rollups')
+    rollups.load(log)
+    rollups.add_written(log.append(batch(DAY, 0, 6)))
+    rollups.flush()
+    
+    # Файл дня заменён более коротким (восстановлен из копии)
+    log.path_for(DAY).unlink()
+    log.append(batch(DAY, 0, 2))
+    
+    restarted = AnalyticsRollups(tmp_path / 'rollups')
+    restarted.load(log)
+    assert restarted.summarize(0)[1].events == 2
+
+
+def test_corrupted_rollup_rebuilt(log, tmp_path):
+    rollups = AnalyticsRollups(tmp_path / 'rollups')
+    rollups.load(log)
+    rollups.add_written(log.append(batch(DAY, 0, 4)))
+    rollups.flush()
+    (tmp_path / 'rollups' / f'{DAY}.json').write_text('{"day": ', encoding='utf-8')
+    
+    restarted = AnalyticsRollups(tmp_path / 'rollups')
+    restarted.load(log)
+    assert_same(restarted, rebuilt(log, tmp_path))
+
+
+@pytest.mark.parametrize('content', [
+    '{"day": "%s", "offset": 10}',              # нет части ключей
+    '{"day": "%s", "offset": 0, "events": 1, "users": 5, "languages": {}, '
+    '"categories": {}, "queries": {}, "searches": 0, "successful_searches": 0}',  # неверный тип
+    '["%s"]',                                   # не объект
+])
+def test_rollup_with_wrong_keys_rebuilt(log, tmp_path, content):
+    rollups = AnalyticsRollups(tmp_path / 'rollups')
+    rollups.load(log)
+    rollups.add_written(log.append(batch(DAY, 0, 4)))
+    rollups.flush()
+    (tmp_path / 'rollups' / f'{DAY}.json').write_text(content % DAY, encoding='utf-8')
+    
+    restarted = AnalyticsRollups(tmp_path / 'rollups')
+    restarted.load(log)
+    assert restarted.summarize(0)[1].events == 4
+    assert_same(restarted, rebuilt(log, tmp_path))
+
+
+def test_drop_removes_days(log, tmp_path):
+    rollups = AnalyticsRollups(tmp_path / 'rollups')
+    rollups.load(log)
+    rollups.add_written(log.append(batch(OLD_DAY, 0, 2) + batch(DAY, 0, 3)))
+    rollups.flush()
+    
+    rollups.drop([OLD_DAY])
+    assert not (tmp_path / 'rollups' / f'{OLD_DAY}.json').exists()
+    assert rollups.summarize(7)[0].events == 3
@@ -0,0 +1,109 @@
+"""
+Перенос CSV-журнала в SQLite: повторный запуск, дочитывание открытого дня, прерванный перенос
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from services import analytics_sqlite
+from services.analytics_log import AnalyticsLog
+from services.analytics_sqlite import SQLiteAnalyticsStore
+
+TODAY = date.today()
+OLD_DAY = (TODAY - timedelta(days=3)).isoformat()
+DAY = TODAY.isoformat()
+
+
+def row(day, user_id, query='вода', results=1):
+    return [f'{day}T10:00:00', str(user_id), 'user', 'search', 'kk', '', '', query, str(results)]
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = AnalyticsLog(tmp_path / 'analytics')
+    log.append([row(OLD_DAY, i) for i in range(4)] + [row(DAY, i) for i in range(3)])
+    return log
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteAnalyticsStore(tmp_path / 'analytics.sqlite3')
+    yield store
+    store.close()
+
+
+def stored_users(store):
+    return sorted((row[0][:10], int(row[1])) for row in store.iter_rows())
+
+
+def test_import_is_idempotent(log, store):
+    assert store.import_csv([log.directory]) == (2, 7)
+    assert store.import_csv([log.directory]) == (0, 0)
+    assert len(list(store.iter_rows())) == 7
+
+
+def test_open_day_resumed(log, store):
+    store.import_csv([log.directory])
+    
+    # Бот продолжает писать в файл текущего дня, последняя запись ещё не дописана
+    log.append([row(DAY, 3), row(DAY, 4)])
+    with open(log.path_for(DAY), 'a', encoding='utf-8') as f:
+        f.write(f'{DAY}T11:00:00,5,user,sea')
+    
+    assert store.import_csv([log.directory]) == (1, 2)
+    assert store.import_csv([log.directory]) == (0, 0)
+    
+    with open(log.path_for(DAY), 'a', encoding='utf-8') as f:
+        f.write('rch,kk,,,вода,1\r\n')
+    assert store.import_csv([log.directory]) == (1, 1)
+    assert stored_users(store) == sorted(
+        [(OLD_DAY, i) for i in range(4)] + [(DAY, i) for i in range(6)]
+    )
+
+
+def test_compressed_day_not_imported_again(log, store):
+    store.import_csv([log.directory])
+    log.compact(TODAY + timedelta(days=2))
+    assert all(path.name.endswith('.csv.gz') for _, path in log.partitions())
+    
+    assert store.import_csv([log.directory]) == (0, 0)
+    assert len(list(store.iter_rows())) == 7
+
+
+def test_day_appended_then_compressed(log, store):
+    store.import_csv([log.directory])
+    log.append([row(DAY, 3)])
+    log.compact(TODAY + timedelta(days=2))
+    
+    assert store.import_csv([log.directory]) == (1, 1)
+    assert len(list(store.iter_rows())) == 8
+
+
+def test_interrupted_import_repeated(log, store, monkeypatch):
+    iter_rows = analytics_sqlite.iter_rows
+    
+    def failing_rows(path, offset=0):
+        for index, item in enumerate(iter_rows(path, offset)):
+            if index == 2:
+                raise OSError('disk error')
+            yield item
+    
+    monkeypatch.setattr(analytics_sqlite, 'iter_rows', failing_rows)
+    with pytest.raises(OSError):
+        store.import_csv([log.directory])
+    assert list(store.iter_rows()) == []
+    
+    monkeypatch.setattr(analytics_sqlite, 'iter_rows', iter_rows)
+    assert store.import_csv([log.directory]) == (2, 7)
+
+
+def test_version_changes_after_write(store):
+    version = store.version()
+    assert store.version() == version
+    
+    store.append([row(DAY, 1)])
+    assert store.version() != version
+    
+    # Версия читается своим соединением и не ждёт соединения записи
+    with store._lock:
+        assert store.version() == store.version()
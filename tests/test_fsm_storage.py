@@ -0,0 +1,151 @@
+"""
+Вытеснение сессий PersistentStorage: TTL неактивных сессий, выгрузка сверх лимита, язык
+"""
+import asyncio
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from services import fsm_storage
+from services.fsm_storage import MemoryBackend, PersistentStorage, SQLiteBackend
+
+TTL = 100.0
+
+
+class Clock:
+    """Управляемое время для time.time() хранилища и бэкендов"""
+    
+    def __init__(self):
+        self.now = 1_000_000.0
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fsm_storage.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_backend(request, tmp_path):
+    """Фабрика бэкенда; SQLite открывается на том же файле (как после перезапуска)"""
+    if request.param == 'memory':
+        backend = MemoryBackend()
+        return lambda: backend
+    return lambda: SQLiteBackend(str(tmp_path / 'fsm.sqlite3'))
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_idle_session_evicted_language_kept(clock, make_backend):
+    async def scenario():
+        storage = PersistentStorage(make_backend(), session_ttl=TTL)
+        await storage.set_state(key(1), 'Browse:results')
+        await storage.set_data(key(1), {'language': 'ru', 'page': 3})
+        await storage.flush()
+        
+        clock.advance(TTL + 1)
+        assert await storage.sweep() == 1
+        assert storage.stats()['sessions'] == 0
+        assert storage.stats()['evicted_idle'] == 1
+        
+        assert await storage.get_state(key(1)) is None
+        assert await storage.get_data(key(1)) == {'language': 'ru'}
+        await storage.close()
+    
+    run(scenario())
+
+
+def test_overflow_unloaded_but_kept_in_backend(clock, make_backend):
+    async def scenario():
+        storage = PersistentStorage(make_backend(), session_ttl=TTL, max_sessions=2)
+        for user_id in (1, 2, 3):
+            await storage.set_data(key(user_id), {'language': 'kk', 'user': user_id})
+            clock.advance(1)
+        
+        # Несохранённые изменения записываются до выгрузки
+        assert await storage.sweep() == 1
+        stats = storage.stats()
+        assert stats['sessions'] == 2
+        assert stats['evicted_overflow'] == 1
+        assert stats['dirty'] == 0
+        
+        # Самая давняя сессия читается из бэкенда целиком
+        assert await storage.get_data(key(1)) == {'language': 'kk', 'user': 1}
+        await storage.close()
+    
+    run(scenario())
+
+
+def test_active_reader_does_not_expire(clock, make_backend):
+    async def scenario():
+        storage = PersistentStorage(make_backend(), session_ttl=TTL)
+        await storage.set_data(key(1), {'language': 'ru', 'page': 2})
+        await storage.flush()
+        
+        # Пользователь только читает состояние, но дольше TTL в сумме
+        for _ in range(5):
+            clock.advance(TTL / 2)
+            assert await storage.get_data(key(1)) == {'language': 'ru', 'page': 2}
+            await storage.sweep()
+        
+        assert storage.stats()['evicted_idle'] == 0
+        await storage.close()
+        
+        # После перезапуска строка в бэкенде тоже жива
+        restarted = PersistentStorage(make_backend(), session_ttl=TTL)
+        clock.advance(TTL / 2)
+        await restarted.sweep()
+        assert await restarted.get_data(key(1)) == {'language': 'ru', 'page': 2}
+        await restarted.close()
+    
+    run(scenario())
+
+
+def test_unloaded_session_expires_in_backend(clock, make_backend):
+    async def scenario():
+        storage = PersistentStorage(make_backend(), session_ttl=TTL, max_sessions=1)
+        await storage.set_data(key(1), {'language': 'ru', 'page': 5})
+        clock.advance(1)
+        await storage.set_data(key(2), {'language': 'kk'})
+        await storage.sweep()
+        assert storage.stats()['evicted_overflow'] == 1
+        
+        # Выгруженная сессия без обращений истекает в бэкенде, язык остаётся
+        clock.advance(TTL / 2)
+        await storage.get_data(key(2))
+        clock.advance(TTL / 2 + 1)
+        await storage.sweep()
+        assert await storage.get_data(key(1)) == {'language': 'ru'}
+        assert await storage.get_data(key(2)) == {'language': 'kk'}
+        await storage.close()
+    
+    run(scenario())
+
+
+def test_cleared_session_deleted(clock, make_backend):
+    async def scenario():
+        storage = PersistentStorage(make_backend(), session_ttl=TTL)
+        await storage.set_data(key(1), {'page': 1})
+        await storage.flush()
+        await storage.set_data(key(1), {})
+        await storage.close()
+        
+        restarted = PersistentStorage(make_backend(), session_ttl=TTL)
+        assert await restarted.get_data(key(1)) == {}
+        assert await restarted.get_state(key(1)) is None
+        await restarted.close()
+    
+    run(scenario())
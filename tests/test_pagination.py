@@ -0,0 +1,136 @@
+"""
+Лимиты Telegram при пагинации: текст страницы (4096) и callback_data (64 байта)
+"""
+import pytest
+
+from keyboards import ResultsPage, get_results_keyboard
+from models import ResultSet, Term
+from utils.formatter import format_planned_page, message_length, plan_pages
+from utils.validators import MAX_CALLBACK_DATA_LENGTH, MAX_CATEGORY_ID, MAX_MESSAGE_LENGTH
+
+# Как в handlers.results: место под заголовок страницы
+MAX_LENGTH = MAX_MESSAGE_LENGTH - 512
+
+
+def make_terms(count, description_length):
+    return [
+        Term(i, f'Термин {i}', 'Сипаттама ' + 'ә' * description_length, 'Медицина', 'Емхана', 'kk')
+        for i in range(count)
+    ]
+
+
+def render_all(terms, plan, **kwargs):
+    return [
+        format_planned_page(terms, plan, page, max_length=MAX_LENGTH, **kwargs)
+        for page in range(1, plan.page_count + 1)
+    ]
+
+
+@pytest.mark.parametrize('count, description_length', [
+    (35, 20),      # короткие термины - ограничивает per_page
+    (40, 900),     # длинные термины - ограничивает длина сообщения
+    (25, 3000),    # термин почти на всю страницу
+])
+def test_pages_fit_message(count, description_length):
+    terms = make_terms(count, description_length)
+    plan = plan_pages(terms, per_page=10, max_length=MAX_LENGTH)
+    
+    assert plan.offsets[0] == 0 and plan.offsets[-1] == count
+    for page, text in enumerate(render_all(terms, plan), 1):
+        start, end = plan.bounds(page)
+        assert 1 <= end - start <= 10
+        assert message_length(text) <= MAX_LENGTH
+        assert not text.endswith('…')
+
+
+def test_short_terms_fill_pages():
+    plan = plan_pages(make_terms(35, 20), per_page=10, max_length=MAX_LENGTH)
+    assert plan.offsets == [0, 10, 20, 30, 35]
+
+
+def test_oversized_term_is_truncated():
+    terms = make_terms(3, 10)
+    terms[1] = Term(1, 'Ұзын', 'ұ' * (MAX_MESSAGE_LENGTH * 2), 'Медицина', 'Емхана', 'kk')
+    plan = plan_pages(terms, per_page=10, max_length=MAX_LENGTH)
+    
+    assert plan.offsets == [0, 1, 2, 3]
+    text = format_planned_page(terms, plan, 2, max_length=MAX_LENGTH)
+    assert message_length(text) <= MAX_LENGTH
+    assert text.endswith('…')
+
+
+@pytest.mark.parametrize('description', [
+    '*жирный* _курсив_ `код` [ссылка](http://x) \\ ' * 2000,
+    '🙂*' * 5000,
+    'a\\' * 5000,
+])
+def test_truncated_markdown_stays_valid(description):
+    terms = [Term(0, 'Ұзын_атау.', description, 'Медицина', 'Емхана', 'kk')]
+    plan = plan_pages(terms, per_page=10, max_length=MAX_LENGTH)
+    text = format_planned_page(terms, plan, 1, max_length=MAX_LENGTH)
+    
+    assert message_length(text) <= MAX_LENGTH
+    assert text.startswith('1. **Ұзын\\_атау\\.**\n')
+    assert text.endswith('…')
+    body = text.split('\n', 1)[1][:-1]
+    # Каждый символ сущности экранирован, экранирование не обрывается на конце
+    unescaped = body
+    for char in '_*`[\\':
+        unescaped = unescaped.replace('\\' + char, '')
+    assert not any(char in unescaped for char in '_*`[\\')
+    text.encode('utf-8')  # суррогатные пары не разрезаны
+
+
+def test_oversized_name_is_truncated():
+    terms = [Term(0, 'ә.' * MAX_MESSAGE_LENGTH, 'Сипаттама', 'Медицина', 'Емхана', 'kk')]
+    plan = plan_pages(terms, per_page=10, max_length=MAX_LENGTH)
+    text = format_planned_page(terms, plan, 1, max_length=MAX_LENGTH)
+    
+    assert message_length(text) <= MAX_LENGTH
+    assert text.startswith('1. **ә\\.') and text.endswith('**…')
+    assert not text[:-3].endswith('\\')
+
+
+def test_length_counts_utf16_units():
+    # Эмодзи - две кодовые единицы UTF-16: лимит Telegram считается в них
+    terms = [Term(i, f'Термин {i}', '🙂' * 600, 'Медицина', 'Емхана', 'kk') for i in range(10)]
+    plan = plan_pages(terms, per_page=10, max_length=MAX_LENGTH)
+    
+    assert plan.page_count > 2
+    for text in render_all(terms, plan):
+        assert message_length(text) <= MAX_LENGTH
+
+
+def test_empty_results():
+    plan = plan_pages([], per_page=10, max_length=MAX_LENGTH)
+    assert plan.page_count == 1
+    assert plan.bounds(1) == (0, 0)
+    assert format_planned_page([], plan, 1, max_length=MAX_LENGTH) == ''
+
+
+@pytest.mark.parametrize('result_set, token', [
+    (ResultSet('v', 'kk', MAX_CATEGORY_ID, MAX_CATEGORY_ID), None),
+    (ResultSet('v', 'kk', MAX_CATEGORY_ID, MAX_CATEGORY_ID, query='ә' * 200), 'Jm0Qx-4b'),
+    (ResultSet('v', 'ru', query='ә' * 200), 'Jm0Qx-4b'),
+])
+def test_callback_data_fits_limit(result_set, token):
+    page = ResultsPage.for_results(result_set, page=99999, token=token)
+    data = page.pack()
+    
+    assert len(data.encode('utf-8')) <= MAX_CALLBACK_DATA_LENGTH
+    assert ResultsPage.unpack(data) == page
+
+
+def test_keyboard_buttons_fit_limit():
+    terms = make_terms(300, 20)
+    plan = plan_pages(terms, per_page=10, max_length=MAX_LENGTH)
+    result_set = ResultSet('v', 'kk', MAX_CATEGORY_ID, MAX_CATEGORY_ID, query='ә' * 200)
+    page = ResultsPage.for_results(result_set, page=15, token='Jm0Qx-4b')
+    
+    keyboard = get_results_keyboard('kk', page=page, plan=plan)
+    callbacks = [button.callback_data for row in keyboard.inline_keyboard for button in row]
+    
+    assert page.model_copy(update={'page': 14}).pack() in callbacks
+    assert page.model_copy(update={'page': 16}).pack() in callbacks
+    for data in callbacks:
+        assert len(data.encode('utf-8')) <= MAX_CALLBACK_DATA_LENGTH
@@ -0,0 +1,120 @@
+"""
+Полнота поиска: словоформы (стемминг kk/ru), опечатки и автодополнение по префиксу
+"""
+import csv
+
+import pytest
+
+from services.terms_service import TermsService
+
+TERMS = [
+    ('Отбасылық емхана', 'Отбасы мүшелеріне арналған емхана.', 'Медицина', 'Емхана', 'kk'),
+    ('Отбасылық емхана', 'Клиника для членов семьи.', 'Медицина', 'Поликлиники', 'ru'),
+    ('Мейірім', 'Мейірімділік, жанашырлық.', 'Медицина', 'Емхана', 'kk'),
+    ('Мейірім', 'Доброта, милосердие, сострадание.', 'Медицина', 'Поликлиники', 'ru'),
+    ('Мұрагер', 'Ата-анасынан мүлік алатын адам.', 'Товары', 'Сауда орталықтары', 'kk'),
+    ('Мұрагер', 'Наследник, получающий имущество от родителей.', 'Товары', 'Торговые центры', 'ru'),
+    ('Қолтаңба', 'Құжаттағы қолжазба белгі.', 'Бизнес орталықтары', 'Нотариус', 'kk'),
+    ('Қолтаңба', 'Подпись на книге или документе.', 'Бизнес центры', 'Нотариус', 'ru'),
+]
+
+
+@pytest.fixture
+def terms_service(tmp_path):
+    """TermsService на небольшой базе (синглтон пересоздаётся для каждого теста)"""
+    csv_path = tmp_path / 'terms.csv'
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['term', 'description', 'category', 'subcategory', 'lang'])
+        writer.writerows(TERMS)
+    
+    TermsService._instance = None
+    TermsService._initialized = False
+    service = TermsService(str(csv_path), str(tmp_path / 'terms.snapshot'))
+    yield service
+    TermsService._instance = None
+    TermsService._initialized = False
+
+
+def names(terms):
+    return [term.term for term in terms]
+
+
+@pytest.mark.parametrize('query, lang, expected', [
+    ('емханалар', 'kk', 'Отбасылық емхана'),      # множественное число
+    ('емханаға', 'kk', 'Отбасылық емхана'),       # падежное окончание
+    ('клиники', 'ru', 'Отбасылық емхана'),        # словоформа в описании
+    ('наследника', 'ru', 'Мұрагер'),
+    ('документов', 'ru', 'Қолтаңба'),
+])
+def test_word_forms(terms_service, query, lang, expected):
+    assert expected in names(terms_service.search_all(query, lang))
+
+
+def test_search_all_keeps_language(terms_service):
+    results = terms_service.search_all('мейірім', 'ru')
+    assert names(results) == ['Мейірім']
+    assert results[0].lang == 'ru'
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('мұрагр', 'Мұрагер'),     # пропуск буквы
+    ('мейрим', 'Мейірім'),     # две ошибки
+    ('қолтанба', 'Қолтаңба'),  # замена буквы
+    ('отбасылык емхна', 'Отбасылық емхана'),  # опечатка в одном из слов названия
+])
+def test_typos(terms_service, query, expected):
+    assert expected in names(terms_service.search_all(query, 'kk'))
+
+
+def test_typos_only_as_fallback(terms_service):
+    assert names(terms_service.search_all('мұрагр', 'kk', fuzzy=False)) == []
+
+
+def test_typos_match_every_query_word(terms_service):
+    # Слова запроса близки к словам разных терминов - общего термина нет
+    assert names(terms_service.search_all('мейрим емхна', 'kk')) == []
+
+
+def test_search_in_filtered_stays_in_group(terms_service):
+    results = terms_service.search_in_filtered('емхана', 'Медицина', 'Емхана', 'kk')
+    assert names(results) == ['Отбасылық емхана']
+    assert terms_service.search_in_filtered('мұрагер', 'Медицина', 'Емхана', 'kk') == []
+
+
+@pytest.mark.parametrize('prefix, expected', [
+    ('мұр', ['Мұрагер']),
+    ('Отба', ['Отбасылық емхана']),
+    ('емх', ['Отбасылық емхана']),  # начало второго слова названия
+])
+def test_autocomplete(terms_service, prefix, expected):
+    assert names(terms_service.autocomplete(prefix, 'kk')) == expected
+
+
+def test_autocomplete_limit(terms_service):
+    assert len(terms_service.autocomplete('м', 'kk', limit=1)) == 1
+    assert terms_service.autocomplete('', 'kk') == []
+
+
+def test_failed_reload_keeps_dataset(terms_service, tmp_path):
+    results = terms_service.search_all('мейірім', 'ru')
+    result_set = terms_service.make_result_set('ru', query='мейірім', results=results)
+    (tmp_path / 'terms.csv').rename(tmp_path / 'moved.csv')
+    
+    with pytest.raises(FileNotFoundError):
+        terms_service.reload()
+    # Выборки, сохранённые до перезагрузки, и новый поиск работают на прежней базе
+    assert names(terms_service.get_results(result_set)) == ['Мейірім']
+    assert names(terms_service.search_all('мейірім', 'ru')) == ['Мейірім']
+    assert terms_service.get_categories('ru')
+
+
+def test_snapshot_gives_same_results(terms_service, tmp_path):
+    queries = [('емханаға', 'kk'), ('наследника', 'ru'), ('мейрим', 'kk'), ('қол', 'ru')]
+    expected = [names(terms_service.search_all(query, lang)) for query, lang in queries]
+    
+    assert (tmp_path / 'terms.snapshot').exists()
+    assert not terms_service.reload()
+    assert [names(terms_service.search_all(query, lang)) for query, lang in queries] == expected
+    # Точное название (запросы короче триграммы) - по сохранённому порядку названий
+    assert terms_service._search_index.exact('мейирим') == [2, 3]
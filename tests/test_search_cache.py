@@ -0,0 +1,63 @@
+"""
+Кэш результатов поиска: LRU, время жизни записей и кэш первой страницы
+"""
+import pytest
+
+from services import search_cache
+from services.search_cache import SearchCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_expired_entry_missed(clock):
+    cache = SearchCache(max_size=10, ttl=60)
+    cache.put('key', [1, 2])
+    assert list(cache.get('key').term_ids) == [1, 2]
+    
+    clock[0] += 61
+    assert cache.get('key') is None
+    assert cache.stats()['expirations'] == 1
+    assert len(cache) == 0
+
+
+def test_first_page_cached_with_entry(clock):
+    cache = SearchCache(max_size=10, ttl=60)
+    cache.put('key', [1])
+    renders = []
+    
+    def render():
+        renders.append(1)
+        return f'page {len(renders)}'
+    
+    assert cache.first_page('key', render) == 'page 1'
+    assert cache.first_page('key', render) == 'page 1'
+    assert cache.stats()['page_hits'] == 1
+
+
+def test_first_page_not_served_after_expiry(clock):
+    cache = SearchCache(max_size=10, ttl=60)
+    cache.put('key', [1])
+    assert cache.first_page('key', lambda: 'old') == 'old'
+    
+    clock[0] += 61
+    assert cache.first_page('key', lambda: 'new') == 'new'
+    # Просроченная запись удалена и не продлевается страницей
+    assert len(cache) == 0
+    assert cache.first_page('key', lambda: 'newer') == 'newer'
+
+
+def test_lru_eviction():
+    cache = SearchCache(max_size=2, ttl=60)
+    cache.put('a', [1])
+    cache.put('b', [2])
+    cache.get('a')
+    cache.put('c', [3])
+    
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
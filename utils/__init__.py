@@ -1,12 +1,15 @@
 """
 Утилиты для бота
 """
-from .formatter import format_term, format_results_page
+from .formatter import format_term, format_results_page, format_planned_page, plan_pages, PagePlan
 from .texts import get_text, TEXTS, translate_category, translate_subcategory
 
 __all__ = [
     'format_term',
     'format_results_page',
+    'format_planned_page',
+    'plan_pages',
+    'PagePlan',
     'get_text',
     'TEXTS',
     'translate_category',
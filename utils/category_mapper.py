@@ -1,8 +1,32 @@
 """
 Маппер категорий и подкатегорий для коротких callback_data
 Использует паттерн Singleton для единственного экземпляра
+
+ID выводится из названия (хэш содержимого), а не из порядка регистрации:
+он одинаков во всех процессах, не меняется при перестановке строк CSV и
+переживает перезапуск бота, поэтому кнопки старых сообщений остаются рабочими.
 """
-from typing import Dict, Optional
+from hashlib import blake2b
+from typing import Dict, Iterable, Optional
+
+from utils.logger import get_logger
+from utils.validators import MAX_CATEGORY_ID
+
+logger = get_logger('category_mapper')
+
+
+def name_id(name: str) -> int:
+    """
+    Стабильный ID названия: 31 бит blake2b от UTF-8 (1..MAX_CATEGORY_ID)
+    
+    Args:
+        name: Название категории или подкатегории
+    
+    Returns:
+        ID для callback_data
+    """
+    digest = blake2b(name.encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') % MAX_CATEGORY_ID + 1
 
 
 class CategoryMapper:
@@ -21,43 +45,64 @@ class CategoryMapper:
         # Пропускаем повторную инициализацию
         if CategoryMapper._initialized:
             return
-            
+        
         self._cat_to_id: Dict[str, int] = {}
         self._id_to_cat: Dict[int, str] = {}
         self._subcat_to_id: Dict[str, int] = {}
         self._id_to_subcat: Dict[int, str] = {}
-        self._next_cat_id = 1
-        self._next_subcat_id = 1
         
         CategoryMapper._initialized = True
     
+    def load(self, categories: Iterable[str], subcategories: Iterable[str]) -> None:
+        """
+        Заполняет маппер названиями из набора данных (при загрузке базы)
+        
+        Названия регистрируются в отсортированном порядке, поэтому даже
+        при совпадении хэшей все процессы с той же базой получают одинаковые ID.
+        
+        Args:
+            categories: Названия категорий (всех языков)
+            subcategories: Названия подкатегорий (всех языков)
+        """
+        self._cat_to_id, self._id_to_cat = {}, {}
+        self._subcat_to_id, self._id_to_subcat = {}, {}
+        for category in sorted(set(categories)):
+            self.register_category(category)
+        for subcategory in sorted(set(subcategories)):
+            self.register_subcategory(subcategory)
+        logger.info(
+            f"Маппер заполнен: {len(self._cat_to_id)} категорий, "
+            f"{len(self._subcat_to_id)} подкатегорий"
+        )
+    
     def register_category(self, category: str) -> int:
         """
         Регистрирует категорию и возвращает её ID
         Если категория уже зарегистрирована, возвращает существующий ID
         """
-        if category in self._cat_to_id:
-            return self._cat_to_id[category]
-            
-        cat_id = self._next_cat_id
-        self._cat_to_id[category] = cat_id
-        self._id_to_cat[cat_id] = category
-        self._next_cat_id += 1
-        return cat_id
+        return self._register(category, self._cat_to_id, self._id_to_cat)
     
     def register_subcategory(self, subcategory: str) -> int:
         """
         Регистрирует подкатегорию и возвращает её ID
         Если подкатегория уже зарегистрирована, возвращает существующий ID
         """
-        if subcategory in self._subcat_to_id:
-            return self._subcat_to_id[subcategory]
-            
-        subcat_id = self._next_subcat_id
-        self._subcat_to_id[subcategory] = subcat_id
-        self._id_to_subcat[subcat_id] = subcategory
-        self._next_subcat_id += 1
-        return subcat_id
+        return self._register(subcategory, self._subcat_to_id, self._id_to_subcat)
+    
+    @staticmethod
+    def _register(name: str, to_id: Dict[str, int], to_name: Dict[int, str]) -> int:
+        """ID по хэшу названия; при совпадении хэшей - следующий свободный"""
+        item_id = to_id.get(name)
+        if item_id is not None:
+            return item_id
+        
+        item_id = name_id(name)
+        while item_id in to_name:
+            logger.warning(f"Совпадение ID {item_id}: '{name}' и '{to_name[item_id]}'")
+            item_id = item_id % MAX_CATEGORY_ID + 1
+        to_id[name] = item_id
+        to_name[item_id] = name
+        return item_id
     
     def get_category_id(self, category: str) -> Optional[int]:
         """Получить ID категории по названию"""
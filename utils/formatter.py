@@ -1,28 +1,92 @@
 """
 Форматирование результатов поиска терминов
+
+Экранирование Markdown выполняется за один проход (str.translate), а
+отрисованный фрагмент термина кэшируется на записи Term: страница
+результатов собирается из готовых строк. Границы страниц планируются
+по длине фрагментов (plan_pages), чтобы страница помещалась в одно
+сообщение Telegram.
 """
-from typing import Dict, List
+from typing import Dict, List, Sequence, Tuple, Union
+
+from models.term import Term
+from utils.validators import MAX_MESSAGE_LENGTH
+
+# Символы, которые могут сломать форматирование в Markdown
+# Дефис (-) НЕ экранируем - он безопасен в обычном тексте
+MARKDOWN_SPECIAL_CHARS = '*_[]()~`>#+=|{}.!'
+
+# Таблица для str.translate: символ -> символ с обратной косой чертой
+_MARKDOWN_ESCAPE_TABLE = str.maketrans({char: f'\\{char}' for char in MARKDOWN_SPECIAL_CHARS})
+
+# Символы сущностей Markdown (parse_mode="Markdown"): в обрезанном описании
+# разметка могла потерять закрывающий символ, поэтому они экранируются, а
+# исходные обратные косые черты (сделали бы экранирование неоднозначным) убираются
+_ENTITY_ESCAPE_TABLE = str.maketrans({'\\': '', **{char: f'\\{char}' for char in '_*`['}})
 
 
-def format_term(term_data: Dict[str, str], show_lang: bool = True, show_category: bool = True) -> str:
+def format_term(term_data: Union[Term, Dict[str, str]], show_lang: bool = True, show_category: bool = True) -> str:
     """
     Форматирует данные термина в Markdown строку
     
+    Для записи Term без языка в метаданных результат кэшируется на самой
+    записи (поля уже очищены при загрузке).
+    
     Args:
-        term_data: Словарь с данными термина (term, description, category, subcategory, lang)
+        term_data: Термин (Term или словарь с полями term, description, category, subcategory, lang)
         show_lang: Показывать ли язык в метаданных
         show_category: Показывать ли категорию/подкатегорию в метаданных
-        
+    
     Returns:
         Отформатированная строка в формате Markdown
     """
-    # Получаем данные и очищаем от лишних пробелов
-    term = term_data.get('term', '').strip()
-    description = term_data.get('description', '').strip()
-    category = term_data.get('category', '').strip()
-    subcategory = term_data.get('subcategory', '').strip()
-    lang = term_data.get('lang', '').strip()
+    if isinstance(term_data, Term):
+        if show_lang:
+            return _render_term(
+                term_data.term, term_data.description, term_data.category,
+                term_data.subcategory, term_data.lang, show_lang, show_category
+            )
+        return _cached_fragment(term_data, show_category)
     
+    # Словарь (строка CSV): очищаем от лишних пробелов
+    return _render_term(
+        term_data.get('term', '').strip(),
+        term_data.get('description', '').strip(),
+        term_data.get('category', '').strip(),
+        term_data.get('subcategory', '').strip(),
+        term_data.get('lang', '').strip(),
+        show_lang,
+        show_category
+    )
+
+
+def _cached_fragment(term: Term, show_category: bool) -> str:
+    """Фрагмент термина из кэша записи (отрисовывается при первом обращении)"""
+    if show_category:
+        fragment = term.markdown_with_category
+        if fragment is None:
+            fragment = term.markdown_with_category = _render_term(
+                term.term, term.description, term.category, term.subcategory, term.lang, False, True
+            )
+    else:
+        fragment = term.markdown
+        if fragment is None:
+            fragment = term.markdown = _render_term(
+                term.term, term.description, term.category, term.subcategory, term.lang, False, False
+            )
+    return fragment
+
+
+def _render_term(
+    term: str,
+    description: str,
+    category: str,
+    subcategory: str,
+    lang: str,
+    show_lang: bool,
+    show_category: bool
+) -> str:
+    """Markdown термина из очищенных полей"""
     # Если термин пустой, возвращаем пустую строку
     if not term:
         return ""
@@ -36,10 +100,8 @@ def format_term(term_data: Dict[str, str], show_lang: bool = True, show_category
     if show_lang and lang:
         meta_parts.append(lang)
     
-    # Формируем строку результата
     # Экранируем специальные символы Markdown в названии термина
-    term_escaped = _escape_markdown(term)
-    result = f"**{term_escaped}**"
+    result = f"**{_escape_markdown(term)}**"
     
     if meta_parts:
         meta_str = " / ".join(meta_parts)
@@ -53,25 +115,19 @@ def format_term(term_data: Dict[str, str], show_lang: bool = True, show_category
 
 def _escape_markdown(text: str) -> str:
     """
-    Экранирует специальные символы Markdown
+    Экранирует специальные символы Markdown (один проход по строке)
     
     Args:
         text: Исходный текст
-        
+    
     Returns:
         Текст с экранированными символами
     """
-    # Экранируем только те символы, которые могут сломать форматирование в Markdown
-    # Дефис (-) НЕ экранируем - он безопасен в обычном тексте
-    special_chars = ['*', '_', '[', ']', '(', ')', '~', '`', '>', '#', '+', '=', '|', '{', '}', '.', '!']
-    result = text
-    for char in special_chars:
-        result = result.replace(char, f'\\{char}')
-    return result
+    return text.translate(_MARKDOWN_ESCAPE_TABLE)
 
 
 def format_results_page(
-    terms: List[Dict[str, str]],
+    terms: List[Union[Term, Dict[str, str]]],
     page: int = 1,
     per_page: int = 10,
     show_lang: bool = False,
@@ -86,7 +142,7 @@ def format_results_page(
         per_page: Количество элементов на странице
         show_lang: Показывать ли язык в метаданных
         show_category: Показывать ли категорию/подкатегорию для каждого термина
-        
+    
     Returns:
         Отформатированная строка с терминами
     """
@@ -97,11 +153,167 @@ def format_results_page(
     end_idx = start_idx + per_page
     page_terms = terms[start_idx:end_idx]
     
-    result_parts = []
+    return "\n\n".join([
+        f"{i}. {format_term(term_data, show_lang=show_lang, show_category=show_category)}"
+        for i, term_data in enumerate(page_terms, start=start_idx + 1)
+    ])
+
+
+class PagePlan:
+    """
+    Границы страниц выборки: offsets[i] - индекс первого термина страницы i + 1
+    
+    Последний элемент offsets - длина выборки, поэтому страница p
+    занимает термины offsets[p - 1]:offsets[p].
+    """
     
-    for i, term_data in enumerate(page_terms, start=start_idx + 1):
-        formatted_term = format_term(term_data, show_lang=show_lang, show_category=show_category)
-        result_parts.append(f"{i}. {formatted_term}")
+    __slots__ = ('offsets',)
     
-    return "\n\n".join(result_parts)
+    def __init__(self, offsets: List[int]):
+        self.offsets = offsets
+    
+    @property
+    def page_count(self) -> int:
+        """Количество страниц (не меньше 1)"""
+        return max(len(self.offsets) - 1, 1)
+    
+    def clamp(self, page: int) -> int:
+        """Номер страницы в допустимом диапазоне"""
+        return min(max(page, 1), self.page_count)
+    
+    def bounds(self, page: int) -> Tuple[int, int]:
+        """
+        Индексы терминов страницы
+        
+        Args:
+            page: Номер страницы (приводится к допустимому диапазону)
+        
+        Returns:
+            (начало, конец) для среза выборки
+        """
+        if len(self.offsets) < 2:
+            return 0, 0
+        page = self.clamp(page)
+        return self.offsets[page - 1], self.offsets[page]
+
+
+def message_length(text: str) -> int:
+    """Длина текста так, как её считает Telegram (в кодовых единицах UTF-16)"""
+    return len(text.encode('utf-16-le')) // 2
+
 
+def plan_pages(
+    terms: Sequence[Union[Term, Dict[str, str]]],
+    per_page: int = 10,
+    max_length: int = MAX_MESSAGE_LENGTH,
+    show_lang: bool = False,
+    show_category: bool = False
+) -> PagePlan:
+    """
+    Разбивает выборку на страницы по длине отрисованных терминов
+    
+    На странице не больше per_page терминов, а её текст (с номерами и
+    разделителями) не длиннее max_length. Термин, который один длиннее
+    лимита, занимает отдельную страницу (format_planned_page его обрежет).
+    
+    Args:
+        terms: Термины выборки
+        per_page: Максимальное количество терминов на странице
+        max_length: Максимальная длина текста страницы (лимит сообщения минус заголовок)
+        show_lang: Показывать ли язык в метаданных
+        show_category: Показывать ли категорию/подкатегорию для каждого термина
+    
+    Returns:
+        PagePlan с границами страниц
+    """
+    offsets = [0]
+    length = 0
+    count = 0
+    for i, term_data in enumerate(terms):
+        fragment = format_term(term_data, show_lang=show_lang, show_category=show_category)
+        # "N. " + фрагмент; между терминами - пустая строка
+        item_length = len(str(i + 1)) + 2 + message_length(fragment)
+        if count and (count >= per_page or length + 2 + item_length > max_length):
+            offsets.append(i)
+            length = count = 0
+        length += item_length + (2 if count else 0)
+        count += 1
+    if terms:
+        offsets.append(len(terms))
+    return PagePlan(offsets)
+
+
+def format_planned_page(
+    terms: Sequence[Union[Term, Dict[str, str]]],
+    plan: PagePlan,
+    page: int = 1,
+    max_length: int = MAX_MESSAGE_LENGTH,
+    show_lang: bool = False,
+    show_category: bool = False
+) -> str:
+    """
+    Текст страницы по плану plan_pages
+    
+    Args:
+        terms: Термины выборки (те же, что переданы в plan_pages)
+        plan: План страниц
+        page: Номер страницы (приводится к допустимому диапазону)
+        max_length: Максимальная длина текста (как в plan_pages)
+        show_lang: Показывать ли язык в метаданных
+        show_category: Показывать ли категорию/подкатегорию для каждого термина
+    
+    Returns:
+        Отформатированная строка с терминами
+    """
+    start_idx, end_idx = plan.bounds(page)
+    text = "\n\n".join([
+        f"{i}. {format_term(term_data, show_lang=show_lang, show_category=show_category)}"
+        for i, term_data in enumerate(terms[start_idx:end_idx], start=start_idx + 1)
+    ])
+    if message_length(text) > max_length:
+        # Один термин длиннее лимита (plan_pages ставит его на отдельную страницу)
+        text = _truncated_term(terms[start_idx], start_idx + 1, max_length, show_lang, show_category)
+    return text
+
+
+def _truncated_term(
+    term_data: Union[Term, Dict[str, str]],
+    number: int,
+    max_length: int,
+    show_lang: bool,
+    show_category: bool
+) -> str:
+    """
+    Термин, обрезанный до max_length
+    
+    Обрезается исходное описание (до отрисовки), поэтому разрез не
+    попадает внутрь сущности Markdown или экранирующей последовательности.
+    Если не помещается даже название - обрезается название.
+    """
+    fields = [term_data.get(field, '').strip() for field in Term.FIELDS]
+    name, description, category, subcategory, lang = fields
+    head = f"{number}. " + _render_term(name, '', category, subcategory, lang, show_lang, show_category)
+    # Перевод строки перед описанием и «…» в конце
+    budget = max_length - message_length(head) - 2
+    if budget < 0:
+        budget = max_length - len(str(number)) - 7  # "N. **" + "**" + "…"
+        return f"{number}. **{_truncate(name, budget, _MARKDOWN_ESCAPE_TABLE)}**…"
+    return f"{head}\n{_truncate(description, budget, _ENTITY_ESCAPE_TABLE)}…"
+
+
+def _truncate(text: str, limit: int, table: Dict[int, str]) -> str:
+    """
+    Начало текста, которое после экранирования занимает не больше limit единиц UTF-16
+    
+    Текст режется по символам (суррогатные пары не разделяются), обратная
+    косая черта в конце отбрасывается, затем начало экранируется таблицей.
+    """
+    length = 0
+    end = 0
+    for char in text:
+        size = message_length(char.translate(table))
+        if length + size > limit:
+            break
+        length += size
+        end += 1
+    return text[:end].rstrip('\\').translate(table)
@@ -0,0 +1,108 @@
+"""
+Нормализация и стемминг текста для поиска (казахский и русский)
+
+Применяется один раз к каждому термину при загрузке и один раз к запросу:
+- приведение регистра (casefold) и ё -> е;
+- свёртка казахских букв к близким русским (қ -> к, ғ -> г, ң -> н, ...),
+  чтобы запросы, набранные на русской раскладке, совпадали с терминами;
+- отсечение окончаний и суффиксов: для казахского - множественное число,
+  притяжательные и падежные аффиксы, для русского - окончания.
+"""
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+# Свёртка букв: казахские буквы -> ближайшие буквы русской раскладки
+_FOLD_TABLE = str.maketrans({
+    'ё': 'е',
+    'ә': 'а',
+    'ғ': 'г',
+    'қ': 'к',
+    'ң': 'н',
+    'ө': 'о',
+    'ұ': 'у',
+    'ү': 'у',
+    'һ': 'х',
+    'і': 'и',
+    'i': 'и',  # латинская i вместо казахской і
+})
+
+_WORD_RE = re.compile(r'\w+')
+
+# Минимальная длина основы после отсечения
+MIN_STEM_LENGTH = 4
+
+# Казахские аффиксы (в свёрнутом виде), снимаются справа налево несколько раз:
+# падеж -> притяжательность -> множественное число (емханаларымызда -> емхана)
+_KK_SUFFIXES: Tuple[str, ...] = tuple(sorted({
+    # Множественное число
+    'лар', 'лер', 'дар', 'дер', 'тар', 'тер',
+    # Притяжательные
+    'ымыз', 'имиз', 'мыз', 'миз', 'ыныз', 'иниз', 'ныз', 'низ',
+    'ым', 'им', 'ын', 'ин', 'сы', 'си',
+    # Падежные
+    'нын', 'нин', 'дын', 'дин', 'тын', 'тин',
+    'га', 'ге', 'ка', 'ке', 'на', 'не',
+    'ны', 'ни', 'ды', 'ди', 'ты', 'ти',
+    'да', 'де', 'та', 'те', 'нда', 'нде',
+    'дан', 'ден', 'тан', 'тен', 'нан', 'нен',
+    'мен', 'бен', 'пен',
+}, key=len, reverse=True))
+
+_VOWELS = frozenset('аеиоуыэюя')
+
+# Русские окончания (снимается одно, самое длинное)
+_RU_ENDINGS: Tuple[str, ...] = tuple(sorted({
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ов', 'ев', 'ей', 'ах', 'ях', 'ам', 'ям', 'ом', 'ем',
+    'ой', 'ый', 'ий', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ых', 'их', 'ую', 'юю', 'ия', 'ию',
+    'а', 'я', 'ы', 'и', 'у', 'ю', 'е', 'о', 'ь',
+}, key=len, reverse=True))
+
+
+def fold(text: str) -> str:
+    """Регистр, ё -> е и свёртка казахских букв"""
+    return text.casefold().translate(_FOLD_TABLE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова уже свёрнутого текста"""
+    return _WORD_RE.findall(text)
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str, lang: str = 'kk') -> str:
+    """
+    Основа свёрнутого слова
+    
+    Казахский: аффиксы снимаются справа налево несколько раз подряд
+    (емханаларымызда -> емхана). Русский: снимается одно окончание.
+    Основа не становится короче MIN_STEM_LENGTH. Запрос и термины проходят
+    один и тот же путь, поэтому важна согласованность, а не точность.
+    
+    Args:
+        word: Свёрнутое слово (см. fold)
+        lang: Язык правил ('kk' или 'ru')
+    """
+    if lang == 'ru':
+        for ending in _RU_ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+                return word[:-len(ending)]
+        return word
+    
+    changed = True
+    while changed:
+        changed = False
+        for suffix in _KK_SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+                word = word[:-len(suffix)]
+                changed = True
+                break
+        else:
+            # Притяжательный аффикс -ы/-і после согласной (орталықтары -> орталықтар)
+            if (word[-1:] in ('ы', 'и') and len(word) - 1 >= MIN_STEM_LENGTH
+                    and word[-2] not in _VOWELS):
+                word = word[:-1]
+                changed = True
+    return word
@@ -39,11 +39,14 @@ TEXTS_KK = {
     'results_page': '📄 {current_from}-{current_to} / {total}',
     'no_results': '❌ Ештеңе табылмады',
     'no_results_in_filter': '❌ «{query}» сұранысы бойынша ештеңе табылмады.\n\nБасқа іздеу сұранысын қолданып көріңіз.',
+    'results_expired': '⌛ Бұл нәтижелер ескірді. Іздеуді қайталаңыз.',
     
     # Поиск
     'search_mode_on': '🔎 Іздеу режимі іске қосылды\n\n«{subcategory}» ішінен іздеу үшін сөз енгізіңіз:',
     'search_prompt': '🔍 Іздеу үшін сөз енгізіңіз:',
     'search_results': '🔍 «{query}» сұранысы бойынша табылды: {count}',
+    'search_all_prompt': '🔎 Бүкіл дерекқордан іздеу\n\nІздеу үшін сөз енгізіңіз:',
+    'search_all_results': '🔍 «{query}» сұранысы бойынша барлық санаттардан табылды: {count}',
     
     # Кнопки навигации
     'btn_back': '⬅️ Артқа',
@@ -87,11 +90,14 @@ TEXTS_RU = {
     'results_page': '📄 {current_from}-{current_to} / {total}',
     'no_results': '❌ Ничего не найдено',
     'no_results_in_filter': '❌ По запросу «{query}» ничего не найдено.\n\nПопробуйте другой запрос.',
+    'results_expired': '⌛ Эти результаты устарели. Повторите поиск.',
     
     # Поиск
     'search_mode_on': '🔎 Режим поиска активирован\n\nВведите слово для поиска в «{subcategory}»:',
     'search_prompt': '🔍 Введите слово для поиска:',
     'search_results': '🔍 По запросу «{query}» найдено: {count}',
+    'search_all_prompt': '🔎 Поиск по всей базе\n\nВведите слово для поиска:',
+    'search_all_results': '🔍 По запросу «{query}» во всех категориях найдено: {count}',
     
     # Кнопки навигации
     'btn_back': '⬅️ Назад',
@@ -10,6 +10,8 @@ from pathlib import Path
 MAX_USERNAME_LENGTH = 100
 ALLOWED_LANGUAGES = {'kk', 'ru'}
 MAX_CALLBACK_DATA_LENGTH = 64  # Telegram limit
+MAX_MESSAGE_LENGTH = 4096  # Telegram limit (текст сообщения)
+MAX_CATEGORY_ID = 2 ** 31 - 1  # ID категорий - 31-битные хэши названий (utils.category_mapper)
 
 
 def get_max_query_length() -> int:
@@ -78,8 +80,8 @@ def validate_category_id(category_id: str) -> Optional[int]:
     """
     try:
         cat_id = int(category_id)
-        # Проверяем разумный диапазон (1-10000)
-        if 1 <= cat_id <= 10000:
+        # Проверяем диапазон ID (1-MAX_CATEGORY_ID)
+        if 1 <= cat_id <= MAX_CATEGORY_ID:
             return cat_id
     except (ValueError, TypeError):
         pass
@@ -98,8 +100,8 @@ def validate_subcategory_id(subcategory_id: str) -> Optional[int]:
     """
     try:
         subcat_id = int(subcategory_id)
-        # Проверяем разумный диапазон (1-10000)
-        if 1 <= subcat_id <= 10000:
+        # Проверяем диапазон ID (1-MAX_CATEGORY_ID)
+        if 1 <= subcat_id <= MAX_CATEGORY_ID:
             return subcat_id
     except (ValueError, TypeError):
         pass